@@ -0,0 +1,430 @@
+import heapq
+from datetime import date, datetime, timedelta
+from itertools import accumulate, groupby
+
+from sqlalchemy import delete, func, select, union_all
+from sqlalchemy.dialects import postgresql, sqlite
+
+from models import db, Product, RestockLog, RestockDaily, StockSnapshot, InventorySnapshot
+
+DEFAULT_WINDOW_DAYS = 30
+MAX_WINDOW_DAYS = 365
+MAX_TREND_POINTS = 5 * 366
+SNAPSHOTS_NOT_READY = "Stock snapshots are not built yet; run `python -m manage backfill-snapshots`"
+SNAPSHOT_BATCH_SIZE = 5000
+DEFAULT_RETENTION_DAYS = 90
+COMPACT_DAYS_PER_TRANSACTION = 7
+
+
+def _as_date(value):
+    # SQLite returns DATE() as an ISO string, PostgreSQL as a date object
+    if isinstance(value, str):
+        return date.fromisoformat(value)
+    if isinstance(value, datetime):
+        return value.date()
+    return value
+
+
+def _day_start(day):
+    return datetime.combine(day, datetime.min.time())
+
+
+def inventory_metrics(days=DEFAULT_WINDOW_DAYS, today=None):
+    """
+    Per-product stock statistics over the last `days` days.
+
+    The database groups restock movements into one net quantity per product
+    and day, from raw restock_log rows for the retained tail and from
+    restock_log_daily before that; the stock series is then rebuilt by
+    walking those deltas backwards from the current stock level with a
+    cumulative sum.
+    """
+    today = today or datetime.utcnow().date()
+    start = today - timedelta(days=days - 1)
+    # Movements on the first day of the window are already part of its closing stock
+    since_day = start + timedelta(days=1)
+
+    log_day = func.date(RestockLog.timestamp)
+    daily = union_all(
+        select(RestockLog.product_id, log_day.label('day'), func.sum(RestockLog.quantity).label('net'))
+        .where(RestockLog.timestamp >= _day_start(since_day))
+        .group_by(RestockLog.product_id, log_day),
+        select(RestockDaily.product_id, RestockDaily.day, RestockDaily.net_quantity)
+        .where(RestockDaily.day >= since_day),
+    ).subquery()
+    rows = (
+        db.session.query(
+            Product.id, Product.name, Product.sku, Product.stock_level,
+            daily.c.day, daily.c.net,
+        )
+        .outerjoin(daily, daily.c.product_id == Product.id)
+        .order_by(Product.id)
+        .all()
+    )
+
+    result = []
+    for (product_id, name, sku, stock_level), group in groupby(rows, key=lambda r: r[:4]):
+        current_stock = stock_level or 0
+        # deltas[days] collects anything stamped after today
+        deltas = [0] * (days + 1)
+        for row in group:
+            if row.day is None:
+                continue
+            offset = min((_as_date(row.day) - start).days, days)
+            if offset > 0:
+                deltas[offset] += row.net or 0
+
+        # stock at the end of day i = current stock minus every movement after day i
+        moved_after = list(accumulate(reversed(deltas)))[::-1]
+        stock_values = [current_stock - moved_after[i + 1] for i in range(days)]
+
+        first_stock = stock_values[0]
+        change = current_stock - first_stock
+        change_percent = round((change / first_stock) * 100, 1) if first_stock > 0 else "N/A"
+        result.append({
+            "id": product_id,
+            "name": name,
+            "sku": sku,
+            "currentStock": current_stock,
+            "minStock": min(stock_values),
+            "maxStock": max(stock_values),
+            "changeAmount": change,
+            "changePercent": f"{change_percent}%" if isinstance(change_percent, float) else "N/A"
+        })
+    return result
+
+
+# ---------- Daily stock snapshots ----------
+
+def _flush_snapshots(product_rows, total_rows):
+    if product_rows:
+        db.session.execute(StockSnapshot.__table__.insert(), product_rows)
+        product_rows.clear()
+    if total_rows:
+        db.session.execute(InventorySnapshot.__table__.insert(), total_rows)
+        total_rows.clear()
+
+
+def _movements_since(since_day):
+    """(product_id, quantity, day) from restock_log and restock_log_daily, newest day first."""
+    raw = db.session.execute(
+        select(RestockLog.product_id, RestockLog.quantity, RestockLog.timestamp)
+        .where(RestockLog.timestamp >= _day_start(since_day))
+        .order_by(RestockLog.timestamp.desc(), RestockLog.id.desc())
+        .execution_options(yield_per=SNAPSHOT_BATCH_SIZE)
+    )
+    rolled_up = db.session.execute(
+        select(RestockDaily.product_id, RestockDaily.net_quantity, RestockDaily.day)
+        .where(RestockDaily.day >= since_day)
+        .order_by(RestockDaily.day.desc())
+        .execution_options(yield_per=SNAPSHOT_BATCH_SIZE)
+    )
+    return heapq.merge(
+        ((pid, quantity, timestamp.date()) for pid, quantity, timestamp in raw),
+        rolled_up,
+        key=lambda movement: movement[2],
+        reverse=True,
+    )
+
+
+def _write_snapshots(since_day, today, has_history, write_baseline_total):
+    """
+    Walk restock movements backwards from `today` to `since_day` in one streaming
+    pass, starting from current stock levels, and insert closing-stock rows.
+
+    A product row is written on each day the product moved; products without
+    a row before `since_day` (per `has_history`) also get a baseline on the
+    day before. Returns the number of product rows written.
+    """
+    current = {pid: stock or 0 for pid, stock in db.session.query(Product.id, Product.stock_level)}
+    running = dict(current)
+    total = sum(current.values())
+
+    product_rows, total_rows = [], [{"day": today, "total_stock": total}]
+    written = 0
+    day = today
+    moved_today = set()
+
+    for product_id, quantity, log_day in _movements_since(since_day):
+        if product_id not in running:
+            continue
+        log_day = min(log_day, today)
+        while day > log_day:
+            day -= timedelta(days=1)
+            total_rows.append({"day": day, "total_stock": total})
+            moved_today.clear()
+        if product_id not in moved_today:
+            moved_today.add(product_id)
+            product_rows.append({"product_id": product_id, "day": day, "stock_level": running[product_id]})
+            written += 1
+        running[product_id] -= quantity
+        total -= quantity
+        if len(product_rows) >= SNAPSHOT_BATCH_SIZE:
+            _flush_snapshots(product_rows, total_rows)
+
+    while day > since_day:
+        day -= timedelta(days=1)
+        total_rows.append({"day": day, "total_stock": total})
+
+    baseline_day = since_day - timedelta(days=1)
+    if write_baseline_total:
+        total_rows.append({"day": baseline_day, "total_stock": total})
+    for product_id, stock in running.items():
+        if product_id not in has_history:
+            product_rows.append({"product_id": product_id, "day": baseline_day, "stock_level": stock})
+            written += 1
+        if len(product_rows) >= SNAPSHOT_BATCH_SIZE:
+            _flush_snapshots(product_rows, total_rows)
+
+    _flush_snapshots(product_rows, total_rows)
+    return written
+
+
+def _first_movement_day(today):
+    """Day of the oldest restock movement, raw or rolled up; `today` without any."""
+    first_days = [
+        _as_date(first) for first in (
+            db.session.query(func.min(RestockLog.timestamp)).scalar(),
+            db.session.query(func.min(RestockDaily.day)).scalar(),
+        ) if first is not None
+    ]
+    return min(first_days + [today])
+
+
+def backfill_snapshots(today=None):
+    """Rebuild all snapshots from the full restock history, raw and rolled up."""
+    today = today or datetime.utcnow().date()
+    db.session.query(StockSnapshot).delete()
+    db.session.query(InventorySnapshot).delete()
+    since_day = _first_movement_day(today)
+    written = _write_snapshots(since_day, today, has_history=set(), write_baseline_total=True)
+    db.session.commit()
+    return written
+
+
+def refresh_snapshots(today=None):
+    """
+    Bring snapshots up to date, only reading movements since the last
+    snapshot day. That day is re-processed because its rows were provisional.
+    """
+    today = today or datetime.utcnow().date()
+    last_day = db.session.query(func.max(InventorySnapshot.day)).scalar()
+    if last_day is None:
+        return backfill_snapshots(today)
+
+    since_day = min(last_day, today)
+    db.session.query(StockSnapshot).filter(StockSnapshot.day >= since_day).delete()
+    db.session.query(InventorySnapshot).filter(InventorySnapshot.day >= since_day).delete()
+    has_history = {
+        pid for (pid,) in db.session.query(StockSnapshot.product_id).filter(StockSnapshot.day < since_day).distinct()
+    }
+    written = _write_snapshots(since_day, today, has_history, write_baseline_total=False)
+    db.session.commit()
+    return written
+
+
+# ---------- Restock log retention ----------
+
+def _rollup_upsert(dialect_name):
+    if dialect_name == 'postgresql':
+        stmt = postgresql.insert(RestockDaily)
+    elif dialect_name == 'sqlite':
+        stmt = sqlite.insert(RestockDaily)
+    else:
+        raise NotImplementedError(f"Restock log compaction is not supported on {dialect_name}")
+    # a day can already be rolled up if older rows were loaded after it was compacted
+    return stmt.on_conflict_do_update(
+        index_elements=[RestockDaily.product_id, RestockDaily.day],
+        set_={
+            'net_quantity': RestockDaily.net_quantity + stmt.excluded.net_quantity,
+            'entries': RestockDaily.entries + stmt.excluded.entries,
+        },
+    )
+
+
+def compact_restock_log(retention_days=DEFAULT_RETENTION_DAYS, today=None):
+    """
+    Roll restock_log rows from before the last `retention_days` days into
+    restock_log_daily and delete them.
+
+    The backlog is processed a week per transaction, so the first run over
+    years of history does not build one huge transaction. Returns the number
+    of raw rows removed and daily rows written.
+    """
+    today = today or datetime.utcnow().date()
+    cutoff = _day_start(today - timedelta(days=retention_days))
+    first_log = db.session.query(func.min(RestockLog.timestamp)).scalar()
+    if first_log is None or first_log >= cutoff:
+        return 0, 0
+
+    statement = _rollup_upsert(db.session.get_bind().dialect.name)
+    log_day = func.date(RestockLog.timestamp)
+    removed = written = 0
+    chunk_start = _day_start(first_log.date())
+    while chunk_start < cutoff:
+        chunk_end = min(chunk_start + timedelta(days=COMPACT_DAYS_PER_TRANSACTION), cutoff)
+        in_chunk = (RestockLog.timestamp >= chunk_start, RestockLog.timestamp < chunk_end)
+        rows = db.session.execute(
+            select(RestockLog.product_id, log_day, func.sum(RestockLog.quantity), func.count())
+            .where(*in_chunk)
+            .group_by(RestockLog.product_id, log_day)
+        ).all()
+        if rows:
+            db.session.execute(statement, [
+                {"product_id": pid, "day": _as_date(day), "net_quantity": net, "entries": entries}
+                for pid, day, net, entries in rows
+            ])
+            removed += db.session.execute(delete(RestockLog).where(*in_chunk)).rowcount
+            written += len(rows)
+        db.session.commit()
+        chunk_start = chunk_end
+    return removed, written
+
+
+def parse_trend_range(args, today=None):
+    """Read `from`/`to` ISO dates from query args; defaults to the last 30 days."""
+    today = today or datetime.utcnow().date()
+    end = date.fromisoformat(args['to']) if args.get('to') else today
+    start = date.fromisoformat(args['from']) if args.get('from') else end - timedelta(days=DEFAULT_WINDOW_DAYS - 1)
+    if start > end:
+        raise ValueError("'from' must not be after 'to'")
+    return start, end
+
+
+def _snapshot_span():
+    """
+    (first day, last closed day, its total stock) of the inventory snapshots,
+    or None before the first run. The newest day is not closed: the job
+    writes it provisionally and re-processes it on the next run.
+    """
+    first_day = db.session.query(func.min(InventorySnapshot.day)).scalar()
+    if first_day is None:
+        return None
+    newest = (
+        db.session.query(InventorySnapshot.day, InventorySnapshot.total_stock)
+        .order_by(InventorySnapshot.day.desc())
+        .limit(2)
+        .all()
+    )
+    closed_day, closed_total = newest[-1]
+    return _as_date(first_day), _as_date(closed_day), closed_total
+
+
+def _clamp_range(start, end, first_day):
+    """Start the series at the first snapshot day; the number of days left is capped, not the dates."""
+    start = max(start, first_day)
+    if (end - start).days >= MAX_TREND_POINTS:
+        raise ValueError(f"range covers more than {MAX_TREND_POINTS} days of snapshots; narrow 'from'/'to'")
+    return start
+
+
+def _fill_series(start, end, opening, rows):
+    """One point per day from start to end, carrying the last known value forward."""
+    values = {_as_date(day): value for day, value in rows}
+    series = []
+    last = opening
+    day = start
+    while day <= end:
+        last = values.get(day, last)
+        if last is not None:
+            series.append({"date": day.isoformat(), "stock": last})
+        day += timedelta(days=1)
+    return series
+
+
+def _net_after(closed_day, today, product_id=None):
+    """
+    Net restock quantity per day after `closed_day`, raw and rolled up. Only
+    the tail since the last snapshot run is read; movements stamped after
+    today count towards today.
+    """
+    log_day = func.date(RestockLog.timestamp)
+    raw = (
+        select(log_day.label('day'), func.sum(RestockLog.quantity).label('net'))
+        .where(RestockLog.timestamp >= _day_start(closed_day + timedelta(days=1)))
+    )
+    rolled_up = select(RestockDaily.day, func.sum(RestockDaily.net_quantity)).where(RestockDaily.day > closed_day)
+    if product_id is not None:
+        raw = raw.where(RestockLog.product_id == product_id)
+        rolled_up = rolled_up.where(RestockDaily.product_id == product_id)
+    net = {}
+    for day, quantity in db.session.execute(union_all(raw.group_by(log_day), rolled_up.group_by(RestockDaily.day))):
+        day = min(_as_date(day), today)
+        net[day] = net.get(day, 0) + (quantity or 0)
+    return net
+
+
+def inventory_trend(start, end, today=None):
+    """
+    Daily total stock; None until snapshots exist. Closed days come from
+    inventory_snapshots; later days are provisional, the last closed total
+    plus the restock movements since, so products created or deleted since
+    the last run only show up in totals after the next one.
+    """
+    today = today or datetime.utcnow().date()
+    span = _snapshot_span()
+    if span is None:
+        return None
+    first_day, closed_day, closed_total = span
+    start = _clamp_range(start, end, first_day)
+    opening = (
+        db.session.query(InventorySnapshot.total_stock)
+        .filter(InventorySnapshot.day < start)
+        .order_by(InventorySnapshot.day.desc())
+        .limit(1)
+        .scalar()
+    )
+    rows = (
+        db.session.query(InventorySnapshot.day, InventorySnapshot.total_stock)
+        .filter(InventorySnapshot.day >= start, InventorySnapshot.day <= min(end, closed_day))
+        .all()
+    )
+    if end > closed_day:
+        net = _net_after(closed_day, today)
+        stock = closed_total
+        day = closed_day + timedelta(days=1)
+        while day <= min(end, today):
+            stock += net.get(day, 0)
+            rows.append((day, stock))
+            day += timedelta(days=1)
+    return _fill_series(start, end, opening, rows)
+
+
+def product_trend(product_id, start, end, today=None):
+    """
+    Daily stock of one product; None until snapshots exist. Days after the
+    last closed snapshot day are walked back from its current stock.
+    """
+    today = today or datetime.utcnow().date()
+    span = _snapshot_span()
+    if span is None:
+        return None
+    first_day, closed_day, _ = span
+    start = _clamp_range(start, end, first_day)
+    opening = (
+        db.session.query(StockSnapshot.stock_level)
+        .filter(StockSnapshot.product_id == product_id, StockSnapshot.day < start)
+        .order_by(StockSnapshot.day.desc())
+        .limit(1)
+        .scalar()
+    )
+    rows = (
+        db.session.query(StockSnapshot.day, StockSnapshot.stock_level)
+        .filter(
+            StockSnapshot.product_id == product_id,
+            StockSnapshot.day >= start, StockSnapshot.day <= min(end, closed_day),
+        )
+        .all()
+    )
+    if end > closed_day:
+        net = _net_after(closed_day, today, product_id)
+        stock = db.session.query(Product.stock_level).filter(Product.id == product_id).scalar() or 0
+        live = []
+        day = today
+        while day > closed_day:
+            if day <= end:
+                live.append((day, stock))
+            stock -= net.get(day, 0)
+            day -= timedelta(days=1)
+        rows += live
+    return _fill_series(start, end, opening, rows)
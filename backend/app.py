@@ -1,54 +1,67 @@
-from flask import Flask, jsonify, request, Response
+from flask import Blueprint, Flask, abort, current_app, jsonify, request, Response
 from flask_cors import CORS
-from models import db, Product, RestockLog, LowStockProduct
+from models import db, Product, RestockLog, RestockDaily, StockSnapshot
 from app_config import Config
-from datetime import datetime, timedelta
+import analytics
+import cache
+import catalog
+import events
+import inventory
+import importer
+import instrumentation
+import log_writer
+import migrations
+import replicas
+import restocks
+import search
+import summary
+import warmup
+from datetime import datetime
 from sqlalchemy import text
-import time
-from prometheus_client import generate_latest, CONTENT_TYPE_LATEST, Counter, Histogram, REGISTRY
+import click
+import os
+from prometheus_client import generate_latest, CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, multiprocess
 
-app = Flask(__name__)
-app.url_map.strict_slashes = False
-app.config.from_object(Config)
-CORS(app, resources={r"/api/*": {"origins": "*"}})
-db.init_app(app)
+# Routes and CLI commands; create_app() registers them on an app
+api = Blueprint('api', __name__, cli_group=None)
+
+
+def create_app(config=Config):
+    """
+    Build the Flask app. Nothing here touches the database: the schema is
+    managed by `python -m migrations`, and pooled connections are opened by
+    the /ready warm-up (see warmup.py).
+    """
+    app = Flask(__name__)
+    app.url_map.strict_slashes = False
+    app.config.from_object(config)
+    CORS(app, resources={r"/api/*": {"origins": "*"}}, expose_headers=[
+        catalog.NEXT_CURSOR_HEADER, catalog.LOW_STOCK_CURSOR_HEADER, cache.CATALOG_VERSION_HEADER, 'ETag',
+    ])
+    instrumentation.init_app(app)
+    db.init_app(app)
+    replicas.init_app(app)
+    events.init_app(app)
+    cache.init_app(app)
+    log_writer.init_app(app)
+    warmup.init_app(app)
+    app.register_blueprint(api)
+    return app
 
 # ---------- Prometheus Metrics ----------
-REQUEST_COUNTER = Counter(
-    'flask_http_request_total',
-    'Total number of HTTP requests grouped by method, endpoint and status',
-    ['method', 'endpoint', 'status']
-)
-
-REQUEST_LATENCY = Histogram(
-    'flask_http_request_duration_seconds',
-    'Histogram of response latency (seconds) by method and endpoint',
-    ['method', 'endpoint']
-)
-
-@app.before_request
-def before_request():
-    request.start_time = time.time()
-
-@app.after_request
-def after_request(response):
-    try:
-        duration = time.time() - request.start_time if hasattr(request, 'start_time') else 0
-        REQUEST_COUNTER.labels(method=request.method, endpoint=request.path, status=str(response.status_code)).inc()
-        REQUEST_LATENCY.labels(method=request.method, endpoint=request.path).observe(duration)
-    except Exception:
-        # Log the exception for debugging purposes, but don't fail the request
-        app.logger.exception("Error in after_request for Prometheus metrics")
-        pass
-    return response
-
-@app.route('/metrics')
+@api.route('/metrics')
 def metrics():
     """Endpoint for Prometheus metrics."""
-    return Response(generate_latest(REGISTRY), mimetype=CONTENT_TYPE_LATEST)
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        # under gunicorn: aggregate the samples written by every worker
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), mimetype=CONTENT_TYPE_LATEST)
 
 # ---------- Health Check Endpoints (Optional but Recommended) ----------
-@app.route('/health', methods=['GET'])
+@api.route('/health', methods=['GET'])
 def health_check():
     """
     Basic health check endpoint.
@@ -57,67 +70,101 @@ def health_check():
     try:
         # Attempt a simple query to check database connectivity
         db.session.execute(text("SELECT 1"))
-        return jsonify({"status": "healthy", "database": "connected"}), 200
+        body = {"status": "healthy", "database": "connected"}
+        replica_status = replicas.status()
+        if replica_status is not None:
+            body["binds"] = replica_status
+        return jsonify(body), 200
     except Exception as e:
-        app.logger.error(f"Health check failed: {e}")
+        current_app.logger.error(f"Health check failed: {e}")
         return jsonify({"status": "unhealthy", "database": "disconnected", "error": str(e)}), 500
 
-@app.route('/ready', methods=['GET'])
+@api.route('/ready', methods=['GET'])
 def readiness_check():
     """
     Readiness probe endpoint.
-    Indicates if the application is ready to accept traffic.
-    This can be simpler than /health if you only want to check the app's startup.
+    Reports ready once this worker's connection pool is warmed (see warmup.py);
+    until then it answers 503 so no traffic is routed to a cold worker.
     """
-    return jsonify({"status": "ready"}), 200
+    pool_warmup = warmup.current()
+    pool_warmup.start()
+    status = pool_warmup.status()
+    return jsonify(status), 200 if pool_warmup.ready else 503
 
 # ---------- USER API ----------
 
-@app.route('/api/user/products', methods=['GET'])
+@replicas.read_only
+def _product_listing():
+    # only keyset pages are cached; full-catalog streams are not held in memory
+    if 'limit' not in request.args and 'after_id' not in request.args:
+        return catalog.product_listing_response(request.args)
+    return cache.cached_response(
+        'listing',
+        cache.listing_key(request.endpoint, request.args),
+        lambda: catalog.product_listing_response(request.args),
+    )
+
+@api.route('/api/user/products', methods=['GET'])
 def user_get_products():
-    products = Product.query.all()
-    return jsonify([p.to_dict() for p in products]), 200
-
-@app.route('/api/user/products/<int:product_id>/purchase', methods=['POST'])
+    return _product_listing()
+
+# on the primary: a detail read right after a write must see it, and a miss is one indexed lookup
+@api.route('/api/user/products/<int:product_id>', methods=['GET'])
+def user_get_product(product_id):
+    def build():
+        product = catalog.product_dict(product_id)
+        if product is None:
+            return jsonify({'error': 'Product not found'}), 404
+        return jsonify(product)
+    return cache.cached_response('product', cache.product_key(product_id), build, product_id=product_id)
+
+@api.route('/api/user/products/<int:product_id>/purchase', methods=['POST'])
 def user_purchase_product(product_id):
-    data = request.get_json()
-    quantity = data.get('quantity', 0)
-    product = Product.query.get(product_id)
+    data = request.get_json(silent=True) or {}
+    try:
+        quantity = int(data.get('quantity', 0))
+    except (TypeError, ValueError):
+        return jsonify({"error": "Invalid request"}), 400
+    if quantity <= 0:
+        return jsonify({"error": "Quantity must be positive"}), 400
 
-    if not product:
+    try:
+        remaining = inventory.purchase(product_id, quantity)
+    except inventory.ProductNotFound:
         return jsonify({'error': 'Product not found'}), 404
-    if product.stock_level < quantity:
+    except inventory.InsufficientStock:
         return jsonify({'error': 'Not enough stock'}), 400
+    return jsonify({'message': 'Purchase successful', 'remaining_stock': remaining}), 200
 
-    product.stock_level -= quantity
-    db.session.add(RestockLog(product_id=product.id, quantity=-quantity))
+@api.route('/api/user/orders', methods=['POST'])
+def user_place_order():
+    data = request.get_json(silent=True) or {}
+    items = data.get('items')
+    if not isinstance(items, list) or not 1 <= len(items) <= inventory.MAX_ORDER_LINES:
+        return jsonify({"error": f"items must be a list of 1 to {inventory.MAX_ORDER_LINES} lines"}), 400
 
-    if product.stock_level > product.low_stock_threshold:
-        db.session.query(LowStockProduct).filter_by(product_id=product.id).delete()
-    else:
-        entry = LowStockProduct.query.filter_by(product_id=product.id).first()
-        if entry:
-            entry.stock_level = product.stock_level
-            entry.low_stock_threshold = product.low_stock_threshold
-        else:
-            db.session.add(LowStockProduct(
-                product_id=product.id,
-                name=product.name,
-                sku=product.sku,
-                stock_level=product.stock_level,
-                low_stock_threshold=product.low_stock_threshold
-            ))
-
-    db.session.commit()
-    return jsonify({'message': 'Purchase successful', 'remaining_stock': product.stock_level}), 200
+    lines = []
+    try:
+        for item in items:
+            line = {"product_id": int(item['product_id']), "quantity": int(item['quantity'])}
+            if line['quantity'] <= 0:
+                return jsonify({"error": "Quantity must be positive"}), 400
+            lines.append(line)
+    except (KeyError, TypeError, ValueError):
+        return jsonify({"error": "Each item needs an integer product_id and quantity"}), 400
+
+    atomic = bool(data.get('atomic', False))
+    results = inventory.place_order(lines, atomic=atomic)
+    purchased = sum(1 for r in results if r['status'] == 'ok')
+    status = 409 if atomic and purchased < len(results) else 200
+    return jsonify({"purchased": purchased, "results": results}), status
 
 # ---------- ADMIN API ----------
 
-@app.route('/api/products', methods=['GET', 'POST'])
+@api.route('/api/products', methods=['GET', 'POST'])
 def manage_products():
     if request.method == 'GET':
-        products = Product.query.all()
-        return jsonify([p.to_dict() for p in products]), 200
+        return _product_listing()
 
     if request.method == 'POST':
         data = request.get_json()
@@ -131,34 +178,70 @@ def manage_products():
                 cost=data.get('cost'),
                 low_stock_threshold=data.get('low_stock_threshold', 10)
             )
+            new_product.refresh_low_stock_since()
             db.session.add(new_product)
             db.session.flush()
-
-            if new_product.stock_level <= new_product.low_stock_threshold:
-                db.session.add(LowStockProduct(
-                    product_id=new_product.id,
-                    name=new_product.name,
-                    sku=new_product.sku,
-                    stock_level=new_product.stock_level,
-                    low_stock_threshold=new_product.low_stock_threshold
-                ))
-
+            after = summary.product_state(new_product)
+            events.record(events.stock_events(new_product.id, None, after))
             db.session.commit()
+            summary.aggregate.product_changed(None, after)
+            cache.product_changed(new_product.id)
             return jsonify(new_product.to_dict()), 201
         except KeyError as e:
             return jsonify({"error": f"Missing field: {e}"}), 400
 
-@app.route('/api/products/<int:product_id>', methods=['GET', 'PUT', 'DELETE'])
-def product_detail(product_id):
-    product = Product.query.get_or_404(product_id)
+@api.route('/api/products/bulk', methods=['POST'])
+def bulk_import_products():
+    """Upsert products by SKU from a JSON array, NDJSON or CSV body."""
+    mimetype = request.mimetype
+    if mimetype == 'text/csv':
+        records = importer.read_csv(request.stream)
+    elif mimetype == 'application/x-ndjson':
+        records = importer.read_ndjson(request.stream)
+    elif mimetype == 'application/json':
+        records = request.get_json(silent=True)
+        if not isinstance(records, list):
+            return jsonify({"error": "Expected a JSON array of products"}), 400
+    else:
+        return jsonify({"error": "Use application/json, application/x-ndjson or text/csv"}), 415
 
+    batch_size = request.args.get('batch_size', importer.DEFAULT_BATCH_SIZE, type=int)
+    if not batch_size or batch_size <= 0:
+        return jsonify({"error": "batch_size must be positive"}), 400
+    try:
+        stats = importer.import_products(records, batch_size=batch_size)
+    except importer.ImportRowError as e:
+        return jsonify({"error": str(e), "imported": e.stats["rows"]}), 400
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({"error": f"Malformed input: {e}"}), 400
+    finally:
+        # upserts do not report per-row before/after values; recount on the next read
+        summary.aggregate.invalidate()
+        cache.catalog_changed()
+        db.session.rollback()  # drop a failed batch before recording the event
+        events.catalog_changed(source='bulk_import')
+    return jsonify(stats), 200
+
+@api.route('/api/products/<int:product_id>', methods=['GET', 'PUT', 'DELETE'])
+def product_detail(product_id):
     if request.method == 'GET':
-        return jsonify(product.to_dict()), 200
+        return cache.cached_response(
+            'product',
+            cache.product_key(product_id),
+            lambda: jsonify(catalog.product_dict(product_id) or abort(404)),
+            product_id=product_id,
+        )
+
+    product = Product.query.get_or_404(product_id)
 
     if request.method == 'PUT':
         data = request.get_json()
+        before = summary.product_state(product)
         try:
             old_stock = product.stock_level
+            old_fields = (product.name, product.sku, product.category, product.price, product.cost,
+                          product.low_stock_threshold)
             new_stock = data.get('stock_level', old_stock)
             product.name = data['name']
             product.sku = data['sku']
@@ -168,40 +251,44 @@ def product_detail(product_id):
             product.stock_level = new_stock
             product.low_stock_threshold = data.get('low_stock_threshold', product.low_stock_threshold)
 
+            product.refresh_low_stock_since()
+
             if new_stock != old_stock:
                 db.session.add(RestockLog(product_id=product.id, quantity=new_stock - old_stock))
-
-            if new_stock > product.low_stock_threshold:
-                db.session.query(LowStockProduct).filter_by(product_id=product.id).delete()
-            else:
-                entry = LowStockProduct.query.filter_by(product_id=product.id).first()
-                if entry:
-                    entry.name = product.name
-                    entry.sku = product.sku
-                    entry.stock_level = product.stock_level
-                    entry.low_stock_threshold = product.low_stock_threshold
-                else:
-                    db.session.add(LowStockProduct(
-                        product_id=product.id,
-                        name=product.name,
-                        sku=product.sku,
-                        stock_level=product.stock_level,
-                        low_stock_threshold=product.low_stock_threshold
-                    ))
+            after = summary.product_state(product)
+            drafts = events.stock_events(product.id, before, after, logged=new_stock - old_stock)
+            if (product.name, product.sku, product.category, product.price, product.cost,
+                    product.low_stock_threshold) != old_fields:
+                drafts.append(events.product_updated(product.id))
+            events.record(drafts)
 
             db.session.commit()
+            summary.aggregate.product_changed(before, after)
+            cache.product_changed(product.id)
+            if new_stock != old_stock:
+                summary.aggregate.restocks_logged()
             return jsonify(product.to_dict()), 200
         except KeyError as e:
             return jsonify({"error": f"Missing field: {e}"}), 400
 
     if request.method == 'DELETE':
+        before = summary.product_state(product)
+        recent_logs = RestockLog.query.filter(
+            RestockLog.product_id == product.id,
+            RestockLog.timestamp >= datetime.utcnow() - summary.RESTOCK_WINDOW,
+        ).delete()
         RestockLog.query.filter_by(product_id=product.id).delete()
-        db.session.query(LowStockProduct).filter_by(product_id=product.id).delete()
+        RestockDaily.query.filter_by(product_id=product.id).delete()
+        StockSnapshot.query.filter_by(product_id=product.id).delete()
+        events.record(events.stock_events(product.id, before, None))
         db.session.delete(product)
         db.session.commit()
+        summary.aggregate.product_changed(before, None)
+        cache.product_changed(product_id)
+        summary.aggregate.restocks_logged(-recent_logs)
         return jsonify({'result': True}), 204
 
-@app.route('/api/products/<int:product_id>/restock', methods=['POST'])
+@api.route('/api/products/<int:product_id>/restock', methods=['POST'])
 def restock_product(product_id):
     product = Product.query.get_or_404(product_id)
     data = request.get_json()
@@ -211,26 +298,16 @@ def restock_product(product_id):
         if quantity <= 0:
             return jsonify({"error": "Quantity must be positive"}), 400
 
+        before = summary.product_state(product)
         product.stock_level += quantity
+        product.refresh_low_stock_since()
         db.session.add(RestockLog(product_id=product.id, quantity=quantity))
-
-        if product.stock_level > product.low_stock_threshold:
-            db.session.query(LowStockProduct).filter_by(product_id=product.id).delete()
-        else:
-            entry = LowStockProduct.query.filter_by(product_id=product.id).first()
-            if entry:
-                entry.stock_level = product.stock_level
-                entry.low_stock_threshold = product.low_stock_threshold
-            else:
-                db.session.add(LowStockProduct(
-                    product_id=product.id,
-                    name=product.name,
-                    sku=product.sku,
-                    stock_level=product.stock_level,
-                    low_stock_threshold=product.low_stock_threshold
-                ))
-
+        after = summary.product_state(product)
+        events.record(events.stock_events(product.id, before, after, logged=quantity))
         db.session.commit()
+        summary.aggregate.product_changed(before, after)
+        summary.aggregate.restocks_logged()
+        cache.product_changed(product.id, cache.reshapes(before, after))
         return jsonify(product.to_dict()), 200
 
     except (KeyError, ValueError):
@@ -238,86 +315,119 @@ def restock_product(product_id):
 
 # ---------- Monitoring / Dashboard ----------
 
-@app.route('/api/products/low-stock', methods=['GET'])
-def low_stock_products():
-    entries = LowStockProduct.query.order_by(LowStockProduct.timestamp.desc()).all()
-    return jsonify([entry.to_dict() for entry in entries]), 200
+@api.route('/api/stream/inventory', methods=['GET'])
+def inventory_stream():
+    resume = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    try:
+        last_event_id = int(resume) if resume else None
+    except ValueError:
+        return jsonify({"error": "Last-Event-ID must be an event id"}), 400
+    return events.stream_response(last_event_id)
 
-@app.route('/api/restocks', methods=['GET'])
+
+@api.route('/api/products/low-stock', methods=['GET'])
+@replicas.read_only
+def low_stock_products():
+    return catalog.low_stock_response(request.args)
+
+@api.route('/api/products/search', methods=['GET'])
+@replicas.read_only
+def search_products():
+    return cache.cached_response(
+        'listing',
+        cache.listing_key(request.endpoint, request.args),
+        lambda: search.search_response(request.args),
+    )
+
+@api.route('/api/restocks', methods=['GET'])
 def get_restock_logs():
-    logs = RestockLog.query.order_by(RestockLog.timestamp.desc()).limit(5).all()
-    return jsonify([log.to_dict() for log in logs]), 200
+    return restocks.restock_log_response(request.args)
 
-@app.route('/api/dashboard/summary', methods=['GET'])
+@api.route('/api/dashboard/summary', methods=['GET'])
+@replicas.read_only
 def dashboard_summary():
-    products = Product.query.all()
-    total_products = len(products)
-    total_value = sum((p.price or 0) * (p.stock_level or 0) for p in products)
-    low_stock_count = len([p for p in products if (p.stock_level or 0) < (p.low_stock_threshold or 10)])
-    since = datetime.utcnow() - timedelta(days=1)
-    restocks_count = RestockLog.query.filter(RestockLog.timestamp >= since).count()
-    return jsonify({
-        "totalProducts": total_products,
-        "totalValue": total_value,
-        "lowStockProducts": low_stock_count,
-        "restocksPending": restocks_count
-    }), 200
-
-@app.route('/api/analytics/inventory-trend', methods=['GET'])
+    return jsonify(summary.aggregate.read()), 200
+
+@api.route('/api/analytics/inventory-trend', methods=['GET'])
+@replicas.read_only
 def inventory_trend():
-    today = datetime.utcnow().date()
-    products = Product.query.all()
-    trend_data = []
-    for i in range(30):
-        day = today - timedelta(days=29 - i)
-        total_stock = sum(p.stock_level for p in products)
-        trend_data.append({"date": day.isoformat(), "stock": total_stock})
-    return jsonify(trend_data), 200
-
-@app.route('/api/analytics/product-trend/<int:product_id>', methods=['GET'])
+    try:
+        start, end = analytics.parse_trend_range(request.args)
+        series = analytics.inventory_trend(start, end)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if series is None:
+        return jsonify({"error": analytics.SNAPSHOTS_NOT_READY}), 503
+    return jsonify(series), 200
+
+@api.route('/api/analytics/product-trend/<int:product_id>', methods=['GET'])
+@replicas.read_only
 def product_trend(product_id):
-    product = Product.query.get_or_404(product_id)
-    today = datetime.utcnow().date()
-    trends = [{"date": (today - timedelta(days=29 - i)).isoformat(), "stock": product.stock_level} for i in range(30)]
-    return jsonify(trends), 200
-
-@app.route('/api/analytics/metrics', methods=['GET'])
+    Product.query.get_or_404(product_id)
+    try:
+        start, end = analytics.parse_trend_range(request.args)
+        series = analytics.product_trend(product_id, start, end)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if series is None:
+        return jsonify({"error": analytics.SNAPSHOTS_NOT_READY}), 503
+    return jsonify(series), 200
+
+@api.route('/api/analytics/metrics', methods=['GET'])
+@replicas.read_only
 def inventory_metrics():
-    today = datetime.utcnow().date()
-    products = Product.query.all()
-    result = []
-    for product in products:
-        current_stock = product.stock_level
-        dates = [today - timedelta(days=i) for i in range(29, -1, -1)]
-        stock_by_day = {date: current_stock for date in dates}
-        logs = RestockLog.query.filter_by(product_id=product.id).order_by(RestockLog.timestamp.asc()).all()
-        for log in logs:
-            log_date = log.timestamp.date()
-            for d in dates:
-                if d < log_date:
-                    stock_by_day[d] -= log.quantity
-        stock_values = list(stock_by_day.values())
-        min_stock = min(stock_values)
-        max_stock = max(stock_values)
-        first_stock = stock_values[0]
-        change = current_stock - first_stock
-        change_percent = round((change / first_stock) * 100, 1) if first_stock > 0 else "N/A"
-        result.append({
-            "id": product.id,
-            "name": product.name,
-            "sku": product.sku,
-            "currentStock": current_stock,
-            "minStock": min_stock,
-            "maxStock": max_stock,
-            "changeAmount": change,
-            "changePercent": f"{change_percent}%" if isinstance(change_percent, float) else "N/A"
-        })
-    return jsonify(result), 200
+    days = request.args.get('days', analytics.DEFAULT_WINDOW_DAYS, type=int)
+    if days is None or not 1 <= days <= analytics.MAX_WINDOW_DAYS:
+        return jsonify({"error": f"days must be between 1 and {analytics.MAX_WINDOW_DAYS}"}), 400
+    return jsonify(analytics.inventory_metrics(days)), 200
+
+# ---------- CLI ----------
+
+@api.cli.command('upgrade-db')
+def upgrade_db_command():
+    """Create missing tables and apply schema upgrades."""
+    for step in migrations.upgrade():
+        print(f"Applied {step}")
+
+@api.cli.command('snapshot-stock')
+def snapshot_stock_command():
+    """Update daily stock snapshots from restock logs since the last run."""
+    written = analytics.refresh_snapshots()
+    print(f"Stock snapshots refreshed ({written} product rows written).")
+
+@api.cli.command('backfill-snapshots')
+def backfill_snapshots_command():
+    """Rebuild daily stock snapshots from the whole restock_log history."""
+    written = analytics.backfill_snapshots()
+    print(f"Stock snapshots rebuilt ({written} product rows written).")
+
+@api.cli.command('compact-restock-log')
+@click.option('--retention-days', type=click.IntRange(min=1), default=None,
+              help='Raw rows to keep, in days (default: RESTOCK_LOG_RETENTION_DAYS).')
+def compact_restock_log_command(retention_days):
+    """Roll old restock_log rows into daily totals and trim the inventory event feed."""
+    retention_days = retention_days or current_app.config['RESTOCK_LOG_RETENTION_DAYS']
+    removed, written = analytics.compact_restock_log(retention_days)
+    print(f"Compacted {removed} restock log rows older than {retention_days} days into {written} daily rows.")
+    trimmed = events.trim(current_app.config['EVENT_RETENTION_HOURS'])
+    print(f"Trimmed {trimmed} inventory events older than {current_app.config['EVENT_RETENTION_HOURS']} hours.")
+
+@api.cli.command('import-products')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--batch-size', default=importer.DEFAULT_BATCH_SIZE, show_default=True)
+def import_products_command(path, batch_size):
+    """Upsert products by SKU from a .csv or .ndjson file."""
+    reader = importer.read_csv if path.endswith('.csv') else importer.read_ndjson
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        try:
+            stats = importer.import_products(
+                reader(f), batch_size=batch_size,
+                progress=lambda s: print(f"  {s['rows']} rows ({s['rows_per_sec']} rows/sec)"),
+            )
+        except importer.ImportRowError as e:
+            raise click.ClickException(f"{e} ({e.stats['rows']} rows imported before it)")
+    print(f"Imported {stats['rows']} products in {stats['seconds']}s ({stats['rows_per_sec']} rows/sec).")
 
 if __name__ == '__main__':
-    with app.app_context():
-        db.create_all()
-        result = db.session.execute(text("SELECT oid, datname FROM pg_database WHERE datname = current_database();"))
-        for row in result:
-            print("\U0001F9E0 Flask DB OID:", row[0], "| Name:", row[1])
-    app.run(host='0.0.0.0', port=5000)
\ No newline at end of file
+    # schema changes are a separate step: run `python -m migrations` first
+    create_app().run(host='0.0.0.0', port=5000)
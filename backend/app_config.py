@@ -1,7 +1,96 @@
 import os
 
-print("📦 config.py loaded!")
+DEFAULT_DATABASE_URL = 'postgresql://postgres:12345678@db:5432/shop_inventory'
+
+
+def _env_bool(name, default):
+    return os.environ.get(name, str(default)).lower() in ('1', 'true', 'yes')
+
+
+def engine_options(database_uri):
+    """SQLAlchemy pool settings from the environment; SQLite keeps its default pool."""
+    if database_uri.startswith('sqlite'):
+        return {}
+    return {
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', 5)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 10)),
+        'pool_timeout': float(os.environ.get('DB_POOL_TIMEOUT', 30)),
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 1800)),
+        'pool_pre_ping': _env_bool('DB_POOL_PRE_PING', True),
+        # per host: a multi-host DATABASE_URL moves on to the next host after this
+        'connect_args': {'connect_timeout': int(os.environ.get('DB_CONNECT_TIMEOUT', 3))},
+    }
+
+
+def replica_binds(replica_uri):
+    """SQLALCHEMY_BINDS with a 'replica' bind (see replicas.py), or none without a replica URL."""
+    if not replica_uri:
+        return {}
+    return {'replica': {'url': replica_uri, **engine_options(replica_uri)}}
+
+
+ASYNC_DRIVERS = {'postgresql': 'postgresql+asyncpg', 'sqlite': 'sqlite+aiosqlite'}
+
+
+def async_database_url(database_uri):
+    """The same database through its asyncio driver (asyncpg / aiosqlite)."""
+    scheme, sep, rest = database_uri.partition('://')
+    return ASYNC_DRIVERS.get(scheme.split('+')[0], scheme) + sep + rest
+
+
+def async_engine_options(database_uri):
+    """Pool for the async storefront; coroutines are cheap, so it is larger than a sync worker's."""
+    if database_uri.startswith('sqlite'):
+        return {}
+    return {
+        'pool_size': int(os.environ.get('ASYNC_DB_POOL_SIZE', 20)),
+        'max_overflow': int(os.environ.get('ASYNC_DB_MAX_OVERFLOW', 20)),
+        'pool_timeout': float(os.environ.get('DB_POOL_TIMEOUT', 30)),
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 1800)),
+        'pool_pre_ping': _env_bool('DB_POOL_PRE_PING', True),
+    }
+
 
 class Config:
-    SQLALCHEMY_DATABASE_URI = 'postgresql://postgres:12345678@db:5432/shop_inventory'
+    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', DEFAULT_DATABASE_URL)
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(SQLALCHEMY_DATABASE_URI)
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Read replica for listing and analytics reads (see replicas.py)
+    REPLICA_DATABASE_URL = os.environ.get('REPLICA_DATABASE_URL')
+    SQLALCHEMY_BINDS = replica_binds(REPLICA_DATABASE_URL)
+    REPLICA_CHECK_SECONDS = float(os.environ.get('REPLICA_CHECK_SECONDS', 2))
+    REPLICA_MAX_LAG_SECONDS = float(os.environ.get('REPLICA_MAX_LAG_SECONDS', 5))
+    # connections each worker opens before /ready reports ready (0: the pool size)
+    DB_WARM_CONNECTIONS = int(os.environ.get('DB_WARM_CONNECTIONS', 0))
+    # async storefront (asgi.py): same database, asyncio driver, its own pool
+    ASYNC_DATABASE_URL = os.environ.get('ASYNC_DATABASE_URL', async_database_url(SQLALCHEMY_DATABASE_URI))
+    ASYNC_ENGINE_OPTIONS = async_engine_options(ASYNC_DATABASE_URL)
+    # Dashboard summary refresh interval. Each worker process only sees its own
+    # writes, so keep it short when running several (gunicorn reads WEB_CONCURRENCY).
+    SUMMARY_MAX_AGE_SECONDS = float(os.environ.get(
+        'SUMMARY_MAX_AGE_SECONDS',
+        5 if int(os.environ.get('WEB_CONCURRENCY', '1')) > 1 else 60
+    ))
+    # Raw restock_log rows older than this are rolled up by `python -m manage compact-restock-log`
+    RESTOCK_LOG_RETENTION_DAYS = int(os.environ.get('RESTOCK_LOG_RETENTION_DAYS', 90))
+    # Write-behind restock_log entries for purchases (see log_writer.py)
+    RESTOCK_LOG_WRITE_BEHIND = _env_bool('RESTOCK_LOG_WRITE_BEHIND', False)
+    RESTOCK_LOG_QUEUE_SIZE = int(os.environ.get('RESTOCK_LOG_QUEUE_SIZE', 10000))
+    RESTOCK_LOG_BATCH_SIZE = int(os.environ.get('RESTOCK_LOG_BATCH_SIZE', 500))
+    RESTOCK_LOG_FLUSH_SECONDS = float(os.environ.get('RESTOCK_LOG_FLUSH_SECONDS', 0.2))
+    RESTOCK_LOG_PUT_TIMEOUT = float(os.environ.get('RESTOCK_LOG_PUT_TIMEOUT', 0.05))
+    # Inventory change feed (/api/stream/inventory). EVENT_BROKER is 'postgres'
+    # (LISTEN/NOTIFY) or 'memory'; by default it follows the database.
+    EVENT_BROKER = os.environ.get('EVENT_BROKER')
+    EVENT_POLL_SECONDS = float(os.environ.get('EVENT_POLL_SECONDS', 5))
+    EVENT_RETENTION_HOURS = int(os.environ.get('EVENT_RETENTION_HOURS', 24))
+    # each open stream holds a worker thread; clients reconnect and resume after this
+    STREAM_MAX_SECONDS = float(os.environ.get('STREAM_MAX_SECONDS', 300))
+    # open streams per worker process; the default leaves half of its threads to the API
+    STREAM_MAX_CLIENTS = int(os.environ.get(
+        'STREAM_MAX_CLIENTS', max(1, int(os.environ.get('GUNICORN_THREADS', 4)) // 2)
+    ))
+    # Product response cache; CACHE_URL (redis://...) shares it between workers
+    CACHE_URL = os.environ.get('CACHE_URL')
+    CACHE_TTL_SECONDS = float(os.environ.get('CACHE_TTL_SECONDS', 30))
+    CACHE_MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES', 10000))
@@ -0,0 +1,193 @@
+"""
+Async storefront: the user-facing product listing, product detail and
+purchase endpoints on an asyncio stack, for flash-sale concurrency.
+
+    uvicorn asgi:app --host 0.0.0.0 --port 8000 --workers 4
+
+A waiting request holds a coroutine, not a thread, and only borrows a
+connection from its own pool (ASYNC_DB_POOL_SIZE / ASYNC_DB_MAX_OVERFLOW) for
+the statements it runs. It uses the same tables, queries and response bodies
+as the Flask views in app.py; schema upgrades, the admin API and /metrics
+stay on the Flask side.
+
+Responses are not cached here. A purchase is written to the inventory
+change feed, through which the Flask workers' in-process caches drop the
+product; with CACHE_URL set it is also invalidated in the shared cache
+directly. The Flask workers' dashboard counters pick it up at their next
+refresh.
+"""
+from contextlib import asynccontextmanager
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.ext.asyncio import create_async_engine
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import Response, StreamingResponse
+from starlette.routing import Route
+
+import cache
+import catalog
+import events
+import inventory
+from app_config import Config
+from models import Product, RestockLog
+from serialization import dumps
+
+engine = create_async_engine(Config.ASYNC_DATABASE_URL, **Config.ASYNC_ENGINE_OPTIONS)
+shared_cache = cache.create_backend(vars(Config)) if Config.CACHE_URL else None
+
+
+def json_response(obj, status_code=200, headers=None):
+    """Equivalent of flask.jsonify(obj) with a status; same encoder, same bytes."""
+    body = dumps(obj) + b'\n'
+    return Response(body, status_code=status_code, headers=headers, media_type='application/json')
+
+
+async def _fetch_page(conn, params, after_id, limit):
+    rows = (await conn.execute(catalog.listing_statement(params, after_id, limit))).all()
+    return catalog.page_from_rows(params, rows)
+
+
+async def _stream_rows(params):
+    after_id = params['after_id']
+    while True:
+        # a connection per batch, so slow clients do not pin the pool
+        async with engine.connect() as conn:
+            page, last_id = await _fetch_page(conn, params, after_id, catalog.STREAM_BATCH_SIZE)
+        for item in page:
+            yield item
+        if len(page) < catalog.STREAM_BATCH_SIZE:
+            return
+        after_id = last_id
+
+
+async def _stream_json_array(params):
+    yield b'['
+    first = True
+    async for item in _stream_rows(params):
+        yield dumps(item) if first else b',' + dumps(item)
+        first = False
+    yield b']'
+
+
+async def _stream_ndjson(params):
+    async for item in _stream_rows(params):
+        yield dumps(item) + b'\n'
+
+
+async def list_products(request):
+    """See catalog.product_listing_response."""
+    try:
+        params = catalog.parse_listing_args(request.query_params)
+    except ValueError as e:
+        return json_response({"error": str(e)}, 400)
+
+    if params['limit'] is not None or params['after_id'] is not None:
+        limit = params['limit'] or catalog.DEFAULT_PAGE_SIZE
+        async with engine.connect() as conn:
+            page, last_id = await _fetch_page(conn, params, params['after_id'], limit)
+        headers = {catalog.NEXT_CURSOR_HEADER: str(last_id)} if len(page) == limit else None
+        return json_response(page, headers=headers)
+
+    if params['format'] == 'ndjson':
+        return StreamingResponse(_stream_ndjson(params), media_type='application/x-ndjson')
+    return StreamingResponse(_stream_json_array(params), media_type='application/json')
+
+
+async def get_product(request):
+    product_id = request.path_params['product_id']
+    async with engine.connect() as conn:
+        row = (await conn.execute(catalog.product_statement(product_id))).first()
+    if row is None:
+        return json_response({'error': 'Product not found'}, 404)
+    return json_response(row._asdict())
+
+
+async def _record_events(conn, drafts):
+    # Flask workers pick these up through LISTEN/NOTIFY, or their table poll
+    rows = (await conn.execute(events.insert_statement(drafts))).all()
+    if conn.dialect.name == 'postgresql' and rows:
+        await conn.execute(events.notify_statement(), {"payload": events.notify_payload([row.id for row in rows])})
+
+
+async def _purchase(product_id, quantity):
+    """
+    inventory.purchase on the async engine: one conditional UPDATE ... RETURNING
+    and the log row. Returns the updated row.
+    """
+    new_stock = Product.stock_level - quantity
+    async with engine.begin() as conn:
+        row = (await conn.execute(
+            update(Product)
+            .where(Product.id == product_id, Product.stock_level >= quantity)
+            .values(stock_level=new_stock, low_stock_since=inventory.low_stock_since_after(new_stock))
+            .returning(Product.id, Product.price, Product.stock_level, Product.low_stock_threshold)
+        )).first()
+        if row is not None:
+            await conn.execute(insert(RestockLog).values(product_id=product_id, quantity=-quantity))
+            await _record_events(conn, events.stock_events(
+                product_id, *inventory.sale_states(row, quantity), logged=-quantity,
+            ))
+            return row
+    async with engine.connect() as conn:
+        exists = (await conn.execute(select(Product.id).where(Product.id == product_id))).first()
+    raise inventory.InsufficientStock(product_id) if exists else inventory.ProductNotFound(product_id)
+
+
+async def purchase_product(request):
+    product_id = request.path_params['product_id']
+    try:
+        data = await request.json()
+    except ValueError:
+        data = None
+    if not isinstance(data, dict):
+        data = {}
+    try:
+        quantity = int(data.get('quantity', 0))
+    except (TypeError, ValueError):
+        return json_response({"error": "Invalid request"}, 400)
+    if quantity <= 0:
+        return json_response({"error": "Quantity must be positive"}, 400)
+
+    try:
+        row = await _purchase(product_id, quantity)
+    except inventory.ProductNotFound:
+        return json_response({'error': 'Product not found'}, 404)
+    except inventory.InsufficientStock:
+        return json_response({'error': 'Not enough stock'}, 400)
+    if shared_cache is not None:
+        reshaped = cache.reshapes(*inventory.sale_states(row, quantity))
+        await run_in_threadpool(cache.invalidate_product, shared_cache, product_id, reshaped)
+    return json_response({'message': 'Purchase successful', 'remaining_stock': row.stock_level})
+
+
+async def health(request):
+    try:
+        async with engine.connect() as conn:
+            await conn.execute(select(1))
+    except Exception as e:
+        return json_response({"status": "unhealthy", "database": "disconnected", "error": str(e)}, 500)
+    return json_response({"status": "healthy", "database": "connected"})
+
+
+@asynccontextmanager
+async def lifespan(app):
+    yield
+    await engine.dispose()
+
+
+app = Starlette(
+    routes=[
+        Route('/health', health, methods=['GET']),
+        Route('/api/user/products', list_products, methods=['GET']),
+        Route('/api/user/products/{product_id:int}', get_product, methods=['GET']),
+        Route('/api/user/products/{product_id:int}/purchase', purchase_product, methods=['POST']),
+    ],
+    middleware=[Middleware(
+        CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*'],
+        expose_headers=[catalog.NEXT_CURSOR_HEADER],
+    )],
+    lifespan=lifespan,
+)
@@ -0,0 +1,184 @@
+"""
+Storefront latency and concurrency: sync Flask (gunicorn) versus the async
+ASGI app (uvicorn), on the same database and workload.
+
+    cd backend && python -m benchmarks.bench_async --concurrency 16 64 256 1024 --duration 10
+
+Each concurrency level opens that many keep-alive connections, and every
+connection sends listing pages, product details and purchases
+(--purchase-ratio) back to back. The Flask product cache is disabled, so
+both servers do the same database work. A level passes when under 1% of
+requests fail and p99 stays under --slo-ms. The highest passing level is
+reported as the server's max concurrency.
+
+SQLite serialises writers and runs on the client's CPU. Pass a
+postgresql:// --database-uri for numbers that mean something.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.common import make_app, seed_catalog
+from benchmarks.load_test import BACKEND_DIR, _free_port, _wait_until_up
+
+
+def _server_command(kind, workers, threads, port):
+    if kind == 'sync':
+        env = {
+            'WEB_CONCURRENCY': str(workers),
+            'GUNICORN_THREADS': str(threads),
+            'GUNICORN_BIND': f'127.0.0.1:{port}',
+            'GUNICORN_ACCESSLOG': '',
+            'CACHE_TTL_SECONDS': '0',
+            'PROMETHEUS_MULTIPROC_DIR': tempfile.mkdtemp(prefix='prom_'),
+        }
+        return [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app'], env
+    command = [
+        sys.executable, '-m', 'uvicorn', 'asgi:app', '--host', '127.0.0.1', '--port', str(port),
+        '--workers', str(workers), '--no-access-log', '--log-level', 'warning',
+    ]
+    return command, {}
+
+
+async def _request(reader, writer, method, path, body):
+    payload = json.dumps(body).encode() if body is not None else b''
+    head = f"{method} {path} HTTP/1.1\r\nHost: bench\r\nContent-Length: {len(payload)}\r\n"
+    if payload:
+        head += "Content-Type: application/json\r\n"
+    writer.write(head.encode() + b"\r\n" + payload)
+    await writer.drain()
+
+    status = int((await reader.readline()).split()[1])
+    length, close = 0, False
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        name = name.strip().lower()
+        if name == 'content-length':
+            length = int(value)
+        elif name == 'connection' and 'close' in value.lower():
+            close = True
+    await reader.readexactly(length)
+    return status, close
+
+
+def _next_request(rng, product_count, purchase_ratio):
+    roll = rng.random()
+    product_id = rng.randint(1, product_count)
+    if roll < purchase_ratio:
+        return 'POST', f'/api/user/products/{product_id}/purchase', {"quantity": 1}
+    if roll < purchase_ratio + (1 - purchase_ratio) / 2:
+        return 'GET', f'/api/user/products/{product_id}', None
+    return 'GET', f'/api/user/products?limit=50&after_id={product_id}', None
+
+
+async def _connection(port, deadline, rng, product_count, purchase_ratio, latencies, failures):
+    reader = writer = None
+    while time.monotonic() < deadline:
+        started = time.perf_counter()
+        try:
+            if writer is None:
+                reader, writer = await asyncio.wait_for(asyncio.open_connection('127.0.0.1', port), 10)
+            status, close = await asyncio.wait_for(
+                _request(reader, writer, *_next_request(rng, product_count, purchase_ratio)), 30
+            )
+            # 400s are expected (a product sold out); only server errors count
+            if status >= 500:
+                failures.append(status)
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError, IndexError):
+            failures.append(None)
+            close = True
+        latencies.append(time.perf_counter() - started)
+        if close and writer is not None:
+            writer.close()
+            reader = writer = None
+    if writer is not None:
+        writer.close()
+
+
+async def _drive(port, concurrency, duration, product_count, purchase_ratio):
+    latencies, failures = [], []
+    deadline = time.monotonic() + duration
+    await asyncio.gather(*(
+        _connection(port, deadline, random.Random(i), product_count, purchase_ratio, latencies, failures)
+        for i in range(concurrency)
+    ))
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": len(failures),
+        "rps": len(latencies) / duration,
+        "p50_ms": statistics.median(latencies) * 1000 if latencies else 0,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000 if latencies else 0,
+    }
+
+
+def run_server(kind, args, uri, product_count):
+    port = _free_port()
+    command, extra_env = _server_command(kind, args.workers, args.threads, port)
+    env = dict(os.environ, DATABASE_URL=uri, **extra_env)
+    env.pop('ASYNC_DATABASE_URL', None)
+    server = subprocess.Popen(command, cwd=BACKEND_DIR, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    results = []
+    try:
+        _wait_until_up(port)
+        for concurrency in args.concurrency:
+            stats = asyncio.run(_drive(port, concurrency, args.duration, product_count, args.purchase_ratio))
+            stats["concurrency"] = concurrency
+            stats["ok"] = stats["errors"] <= stats["requests"] * 0.01 and stats["p99_ms"] <= args.slo_ms
+            results.append(stats)
+            print(f"{kind:>5} c={concurrency:<5} {stats['rps']:8.1f} req/s | p50 {stats['p50_ms']:7.1f} ms | "
+                  f"p99 {stats['p99_ms']:7.1f} ms | errors {stats['errors']}{'' if stats['ok'] else '  (over SLO)'}")
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=30)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[16, 64, 256, 1024])
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=8, help='threads per gunicorn worker (sync only)')
+    parser.add_argument('--purchase-ratio', type=float, default=0.1)
+    parser.add_argument('--slo-ms', type=float, default=500)
+    parser.add_argument('--database-uri')
+    parser.add_argument('--seed', type=int, default=10000)
+    args = parser.parse_args()
+
+    tmp_dir = None
+    uri = args.database_uri
+    if uri is None:
+        tmp_dir = tempfile.TemporaryDirectory()
+        uri = 'sqlite:///' + os.path.join(tmp_dir.name, 'storefront.db')
+
+    summary = {}
+    for kind in ('sync', 'async'):
+        # reseed so both servers start from the same stock levels
+        with make_app(uri).app_context():
+            seed_catalog(args.seed, logs_per_product=0)
+        results = run_server(kind, args, uri, args.seed)
+        passing = [r["concurrency"] for r in results if r["ok"]]
+        summary[kind] = max(passing) if passing else 0
+
+    print(f"max concurrency within {args.slo_ms:.0f} ms p99: "
+          + ", ".join(f"{kind} {level}" for kind, level in summary.items()))
+
+    if tmp_dir is not None:
+        tmp_dir.cleanup()
+
+
+if __name__ == '__main__':
+    main()
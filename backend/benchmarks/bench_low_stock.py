@@ -0,0 +1,116 @@
+"""
+Purchase-path write latency with the old low_stock_products shadow table
+versus the derived low_stock_since column and partial index.
+
+    cd backend && python -m benchmarks.bench_low_stock --products 10000 --purchases 5000
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, update
+
+import inventory
+from benchmarks.common import make_app, seed_catalog
+from models import db, Product, RestockLog
+
+legacy_metadata = MetaData()
+legacy_low_stock = Table(
+    'low_stock_products', legacy_metadata,
+    Column('id', Integer, primary_key=True),
+    Column('product_id', Integer, nullable=False, index=True),
+    Column('name', String(100), nullable=False),
+    Column('sku', String(50), nullable=False),
+    Column('stock_level', Integer, nullable=False),
+    Column('low_stock_threshold', Integer, nullable=False),
+    Column('timestamp', DateTime, default=datetime.utcnow),
+)
+
+
+def legacy_purchase(product_id, quantity):
+    """The purchase path before the shadow table was removed."""
+    row = db.session.execute(
+        update(Product)
+        .where(Product.id == product_id, Product.stock_level >= quantity)
+        .values(stock_level=Product.stock_level - quantity)
+        .returning(Product.name, Product.sku, Product.stock_level, Product.low_stock_threshold)
+        .execution_options(synchronize_session=False)
+    ).first()
+    if row is None:
+        db.session.rollback()
+        return
+    db.session.execute(RestockLog.__table__.insert().values(product_id=product_id, quantity=-quantity))
+    entries = legacy_low_stock.c.product_id == product_id
+    if row.stock_level > row.low_stock_threshold:
+        db.session.execute(legacy_low_stock.delete().where(entries))
+    else:
+        updated = db.session.execute(legacy_low_stock.update().where(entries).values(
+            name=row.name, sku=row.sku, stock_level=row.stock_level, low_stock_threshold=row.low_stock_threshold,
+        )).rowcount
+        if not updated:
+            db.session.execute(legacy_low_stock.insert().values(
+                product_id=product_id, name=row.name, sku=row.sku,
+                stock_level=row.stock_level, low_stock_threshold=row.low_stock_threshold,
+            ))
+    db.session.commit()
+
+
+def derived_purchase(product_id, quantity):
+    try:
+        inventory.purchase(product_id, quantity)
+    except inventory.InsufficientStock:
+        pass
+
+
+def run(purchase_fn, product_ids):
+    latencies = []
+    for product_id in product_ids:
+        started = time.perf_counter()
+        purchase_fn(product_id, 1)
+        latencies.append(time.perf_counter() - started)
+    latencies.sort()
+    return {
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+        "mean_ms": statistics.fmean(latencies) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--products', type=int, default=10000)
+    parser.add_argument('--purchases', type=int, default=5000)
+    parser.add_argument('--database-uri')
+    args = parser.parse_args()
+
+    tmp_dir = None
+    uri = args.database_uri
+    if uri is None:
+        tmp_dir = tempfile.TemporaryDirectory()
+        uri = 'sqlite:///' + os.path.join(tmp_dir.name, 'low_stock.db')
+
+    rng = random.Random(7)
+    product_ids = [rng.randint(1, args.products) for _ in range(args.purchases)]
+
+    bench_app = make_app(uri)
+    with bench_app.app_context():
+        for label, purchase_fn in (("shadow table", legacy_purchase), ("derived index", derived_purchase)):
+            seed_catalog(args.products, logs_per_product=0)
+            legacy_metadata.drop_all(db.engine)
+            if purchase_fn is legacy_purchase:
+                legacy_metadata.create_all(db.engine)
+            stats = run(purchase_fn, product_ids)
+            print(f"{label:>14}: p50 {stats['p50_ms']:.3f} ms | p99 {stats['p99_ms']:.3f} ms | "
+                  f"mean {stats['mean_ms']:.3f} ms")
+        legacy_metadata.drop_all(db.engine)
+
+    if tmp_dir is not None:
+        tmp_dir.cleanup()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""
+Compare the grouped-query metrics engine against the original per-product loop.
+
+    cd backend && python -m benchmarks.bench_metrics --sizes 1000 10000 100000
+"""
+import argparse
+from datetime import datetime, timedelta
+
+import analytics
+from benchmarks.common import make_app, seed_catalog, timed
+from models import db, Product, RestockLog
+
+
+def legacy_inventory_metrics():
+    """The /api/analytics/metrics implementation this engine replaced (N+1 queries)."""
+    today = datetime.utcnow().date()
+    products = Product.query.all()
+    result = []
+    for product in products:
+        current_stock = product.stock_level
+        dates = [today - timedelta(days=i) for i in range(29, -1, -1)]
+        stock_by_day = {date: current_stock for date in dates}
+        logs = RestockLog.query.filter_by(product_id=product.id).order_by(RestockLog.timestamp.asc()).all()
+        for log in logs:
+            log_date = log.timestamp.date()
+            for d in dates:
+                if d < log_date:
+                    stock_by_day[d] -= log.quantity
+        stock_values = list(stock_by_day.values())
+        min_stock = min(stock_values)
+        max_stock = max(stock_values)
+        first_stock = stock_values[0]
+        change = current_stock - first_stock
+        change_percent = round((change / first_stock) * 100, 1) if first_stock > 0 else "N/A"
+        result.append({
+            "id": product.id,
+            "name": product.name,
+            "sku": product.sku,
+            "currentStock": current_stock,
+            "minStock": min_stock,
+            "maxStock": max_stock,
+            "changeAmount": change,
+            "changePercent": f"{change_percent}%" if isinstance(change_percent, float) else "N/A"
+        })
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--logs-per-product', type=int, default=5)
+    parser.add_argument('--database-uri', default='sqlite://')
+    parser.add_argument('--legacy-max', type=int, default=10000,
+                        help='skip the legacy implementation above this many products')
+    args = parser.parse_args()
+
+    bench_app = make_app(args.database_uri)
+    with bench_app.app_context():
+        for size in args.sizes:
+            seed_catalog(size, logs_per_product=args.logs_per_product)
+            db.session.expire_all()
+
+            new_result, new_time = timed(analytics.inventory_metrics)
+            line = f"{size:>7} products | engine {new_time:8.3f}s"
+
+            if size <= args.legacy_max:
+                old_result, old_time = timed(legacy_inventory_metrics)
+                db.session.expire_all()
+                assert old_result == new_result, "engine output differs from the legacy implementation"
+                line += f" | legacy {old_time:8.3f}s | speedup x{old_time / new_time:.1f}"
+            else:
+                line += " | legacy skipped"
+            print(line)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+"""
+Latency of /api/products/search query shapes on a large synthetic catalog,
+against what the UIs did before: download the whole catalog and filter it
+in the browser.
+
+    cd backend && python -m benchmarks.bench_search --products 100000
+    cd backend && python -m benchmarks.bench_search --database-uri postgresql://... --explain
+
+Each shape runs --repeat times through the Flask test client, rotating the
+search term, so the product cache is bypassed (CACHE_TTL_SECONDS=0) and
+every request hits the database. p50/p95 and the matches per query are
+printed per shape. With --explain the Postgres plan of each shape is
+printed, to check that the trigram, price and category indexes are used.
+
+SQLite has no trigram index, so `q` scans there; pass a postgresql:// URI
+for numbers that mean something.
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+from benchmarks.common import NOUNS, make_app, seed_catalog
+
+# (label, query string template; {term} rotates over the nouns, {short} over 2-letter prefixes)
+SHAPES = (
+    ("q (word)", "q={term}"),
+    ("q (2 letters)", "q={short}"),
+    ("q (sku prefix)", "q=SKU-00012"),
+    ("q + category", "q={term}&category=Category%203"),
+    ("q + price range", "q={term}&min_price=100&max_price=200"),
+    ("price range", "min_price=100&max_price=110"),
+    ("category + price", "category=Category%207&min_price=250"),
+    ("low_stock", "low_stock=true"),
+    ("q + low_stock", "q={term}&low_stock=true"),
+    ("no filters (facets only)", ""),
+)
+
+
+def _percentile(ordered, q):
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * len(ordered))) - 1)]
+
+
+def run_shape(client, template, repeat, limit):
+    latencies, totals = [], []
+    for i in range(repeat):
+        noun = NOUNS[i % len(NOUNS)]
+        query = template.format(term=noun.lower(), short=noun[:2].lower())
+        started = time.perf_counter()
+        response = client.get(f"/api/products/search?{query}&limit={limit}")
+        latencies.append(time.perf_counter() - started)
+        assert response.status_code == 200, response.get_data(as_text=True)
+        totals.append(response.json["total"])
+    latencies.sort()
+    return {
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": _percentile(latencies, 95) * 1000,
+        "matches": statistics.median(totals),
+    }
+
+
+def explain(template):
+    from sqlalchemy import text
+
+    import search
+    from models import db
+
+    noun = NOUNS[0]
+    args = dict(part.split('=', 1) for part in template.format(term=noun.lower(), short=noun[:2].lower())
+                .replace('%20', ' ').split('&') if part)
+    params = search.parse_search_args(args)
+    for stmt in (search.search_statement(params), search.facet_statement(params)):
+        compiled = stmt.compile(db.engine, compile_kwargs={"literal_binds": True})
+        for (line,) in db.session.execute(text(f"EXPLAIN ANALYZE {compiled}")):
+            print(f"      {line}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--products', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--limit', type=int, default=50)
+    parser.add_argument('--database-uri')
+    parser.add_argument('--skip-seed', action='store_true')
+    parser.add_argument('--explain', action='store_true', help='print the Postgres plan of every shape')
+    args = parser.parse_args()
+
+    tmp_dir = None
+    uri = args.database_uri
+    if uri is None:
+        tmp_dir = tempfile.TemporaryDirectory()
+        uri = 'sqlite:///' + os.path.join(tmp_dir.name, 'search.db')
+    os.environ['DATABASE_URL'] = uri
+    os.environ['CACHE_TTL_SECONDS'] = '0'
+
+    if not args.skip_seed:
+        with make_app(uri).app_context():
+            started = time.perf_counter()
+            seed_catalog(args.products, logs_per_product=0, low_stock_ratio=0.05)
+            print(f"seeded {args.products} products in {time.perf_counter() - started:.1f}s")
+
+    # app_config reads DATABASE_URL at import time
+    from app import create_app
+
+    app = create_app()
+    client = app.test_client()
+    with app.app_context():
+        started = time.perf_counter()
+        body = client.get('/api/products').get_data()
+        print(f"{'full catalog download (old)':<26} {(time.perf_counter() - started) * 1000:9.1f} ms "
+              f"({len(body) / 1e6:.1f} MB)")
+        for label, template in SHAPES:
+            stats = run_shape(client, template, args.repeat, args.limit)
+            print(f"{label:<26} p50 {stats['p50_ms']:7.2f} ms | p95 {stats['p95_ms']:7.2f} ms | "
+                  f"{stats['matches']:8.0f} matches")
+            if args.explain and uri.startswith('postgresql'):
+                explain(template)
+
+    if tmp_dir is not None:
+        tmp_dir.cleanup()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,154 @@
+"""
+Response building and encoding throughput per endpoint: ORM objects +
+to_dict() + stdlib json (the old path) versus row selects + serialization.dumps.
+
+    cd backend && python -m benchmarks.bench_serialization --products 10000 --rows 1000
+
+Each endpoint body is built --repeat times with a fresh session, as a
+request would. The report gives rows/sec and SQL statements per response
+for both paths, plus encoding-only throughput of stdlib json and
+serialization.dumps (orjson when installed).
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from sqlalchemy import event
+
+import catalog
+import restocks
+import serialization
+from benchmarks.common import make_app, seed_catalog
+from models import db, Product, RestockLog, is_low_stock
+from serialization import low_stock_dict, restock_log_dict
+
+
+def _legacy_encode(obj):
+    # what jsonify did before: stdlib json with Flask's default options
+    return json.dumps(obj, ensure_ascii=True, sort_keys=True, separators=(',', ':')).encode()
+
+
+def legacy_restocks(limit):
+    logs = RestockLog.query.order_by(RestockLog.timestamp.desc()).limit(limit).all()
+    return [log.to_dict() for log in logs]
+
+
+def fast_restocks(limit):
+    params = restocks.parse_restock_args({'limit': str(limit)})
+    return [restock_log_dict(*row) for row in db.session.execute(restocks.restock_statement(params))]
+
+
+def legacy_low_stock(limit):
+    products = (
+        Product.query.filter(is_low_stock())
+        .order_by(Product.low_stock_since.desc().nulls_last(), Product.id.desc()).limit(limit).all()
+    )
+    return [p.to_low_stock_dict() for p in products]
+
+
+def fast_low_stock(limit):
+    rows = db.session.execute(
+        db.select(Product.id, Product.name, Product.sku, Product.stock_level, Product.low_stock_threshold,
+                  Product.low_stock_since)
+        .where(is_low_stock())
+        .order_by(Product.low_stock_since.desc().nulls_last(), Product.id.desc()).limit(limit)
+    )
+    return [low_stock_dict(*row) for row in rows]
+
+
+def legacy_products(limit):
+    return [p.to_dict() for p in Product.query.order_by(Product.id).limit(limit).all()]
+
+
+def fast_products(limit):
+    params = catalog.parse_listing_args({'limit': str(limit)})
+    return catalog._fetch_page(params, None, limit)[0]
+
+
+def legacy_detail(_):
+    return Product.query.get_or_404(1).to_dict()
+
+
+def fast_detail(_):
+    return catalog.product_dict(1)
+
+
+ENDPOINTS = (
+    ("/api/restocks", legacy_restocks, fast_restocks),
+    ("/api/products/low-stock", legacy_low_stock, fast_low_stock),
+    ("/api/products?limit=", legacy_products, fast_products),
+    ("/api/products/<id>", legacy_detail, fast_detail),
+)
+
+
+class StatementCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, *args):
+        self.count += 1
+
+
+def measure(build, encode, rows, repeat, counter):
+    counter.count = 0
+    started = time.perf_counter()
+    for _ in range(repeat):
+        db.session.expunge_all()  # a new request starts with an empty identity map
+        body = encode(build(rows))
+    elapsed = time.perf_counter() - started
+    items = json.loads(body)
+    per_response = len(items) if isinstance(items, list) else 1
+    return per_response * repeat / elapsed, counter.count / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--products', type=int, default=10000)
+    parser.add_argument('--rows', type=int, default=1000, help='page size for the list endpoints')
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--database-uri')
+    args = parser.parse_args()
+
+    tmp_dir = None
+    uri = args.database_uri
+    if uri is None:
+        tmp_dir = tempfile.TemporaryDirectory()
+        uri = 'sqlite:///' + os.path.join(tmp_dir.name, 'serialization.db')
+
+    bench_app = make_app(uri)
+    with bench_app.app_context(), bench_app.test_request_context():
+        seed_catalog(args.products, logs_per_product=2)
+        # give the low-stock listing a full page to serve
+        db.session.execute(
+            db.update(Product).where(Product.id <= args.rows)
+            .values(stock_level=0, low_stock_since=db.func.current_timestamp())
+        )
+        db.session.commit()
+
+        counter = StatementCounter()
+        event.listen(db.engine, 'before_cursor_execute', counter)
+        encoder = 'orjson' if serialization.orjson is not None else 'stdlib fallback'
+        print(f"encoder: {encoder}")
+        for name, legacy, fast in ENDPOINTS:
+            old_rate, old_queries = measure(legacy, _legacy_encode, args.rows, args.repeat, counter)
+            new_rate, new_queries = measure(fast, serialization.dumps, args.rows, args.repeat, counter)
+            print(f"{name:<26} old {old_rate:10.0f} rows/s ({old_queries:5.0f} queries) | "
+                  f"new {new_rate:10.0f} rows/s ({new_queries:3.0f} queries) | x{new_rate / old_rate:.1f}")
+
+            payload = fast(args.rows)
+            for label, encode in (("stdlib json", _legacy_encode), ("dumps", serialization.dumps)):
+                started = time.perf_counter()
+                for _ in range(args.repeat):
+                    encode(payload)
+                size = len(payload) if isinstance(payload, list) else 1
+                print(f"{'':<26}   encode only, {label:<11}: {size * args.repeat / (time.perf_counter() - started):12.0f} rows/s")
+        event.remove(db.engine, 'before_cursor_execute', counter)
+
+    if tmp_dir is not None:
+        tmp_dir.cleanup()
+
+
+if __name__ == '__main__':
+    main()
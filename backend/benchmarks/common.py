@@ -0,0 +1,85 @@
+import random
+import time
+from datetime import datetime, timedelta
+
+from flask import Flask
+
+from models import db, Product, RestockLog
+
+BATCH_SIZE = 5000
+# product names are "<adjective> <noun> <n>", so substring searches have realistic selectivity
+ADJECTIVES = ('Classic', 'Organic', 'Compact', 'Deluxe', 'Wireless', 'Frozen', 'Vintage', 'Smart', 'Large', 'Mini')
+NOUNS = ('Apple', 'Keyboard', 'Blender', 'Jacket', 'Lamp', 'Coffee', 'Notebook', 'Speaker', 'Pillow', 'Kettle',
+         'Backpack', 'Monitor', 'Candle', 'Sneaker', 'Teapot', 'Router', 'Yogurt', 'Drill', 'Scarf', 'Mug')
+
+
+def make_app(database_uri='sqlite://'):
+    """Standalone Flask app bound to a scratch database, independent of app.py."""
+    bench_app = Flask(__name__)
+    bench_app.config['SQLALCHEMY_DATABASE_URI'] = database_uri
+    bench_app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    if database_uri.startswith('sqlite:///'):
+        # file-backed SQLite shared by several threads: wait on the write lock instead of failing
+        bench_app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {'connect_args': {'timeout': 60}}
+    db.init_app(bench_app)
+    return bench_app
+
+
+def seed_catalog(n_products, logs_per_product=5, history_days=60, seed=42, categories=20, low_stock_ratio=None):
+    """
+    Bulk-load `n_products` products plus random restock history. Needs an app context.
+
+    Products are spread over `categories` categories. With `low_stock_ratio`
+    that share of them starts at or below its threshold; otherwise stock is
+    uniform in 0..200 (about 5% low).
+    """
+    rng = random.Random(seed)
+    db.drop_all()
+    db.create_all()
+
+    now = datetime.utcnow()
+    threshold = 10
+    for offset in range(0, n_products, BATCH_SIZE):
+        rows = []
+        for i in range(offset, min(offset + BATCH_SIZE, n_products)):
+            price = round(rng.uniform(1, 500), 2)
+            cost = round(rng.uniform(1, 250), 2)
+            if low_stock_ratio is None:
+                stock = rng.randint(0, 200)
+            elif rng.random() < low_stock_ratio:
+                stock = rng.randint(0, threshold)
+            else:
+                stock = rng.randint(threshold + 1, 200)
+            rows.append({
+                "id": i + 1,
+                "name": f"{ADJECTIVES[i % len(ADJECTIVES)]} {NOUNS[i // len(ADJECTIVES) % len(NOUNS)]} {i + 1}",
+                "sku": f"SKU-{i + 1:07d}",
+                "category": f"Category {i % categories}",
+                "price": price,
+                "cost": cost,
+                "stock_level": stock,
+                "low_stock_threshold": threshold,
+                "low_stock_since": now - timedelta(minutes=i % (24 * 60)) if stock <= threshold else None,
+            })
+        db.session.execute(Product.__table__.insert(), rows)
+
+    batch = []
+    for product_id in range(1, n_products + 1):
+        for _ in range(logs_per_product):
+            batch.append({
+                "product_id": product_id,
+                "quantity": rng.choice([-1, -2, -5, 10, 20]),
+                "timestamp": now - timedelta(minutes=rng.randint(0, history_days * 24 * 60)),
+            })
+        if len(batch) >= BATCH_SIZE:
+            db.session.execute(RestockLog.__table__.insert(), batch)
+            batch = []
+    if batch:
+        db.session.execute(RestockLog.__table__.insert(), batch)
+    db.session.commit()
+
+
+def timed(fn, *args, **kwargs):
+    started = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - started
@@ -0,0 +1,139 @@
+"""
+Show how requests/sec scales with gunicorn worker count on a local database.
+
+    cd backend && python -m benchmarks.load_test --workers 1 2 4 --concurrency 16 --seed 10000
+
+For every worker count a gunicorn server (gunicorn.conf.py) is started on
+--database-uri, then --concurrency client processes hit --path over
+keep-alive connections for --duration seconds. Defaults to a temporary
+SQLite file; pass a postgresql:// URI for numbers that mean something.
+"""
+import argparse
+import http.client
+import os
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from benchmarks.common import make_app, seed_catalog
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _wait_until_up(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=2)
+            conn.request('GET', '/health')
+            if conn.getresponse().status == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"server on port {port} did not become healthy")
+
+
+def _client(port, path, duration):
+    """One client: sequential requests on a keep-alive connection for `duration` seconds."""
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    latencies, errors = [], 0
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        started = time.perf_counter()
+        try:
+            conn.request('GET', path)
+            response = conn.getresponse()
+            response.read()
+            if response.status >= 500:
+                errors += 1
+        except (OSError, http.client.HTTPException):
+            errors += 1
+            conn.close()
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        latencies.append(time.perf_counter() - started)
+    return latencies, errors
+
+
+def start_gunicorn(workers, threads, database_uri, port):
+    """Start the app under gunicorn.conf.py on 127.0.0.1:`port`; the caller stops it with SIGTERM."""
+    env = dict(
+        os.environ,
+        DATABASE_URL=database_uri,
+        WEB_CONCURRENCY=str(workers),
+        GUNICORN_THREADS=str(threads),
+        GUNICORN_BIND=f'127.0.0.1:{port}',
+        GUNICORN_ACCESSLOG='',
+        PROMETHEUS_MULTIPROC_DIR=tempfile.mkdtemp(prefix='prom_'),
+    )
+    return subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app'],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+
+
+def run_level(workers, threads, database_uri, path, concurrency, duration):
+    port = _free_port()
+    server = start_gunicorn(workers, threads, database_uri, port)
+    try:
+        _wait_until_up(port)
+        with ProcessPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(_client, [port] * concurrency, [path] * concurrency, [duration] * concurrency))
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=30)
+
+    latencies = sorted(l for client_latencies, _ in results for l in client_latencies)
+    errors = sum(e for _, e in results)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": len(latencies) / duration,
+        "p50_ms": statistics.median(latencies) * 1000 if latencies else 0,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000 if latencies else 0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--path', default='/api/user/products?limit=50')
+    parser.add_argument('--database-uri')
+    parser.add_argument('--seed', type=int, default=10000,
+                        help='load this many synthetic products first (0 keeps the existing data)')
+    args = parser.parse_args()
+
+    tmp_dir = None
+    uri = args.database_uri
+    if uri is None:
+        tmp_dir = tempfile.TemporaryDirectory()
+        uri = 'sqlite:///' + os.path.join(tmp_dir.name, 'load.db')
+    if args.seed:
+        with make_app(uri).app_context():
+            seed_catalog(args.seed)
+
+    for workers in args.workers:
+        stats = run_level(workers, args.threads, uri, args.path, args.concurrency, args.duration)
+        print(f"{workers:>3} workers x {args.threads} threads: {stats['rps']:8.1f} req/s | "
+              f"p50 {stats['p50_ms']:.1f} ms | p99 {stats['p99_ms']:.1f} ms | errors {stats['errors']}")
+
+    if tmp_dir is not None:
+        tmp_dir.cleanup()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,160 @@
+"""
+Local check of read-replica routing and fallback (replicas.py), with two
+databases standing in for the primary and the replica.
+
+    cd backend && python -m benchmarks.replica_failover
+    cd backend && python -m benchmarks.replica_failover \\
+        --primary-uri postgresql://postgres:pw@localhost:5432/shop \\
+        --replica-uri postgresql://postgres:pw@localhost:5433/shop \\
+        --break-command 'docker stop replica-db' --restore-command 'docker start replica-db'
+
+The two are independent databases, not a replication pair: both are seeded
+with the same catalog and the replica then loses one product, so the `total`
+of /api/products/search tells which one served a read. The check:
+
+1. reads go to the replica, a purchase goes to the primary and the
+   product's detail read (kept on the primary) shows it at once;
+2. the replica breaks (the SQLite file is overwritten, or --break-command
+   runs) while reads continue: none may fail, and the time until they are
+   served by the primary and until the monitor marks the replica down is
+   printed;
+3. the replica is restored, and the time until reads go back to it is printed.
+
+Exits non-zero when a read fails or a step does not finish within --timeout.
+Replica lag is only measured on Postgres, so lag-based fallback is not
+exercised here.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from sqlalchemy import delete
+
+from benchmarks.common import make_app, seed_catalog
+from models import db, Product, RestockLog
+
+PROBE = '/api/products/search?limit=1'
+
+
+def seed(primary_uri, replica_uri, products):
+    for uri in (primary_uri, replica_uri):
+        with make_app(uri).app_context():
+            seed_catalog(products, logs_per_product=2)
+    with make_app(replica_uri).app_context():
+        db.session.execute(delete(RestockLog).where(RestockLog.product_id == products))
+        db.session.execute(delete(Product).where(Product.id == products))
+        db.session.commit()
+    return {products: 'primary', products - 1: 'replica'}
+
+
+def source(client, sources):
+    """'primary' or 'replica' for the database that served one read; None when it failed."""
+    response = client.get(PROBE)
+    if response.status_code != 200:
+        return None
+    return sources.get(response.json['total'])
+
+
+def wait_for(condition, timeout, on_tick=None):
+    """Seconds until `condition()` holds, polling as fast as reads allow; None after `timeout`."""
+    started = time.perf_counter()
+    while time.perf_counter() - started < timeout:
+        if on_tick is not None:
+            on_tick()
+        if condition():
+            return time.perf_counter() - started
+    return None
+
+
+def run_command(command):
+    subprocess.run(command, shell=True, check=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--primary-uri')
+    parser.add_argument('--replica-uri')
+    parser.add_argument('--products', type=int, default=1000)
+    parser.add_argument('--check-seconds', type=float, default=2, help='REPLICA_CHECK_SECONDS')
+    parser.add_argument('--timeout', type=float, default=30)
+    parser.add_argument('--break-command', help='shell command that takes the replica down')
+    parser.add_argument('--restore-command', help='shell command that brings it back')
+    args = parser.parse_args()
+
+    tmp_dir = None
+    primary_uri, replica_uri = args.primary_uri, args.replica_uri
+    if primary_uri is None or replica_uri is None:
+        tmp_dir = tempfile.TemporaryDirectory()
+        primary_uri = 'sqlite:///' + os.path.join(tmp_dir.name, 'primary.db')
+        replica_uri = 'sqlite:///' + os.path.join(tmp_dir.name, 'replica.db')
+    replica_path = replica_uri[len('sqlite:///'):] if replica_uri.startswith('sqlite:///') else None
+    if replica_path is None and not (args.break_command and args.restore_command):
+        parser.error('--break-command and --restore-command are needed unless the replica is SQLite')
+
+    sources = seed(primary_uri, replica_uri, args.products)
+    os.environ.update({
+        'DATABASE_URL': primary_uri,
+        'REPLICA_DATABASE_URL': replica_uri,
+        'REPLICA_CHECK_SECONDS': str(args.check_seconds),
+        'CACHE_TTL_SECONDS': '0',
+    })
+    # app_config reads the environment at import time
+    from app import create_app
+
+    app = create_app()
+    client = app.test_client()
+    failures = []
+    results = {}
+
+    def served_by(name):
+        def condition():
+            served = source(client, sources)
+            if served is None:
+                failures.append(time.perf_counter())
+            return served == name
+        return condition
+
+    monitor = app.extensions['db_replica']
+
+    results['reads on the replica'] = wait_for(served_by('replica'), args.timeout)
+    stock = client.get('/api/user/products/1').json['stock_level']
+    client.post('/api/user/products/1/purchase', json={'quantity': 1})
+    after = client.get('/api/user/products/1').json['stock_level']
+    print(f"purchase: stock {stock} -> {after} on the next detail read")
+    if after != stock - 1:
+        failures.append(time.perf_counter())
+
+    if replica_path is not None:
+        with open(replica_path, 'rb') as f:
+            saved = f.read()
+        with open(replica_path, 'wb') as f:
+            f.write(b'not a database' * 1024)
+    else:
+        run_command(args.break_command)
+    results['reads on the primary'] = wait_for(served_by('primary'), args.timeout)
+    results['replica marked down'] = wait_for(
+        lambda: not monitor.status()['replica']['up'], args.timeout, on_tick=served_by('primary'))
+
+    if replica_path is not None:
+        with open(replica_path, 'wb') as f:
+            f.write(saved)
+    else:
+        run_command(args.restore_command)
+    results['back on the replica'] = wait_for(served_by('replica'), args.timeout)
+
+    if tmp_dir is not None:
+        tmp_dir.cleanup()
+    for step, seconds in results.items():
+        print(f"{step:<24} {'timed out' if seconds is None else f'{seconds * 1000:8.0f} ms'}")
+    print(f"failed reads: {len(failures)}")
+    if failures or None in results.values():
+        print("FAILED")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == '__main__':
+    main()
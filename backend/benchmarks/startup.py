@@ -0,0 +1,156 @@
+"""
+Backend cold-start time against a budget, and the import-time profile.
+
+    cd backend && python -m benchmarks.startup
+    cd backend && python -m benchmarks.startup --write-profile benchmarks/import_profile.txt
+
+Two numbers, each the median of --runs fresh processes:
+
+- import: a new interpreter running `import wsgi` (every module plus
+  create_app()), from spawn to exit;
+- ready: gunicorn (gunicorn.conf.py) spawned until /ready first answers 200,
+  i.e. a worker has booted and warmed its connection pool.
+
+Exits non-zero when either median is over its budget (--import-budget-ms,
+--ready-budget-ms). --write-profile regenerates the checked-in
+`python -X importtime` profile; compare it with the old one to see which
+import got slower. Defaults to a temporary SQLite file.
+"""
+import argparse
+import http.client
+import os
+import platform
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.common import make_app
+from benchmarks.load_test import BACKEND_DIR, _free_port, start_gunicorn
+from models import db
+
+IMPORT_BUDGET_MS = 1500
+READY_BUDGET_MS = 5000
+PROFILE_TOP = 40
+
+
+def _env(database_uri):
+    env = dict(os.environ, DATABASE_URL=database_uri)
+    env.pop('PROMETHEUS_MULTIPROC_DIR', None)
+    return env
+
+
+def time_import(database_uri):
+    started = time.perf_counter()
+    subprocess.run([sys.executable, '-c', 'import wsgi'], cwd=BACKEND_DIR, env=_env(database_uri), check=True)
+    return time.perf_counter() - started
+
+
+def _ready(port):
+    try:
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=2)
+        conn.request('GET', '/ready')
+        return conn.getresponse().status == 200
+    except OSError:
+        return False
+
+
+def time_ready(database_uri, workers, threads, timeout=60):
+    port = _free_port()
+    started = time.perf_counter()
+    server = start_gunicorn(workers, threads, database_uri, port)
+    try:
+        while not _ready(port):
+            if time.perf_counter() - started > timeout:
+                raise RuntimeError(f"/ready did not answer 200 within {timeout}s")
+            time.sleep(0.01)
+        return time.perf_counter() - started
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=30)
+
+
+def import_profile(database_uri):
+    """(self_us, cumulative_us, depth, module) for every import made by `import wsgi`."""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import wsgi'],
+        cwd=BACKEND_DIR, env=_env(database_uri), capture_output=True, text=True, check=True,
+    )
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip())) // 2
+        entries.append((int(self_us), int(cumulative_us), depth, name.strip()))
+    return entries
+
+
+def write_profile(path, entries):
+    top_level = [e for e in entries if e[2] == 0]
+    total_ms = sum(e[1] for e in top_level) / 1000
+    own = {name[:-3] for name in os.listdir(BACKEND_DIR) if name.endswith('.py')}
+    lines = [
+        "# Import-time profile of `import wsgi` (python -X importtime), slowest first.",
+        "# Regenerate: cd backend && python -m benchmarks.startup --write-profile benchmarks/import_profile.txt",
+        f"# Python {platform.python_version()}, {len(entries)} modules, {total_ms:.0f} ms in total",
+        "",
+        "## Top-level imports",
+        f"{'cumulative_ms':>13} {'self_ms':>8}  module",
+    ]
+    lines += [f"{c / 1000:13.1f} {s / 1000:8.1f}  {name}" for s, c, _, name in sorted(top_level, key=lambda e: -e[1])]
+    lines += ["", f"## Slowest {PROFILE_TOP} modules at any depth", f"{'cumulative_ms':>13} {'self_ms':>8}  module"]
+    lines += [f"{c / 1000:13.1f} {s / 1000:8.1f}  {name}"
+              for s, c, _, name in sorted(entries, key=lambda e: -e[1])[:PROFILE_TOP]]
+    lines += ["", "## Backend modules", f"{'cumulative_ms':>13} {'self_ms':>8}  module"]
+    lines += [f"{c / 1000:13.1f} {s / 1000:8.1f}  {name}"
+              for s, c, _, name in sorted(entries, key=lambda e: -e[1]) if name in own]
+    with open(path, 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+    return total_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--import-budget-ms', type=float, default=IMPORT_BUDGET_MS)
+    parser.add_argument('--ready-budget-ms', type=float, default=READY_BUDGET_MS)
+    parser.add_argument('--database-uri')
+    parser.add_argument('--write-profile', metavar='PATH', help='write the import-time profile here')
+    args = parser.parse_args()
+
+    tmp_dir = None
+    uri = args.database_uri
+    if uri is None:
+        tmp_dir = tempfile.TemporaryDirectory()
+        uri = 'sqlite:///' + os.path.join(tmp_dir.name, 'startup.db')
+        with make_app(uri).app_context():
+            db.create_all()
+
+    import_ms = statistics.median(time_import(uri) for _ in range(args.runs)) * 1000
+    ready_ms = statistics.median(time_ready(uri, args.workers, args.threads) for _ in range(args.runs)) * 1000
+    print(f"import wsgi:        {import_ms:7.0f} ms (budget {args.import_budget_ms:.0f} ms)")
+    print(f"spawn to /ready 200: {ready_ms:6.0f} ms (budget {args.ready_budget_ms:.0f} ms, "
+          f"{args.workers} workers x {args.threads} threads)")
+
+    if args.write_profile:
+        total_ms = write_profile(args.write_profile, import_profile(uri))
+        print(f"import profile ({total_ms:.0f} ms) written to {args.write_profile}")
+
+    if tmp_dir is not None:
+        tmp_dir.cleanup()
+    over = [name for name, value, budget in (
+        ("import", import_ms, args.import_budget_ms), ("ready", ready_ms, args.ready_budget_ms),
+    ) if value > budget]
+    if over:
+        print(f"OVER BUDGET: {', '.join(over)}")
+        sys.exit(1)
+    print("OK: within the startup budget")
+
+
+if __name__ == '__main__':
+    main()
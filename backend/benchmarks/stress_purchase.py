@@ -0,0 +1,97 @@
+"""
+Fire many concurrent purchases at one hot SKU and check nothing is oversold.
+
+    cd backend && python -m benchmarks.stress_purchase --purchases 5000 --workers 32
+
+Defaults to a temporary SQLite file; pass --database-uri to run against a
+local PostgreSQL instead. --write-behind queues the restock_log entries
+(see log_writer.py) and flushes them before checking. Exits non-zero if
+stock, logs and successful purchases disagree.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import inventory
+import log_writer
+from benchmarks.common import make_app
+from models import db, Product, RestockLog
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--purchases', type=int, default=5000)
+    parser.add_argument('--workers', type=int, default=32)
+    parser.add_argument('--stock', type=int, default=3000,
+                        help='initial stock; keep it below --purchases to exercise the sold-out path')
+    parser.add_argument('--write-behind', action='store_true', help='batch restock_log writes in the background')
+    parser.add_argument('--database-uri')
+    args = parser.parse_args()
+
+    tmp_dir = None
+    uri = args.database_uri
+    if uri is None:
+        tmp_dir = tempfile.TemporaryDirectory()
+        uri = 'sqlite:///' + os.path.join(tmp_dir.name, 'stress.db')
+
+    bench_app = make_app(uri)
+    bench_app.config['RESTOCK_LOG_WRITE_BEHIND'] = args.write_behind
+    log_writer.init_app(bench_app)
+    with bench_app.app_context():
+        db.drop_all()
+        db.create_all()
+        hot = Product(name='Hot SKU', sku='HOT-1', stock_level=args.stock, low_stock_threshold=10)
+        db.session.add(hot)
+        db.session.commit()
+        product_id = hot.id
+
+    def buy(_):
+        with bench_app.app_context():
+            try:
+                inventory.purchase(product_id, 1)
+                return True
+            except inventory.InsufficientStock:
+                return False
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        results = list(pool.map(buy, range(args.purchases)))
+    elapsed = time.perf_counter() - started
+    writer = bench_app.extensions.get('restock_log_writer')
+    if writer is not None:
+        flush_started = time.perf_counter()
+        writer.close()
+        print(f"write-behind queue flushed in {time.perf_counter() - flush_started:.2f}s after the last purchase")
+
+    with bench_app.app_context():
+        sold = sum(results)
+        hot = db.session.get(Product, product_id)
+        final_stock = hot.stock_level
+        logged = -(db.session.query(db.func.sum(RestockLog.quantity)).scalar() or 0)
+        flagged_low = hot.low_stock_since is not None
+
+    mode = 'write-behind' if args.write_behind else 'inline'
+    print(f"{args.purchases} purchases, {args.workers} workers, {mode} log: {sold} succeeded in {elapsed:.2f}s "
+          f"({args.purchases / elapsed:.0f} req/s)")
+    print(f"final stock {final_stock}, logged {logged}, flagged low-stock {flagged_low}")
+
+    ok = (
+        final_stock >= 0
+        and final_stock == args.stock - sold
+        and logged == sold
+        and sold == min(args.stock, args.purchases)
+        and flagged_low == (final_stock <= 10)
+    )
+    if tmp_dir is not None:
+        tmp_dir.cleanup()
+    if not ok:
+        print("FAILED: oversell or lost update detected")
+        sys.exit(1)
+    print("OK: no oversell, no lost updates")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,424 @@
+"""
+Benchmark every API endpoint on a synthetic catalog and write a JSON report.
+
+    cd backend && python -m benchmarks.suite --products 10000 --concurrency 8 --output bench.json
+    cd backend && python -m benchmarks.suite --skip-seed --database-uri postgresql://... --compare base.json
+
+The generator bulk-loads --products products over --categories categories,
+--logs-per-product restock entries spread over --history-days, and puts
+--low-stock-ratio of the catalog at or below its threshold. Daily snapshots
+are backfilled so the trend endpoints have data.
+
+Each endpoint then gets --requests requests from --concurrency clients,
+through the Flask test client (in process), over HTTP against gunicorn
+(gunicorn.conf.py), or both (--driver). Read endpoints run first, then writes,
+then deletes, so every driver sees the same sequence of states. The stream
+endpoint is left out: it holds the connection open by design.
+
+Per endpoint the report has throughput, p50/p95/p99 latency, the status
+codes seen, SQL statements per request (from the app's own
+flask_http_request_db_queries metric) and the peak RSS of the serving
+processes so far. --compare prints the change against an earlier report.
+Defaults to a temporary SQLite file; pass a postgresql:// URI for numbers
+that mean something.
+"""
+import argparse
+import http.client
+import json
+import os
+import platform
+import resource
+import signal
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+
+from prometheus_client.parser import text_string_to_metric_families
+
+from benchmarks.common import NOUNS, make_app, seed_catalog
+from benchmarks.load_test import BACKEND_DIR, _free_port, _wait_until_up, start_gunicorn
+
+QUERIES_METRIC = 'flask_http_request_db_queries_sum'
+
+
+# ---------- Workload ----------
+
+def _product_id(n_products, i):
+    # spread requests over the catalog without a shared RNG between clients
+    return (i * 7919) % n_products + 1
+
+
+def _sku(n_products, i):
+    return f"SKU-{_product_id(n_products, i):07d}"
+
+
+# (name, share of --requests, build(n_products, run_token, i) -> (method, path, json body))
+ENDPOINTS = (
+    ("GET /health", 1, lambda n, run, i: ('GET', '/health', None)),
+    ("GET /ready", 1, lambda n, run, i: ('GET', '/ready', None)),
+    ("GET /metrics", 0.25, lambda n, run, i: ('GET', '/metrics', None)),
+    ("GET /api/user/products?limit=50", 1, lambda n, run, i: (
+        'GET', f'/api/user/products?limit=50&after_id={_product_id(n, i) - 1}', None)),
+    ("GET /api/user/products", 0.05, lambda n, run, i: ('GET', '/api/user/products', None)),
+    ("GET /api/user/products/<id>", 1, lambda n, run, i: ('GET', f'/api/user/products/{_product_id(n, i)}', None)),
+    ("GET /api/products?limit=50", 1, lambda n, run, i: (
+        'GET', f'/api/products?limit=50&category=Category%20{i % 5}', None)),
+    ("GET /api/products/<id>", 1, lambda n, run, i: ('GET', f'/api/products/{_product_id(n, i)}', None)),
+    ("GET /api/products/low-stock", 1, lambda n, run, i: ('GET', '/api/products/low-stock?limit=50', None)),
+    ("GET /api/products/search", 1, lambda n, run, i: (
+        'GET', f'/api/products/search?q={NOUNS[i % len(NOUNS)].lower()}&min_price=50&limit=50', None)),
+    ("GET /api/restocks", 1, lambda n, run, i: ('GET', '/api/restocks?limit=50', None)),
+    ("GET /api/dashboard/summary", 1, lambda n, run, i: ('GET', '/api/dashboard/summary', None)),
+    ("GET /api/analytics/inventory-trend", 0.5, lambda n, run, i: ('GET', '/api/analytics/inventory-trend', None)),
+    ("GET /api/analytics/product-trend/<id>", 1, lambda n, run, i: (
+        'GET', f'/api/analytics/product-trend/{_product_id(n, i)}', None)),
+    ("GET /api/analytics/metrics", 0.1, lambda n, run, i: ('GET', '/api/analytics/metrics?days=30', None)),
+    ("POST /api/user/products/<id>/purchase", 1, lambda n, run, i: (
+        'POST', f'/api/user/products/{_product_id(n, i)}/purchase', {"quantity": 1})),
+    ("POST /api/user/orders", 1, lambda n, run, i: ('POST', '/api/user/orders', {
+        "items": [{"product_id": _product_id(n, i * 3 + k), "quantity": 1} for k in range(3)]})),
+    ("POST /api/products/<id>/restock", 1, lambda n, run, i: (
+        'POST', f'/api/products/{_product_id(n, i)}/restock', {"quantity": 20})),
+    ("PUT /api/products/<id>", 1, lambda n, run, i: ('PUT', f'/api/products/{_product_id(n, i)}', {
+        "name": f"Product {_product_id(n, i)}", "sku": _sku(n, i), "category": f"Category {i % 5}",
+        "price": 10.0, "cost": 5.0, "stock_level": 50 + i % 50})),
+    ("POST /api/products", 1, lambda n, run, i: ('POST', '/api/products', {
+        "name": f"Bench {run}-{i}", "sku": f"BENCH-{run}-{i}", "category": "Bench",
+        "price": 10.0, "cost": 5.0, "stock_level": 100})),
+    ("POST /api/products/bulk", 0.1, lambda n, run, i: ('POST', '/api/products/bulk', [
+        {"name": f"Product {_product_id(n, i * 50 + k)}", "sku": _sku(n, i * 50 + k), "stock_level": 100}
+        for k in range(50)])),
+    # highest ids first, each deleted once
+    ("DELETE /api/products/<id>", 0.25, lambda n, run, i: ('DELETE', f'/api/products/{n - i}', None)),
+)
+
+
+def _requests_for(share, requests, n_products):
+    return max(1, min(int(requests * share), n_products))
+
+
+def percentile(ordered, q):
+    """Nearest-rank percentile of an already sorted list."""
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, max(0, int(round(q / 100 * len(ordered))) - 1))]
+
+
+def _summarize(latencies, statuses, elapsed, queries, peak_rss_mb):
+    ordered = sorted(latencies)
+    ms = lambda value: round(value * 1000, 3) if value is not None else None
+    return {
+        "requests": len(ordered),
+        "errors": sum(count for status, count in statuses.items() if status == 'error' or int(status) >= 500),
+        "statuses": dict(sorted(statuses.items())),
+        "rps": round(len(ordered) / elapsed, 1) if elapsed else None,
+        "p50_ms": ms(percentile(ordered, 50)),
+        "p95_ms": ms(percentile(ordered, 95)),
+        "p99_ms": ms(percentile(ordered, 99)),
+        "queries_per_request": round(queries / len(ordered), 2) if ordered and queries is not None else None,
+        "peak_rss_mb": peak_rss_mb,
+    }
+
+
+def _tally(statuses, status):
+    statuses[status] = statuses.get(status, 0) + 1
+
+
+def _split(indices, parts):
+    return [indices[k::parts] for k in range(parts) if indices[k::parts]]
+
+
+# ---------- Flask test client ----------
+
+def _queries_executed(registry):
+    return sum(
+        sample.value
+        for family in registry.collect() for sample in family.samples
+        if sample.name == QUERIES_METRIC
+    )
+
+
+def run_test_client(n_products, run_token, requests, concurrency):
+    # app_config reads DATABASE_URL at import time, so the app is only imported now
+    from prometheus_client import REGISTRY
+    from app import create_app
+
+    app = create_app()
+    # like a deployment, send traffic only once /ready says the pool is warm
+    while app.test_client().get('/ready').status_code != 200:
+        time.sleep(0.05)
+
+    def client_worker(build, indices):
+        client = app.test_client()
+        latencies, statuses = [], {}
+        for i in indices:
+            method, path, body = build(n_products, run_token, i)
+            started = time.perf_counter()
+            try:
+                response = client.open(path, method=method, json=body)
+                response.get_data()
+                response.close()
+                _tally(statuses, str(response.status_code))
+            except Exception:
+                _tally(statuses, 'error')
+            latencies.append(time.perf_counter() - started)
+        return latencies, statuses
+
+    results = {}
+    for name, share, build in ENDPOINTS:
+        indices = list(range(_requests_for(share, requests, n_products)))
+        queries_before = _queries_executed(REGISTRY)
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            outcomes = list(pool.map(lambda chunk: client_worker(build, chunk), _split(indices, concurrency)))
+        elapsed = time.perf_counter() - started
+        latencies, statuses = _merge(outcomes)
+        # ru_maxrss is in kilobytes on Linux
+        peak_rss_mb = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+        results[name] = _summarize(latencies, statuses, elapsed, _queries_executed(REGISTRY) - queries_before,
+                                   peak_rss_mb)
+        print(_line('test_client', name, results[name]))
+    return results
+
+
+def _merge(outcomes):
+    latencies, statuses = [], {}
+    for client_latencies, client_statuses in outcomes:
+        latencies.extend(client_latencies)
+        for status, count in client_statuses.items():
+            statuses[status] = statuses.get(status, 0) + count
+    return latencies, statuses
+
+
+# ---------- HTTP (gunicorn) ----------
+
+def _http_client(port, endpoint_index, n_products, run_token, indices):
+    """One client process: its share of one endpoint's requests on a keep-alive connection."""
+    build = ENDPOINTS[endpoint_index][2]
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+    latencies, statuses = [], {}
+    for i in indices:
+        method, path, body = build(n_products, run_token, i)
+        payload = json.dumps(body) if body is not None else None
+        headers = {'Content-Type': 'application/json'} if payload is not None else {}
+        started = time.perf_counter()
+        try:
+            conn.request(method, path, body=payload, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            _tally(statuses, str(response.status))
+        except (OSError, http.client.HTTPException):
+            _tally(statuses, 'error')
+            conn.close()
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+        latencies.append(time.perf_counter() - started)
+    conn.close()
+    return latencies, statuses
+
+
+def _get_status(port, path):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    conn.request('GET', path)
+    status = conn.getresponse().status
+    conn.close()
+    return status
+
+
+def _scrape_queries(port):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    conn.request('GET', '/metrics')
+    text = conn.getresponse().read().decode()
+    conn.close()
+    return sum(
+        sample.value
+        for family in text_string_to_metric_families(text) for sample in family.samples
+        if sample.name == QUERIES_METRIC
+    )
+
+
+def _process_tree(pid):
+    pids = [pid]
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                # the command name may contain spaces; the parent pid follows the closing parenthesis
+                if int(f.read().rpartition(')')[2].split()[1]) == pid:
+                    pids.append(int(entry))
+        except (OSError, ValueError, IndexError):
+            continue
+    return pids
+
+
+def _peak_rss_mb(pid):
+    """Summed VmHWM (peak resident set) of a server and its workers; None off Linux."""
+    if not os.path.isdir('/proc'):
+        return None
+    total_kb = 0
+    for child in _process_tree(pid):
+        try:
+            with open(f'/proc/{child}/status') as f:
+                total_kb += next(int(line.split()[1]) for line in f if line.startswith('VmHWM:'))
+        except (OSError, StopIteration):
+            continue
+    return round(total_kb / 1024, 1)
+
+
+def run_http(database_uri, n_products, run_token, requests, concurrency, workers, threads):
+    port = _free_port()
+    server = start_gunicorn(workers, threads, database_uri, port)
+    results = {}
+    try:
+        _wait_until_up(port)
+        while _get_status(port, '/ready') != 200:
+            time.sleep(0.05)
+        with ProcessPoolExecutor(max_workers=concurrency) as pool:
+            for endpoint_index, (name, share, _) in enumerate(ENDPOINTS):
+                chunks = _split(list(range(_requests_for(share, requests, n_products))), concurrency)
+                queries_before = _scrape_queries(port)
+                started = time.perf_counter()
+                outcomes = list(pool.map(
+                    _http_client, [port] * len(chunks), [endpoint_index] * len(chunks),
+                    [n_products] * len(chunks), [run_token] * len(chunks), chunks,
+                ))
+                elapsed = time.perf_counter() - started
+                latencies, statuses = _merge(outcomes)
+                results[name] = _summarize(latencies, statuses, elapsed, _scrape_queries(port) - queries_before,
+                                           _peak_rss_mb(server.pid))
+                print(_line('http', name, results[name]))
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=30)
+    return results
+
+
+# ---------- Reporting ----------
+
+def _line(driver, name, stats):
+    return (f"{driver:<11} {name:<40} {stats['rps'] or 0:9.1f} req/s | p50 {stats['p50_ms']:8.2f} ms | "
+            f"p95 {stats['p95_ms']:8.2f} ms | p99 {stats['p99_ms']:8.2f} ms | "
+            f"{stats['queries_per_request'] if stats['queries_per_request'] is not None else '-':>6} q/req | "
+            f"errors {stats['errors']}")
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], cwd=BACKEND_DIR, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _change(new, old):
+    if new is None or not old:
+        return '     -'
+    return f"{(new - old) / old * 100:+6.1f}%"
+
+
+def compare(report, base):
+    """Print throughput and p95 changes per endpoint against an earlier report."""
+    print(f"\nchange against {base.get('commit') or 'base report'}:")
+    for key in ("dataset", "database", "requests", "concurrency"):
+        if report.get(key) != base.get(key):
+            print(f"note: {key} differs from the base report, so the numbers are not like for like")
+    for driver, endpoints in report["drivers"].items():
+        old_endpoints = base.get("drivers", {}).get(driver, {})
+        for name, stats in endpoints.items():
+            old = old_endpoints.get(name)
+            if old is None:
+                continue
+            print(f"{driver:<11} {name:<40} req/s {_change(stats['rps'], old['rps'])} | "
+                  f"p95 {_change(stats['p95_ms'], old['p95_ms'])} | "
+                  f"q/req {old['queries_per_request']} -> {stats['queries_per_request']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--products', type=int, default=10000)
+    parser.add_argument('--categories', type=int, default=20)
+    parser.add_argument('--logs-per-product', type=int, default=5)
+    parser.add_argument('--history-days', type=int, default=60)
+    parser.add_argument('--low-stock-ratio', type=float, default=0.05)
+    parser.add_argument('--seed', type=int, default=42, help='random seed for the generator')
+    parser.add_argument('--skip-seed', action='store_true', help='benchmark the existing data as it is')
+    parser.add_argument('--driver', choices=('test-client', 'http', 'both'), default='both')
+    parser.add_argument('--requests', type=int, default=200, help='requests per endpoint (some endpoints run fewer)')
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn workers for the http driver')
+    parser.add_argument('--threads', type=int, default=4, help='gunicorn threads per worker')
+    parser.add_argument('--database-uri')
+    parser.add_argument('--output', help='write the JSON report here (default: stdout)')
+    parser.add_argument('--compare', help='earlier JSON report to compare against')
+    args = parser.parse_args()
+
+    tmp_dir = None
+    uri = args.database_uri
+    if uri is None:
+        tmp_dir = tempfile.TemporaryDirectory()
+        uri = 'sqlite:///' + os.path.join(tmp_dir.name, 'suite.db')
+    os.environ['DATABASE_URL'] = uri
+    os.environ.pop('PROMETHEUS_MULTIPROC_DIR', None)
+
+    dataset = {
+        "products": args.products, "categories": args.categories, "logs_per_product": args.logs_per_product,
+        "history_days": args.history_days, "low_stock_ratio": args.low_stock_ratio, "seed": args.seed,
+    }
+    drivers = ('test-client', 'http') if args.driver == 'both' else (args.driver,)
+    report = {
+        "commit": _git_commit(),
+        "created_at": datetime.utcnow().isoformat(timespec='seconds') + 'Z',
+        "python": platform.python_version(),
+        "database": uri.split(':', 1)[0],
+        "dataset": None if args.skip_seed else dataset,
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "http_server": {"workers": args.workers, "threads": args.threads},
+        "seed_seconds": None,
+        "drivers": {},
+    }
+
+    import analytics
+    from models import db, Product
+
+    for driver in drivers:
+        # every driver starts from the same generated data
+        with make_app(uri).app_context():
+            if not args.skip_seed:
+                started = time.perf_counter()
+                seed_catalog(args.products, logs_per_product=args.logs_per_product,
+                             history_days=args.history_days, seed=args.seed,
+                             categories=args.categories, low_stock_ratio=args.low_stock_ratio)
+                analytics.backfill_snapshots()
+                report["seed_seconds"] = round(time.perf_counter() - started, 2)
+            n_products = db.session.query(db.func.max(Product.id)).scalar() or 1
+            db.session.remove()
+        run_token = str(int(time.time()))
+        if driver == 'test-client':
+            report["drivers"]["test_client"] = run_test_client(n_products, run_token, args.requests,
+                                                               args.concurrency)
+        else:
+            report["drivers"]["http"] = run_http(uri, n_products, run_token, args.requests, args.concurrency,
+                                                 args.workers, args.threads)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+        print(f"report written to {args.output}")
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report, json.load(f))
+
+    if tmp_dir is not None:
+        tmp_dir.cleanup()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,334 @@
+"""
+Read-through cache for product responses.
+
+Entries hold the serialized body, a strong ETag and the headers needed to
+replay the response, so hits and 304s skip both the database and JSON
+encoding.
+
+Invalidation is by dependency versions. Every write bumps the version of
+its product's id bucket (ROWS_PER_BUCKET ids); a write that can move a
+product in or out of a filter or facet (create, delete, edit, crossing the
+low-stock threshold) also bumps SHAPE. A paged listing depends on the
+buckets its id range covers, plus SHAPE when it is the last page or
+carries facets, and is served only while those versions hold; so a sale
+only drops the pages around that product. Product entries are deleted by
+key.
+
+The default backend is an in-process LRU with a TTL. Each process then
+also applies the writes of the others (and of asgi.py) as they arrive
+through the inventory change feed (events.py). Set CACHE_URL to a
+redis:// URL to share entries and versions between workers instead.
+Responses read from a replica are served but not cached while it lags or
+may not have replayed the last write to their dependencies yet.
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app, g, make_response, request
+from prometheus_client import Counter
+
+import events
+import replicas
+
+try:
+    import redis
+except ImportError:  # optional shared backend
+    redis = None
+
+CATALOG_VERSION_HEADER = 'X-Catalog-Version'
+REPLAYED_HEADERS = ('Content-Type', 'X-Next-After-Id')
+ROWS_PER_BUCKET = 256
+# a page spanning more buckets than this depends on every write instead
+MAX_PAGE_BUCKETS = 64
+SHAPE = 'shape'
+ANY_ROW = 'rows:any'
+
+CACHE_HITS = Counter('catalog_cache_hits_total', 'Product cache hits', ['kind'])
+CACHE_MISSES = Counter('catalog_cache_misses_total', 'Product cache misses', ['kind'])
+CACHE_EVICTIONS = Counter('catalog_cache_evictions_total', 'Product cache entries evicted by size or TTL')
+
+NO_VERSION = (0, 0.0)
+
+
+class LocalBackend:
+    """Thread-safe LRU with a per-entry TTL."""
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._sequence = 0
+        self._generation = 0
+        self._versions = {}  # dependency -> (sequence, time.time()) of its last bump
+
+    def get(self, key):
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                CACHE_EVICTIONS.inc()
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                CACHE_EVICTIONS.inc()
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def sequence(self):
+        return self._sequence
+
+    def generation(self):
+        return self._generation
+
+    def versions(self, dependencies):
+        with self._lock:
+            return [self._versions.get(dependency, NO_VERSION) for dependency in dependencies]
+
+    def bump(self, dependencies, whole_catalog=False):
+        with self._lock:
+            self._sequence += 1
+            version = (self._sequence, time.time())
+            for dependency in dependencies:
+                self._versions[dependency] = version
+            if whole_catalog:
+                self._generation += 1
+                self._entries.clear()
+
+
+def _encode_entry(entry):
+    # JSON metadata line, then the body as is: nothing in the shared store is unpickled
+    body, etag, headers, dependencies = entry
+    return json.dumps([etag, headers, dependencies]).encode() + b'\n' + body
+
+
+def _decode_entry(raw):
+    meta, _, body = raw.partition(b'\n')
+    etag, headers, dependencies = json.loads(meta)
+    return body, etag, [tuple(header) for header in headers], {name: seq for name, seq in dependencies.items()}
+
+
+class RedisBackend:
+    """Shared backend; Redis handles expiry and eviction (maxmemory policy)."""
+
+    # one round trip: take the next sequence number and stamp every dependency with it
+    BUMP_SCRIPT = """
+        local sequence = redis.call('INCR', KEYS[1])
+        for i = 2, #KEYS do redis.call('SET', KEYS[i], sequence .. ':' .. ARGV[1]) end
+        return sequence
+    """
+
+    def __init__(self, url, ttl, prefix='catalog:'):
+        self.ttl = ttl
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(url)
+        self._bump = self._client.register_script(self.BUMP_SCRIPT)
+
+    def get(self, key):
+        raw = self._client.get(self.prefix + key)
+        return _decode_entry(raw) if raw is not None else None
+
+    def set(self, key, value):
+        self._client.set(self.prefix + key, _encode_entry(value), ex=max(1, int(self.ttl)))
+
+    def delete(self, key):
+        self._client.delete(self.prefix + key)
+
+    def sequence(self):
+        return int(self._client.get(self.prefix + 'sequence') or 0)
+
+    def generation(self):
+        return int(self._client.get(self.prefix + 'generation') or 0)
+
+    def versions(self, dependencies):
+        if not dependencies:
+            return []
+        stamps = self._client.mget([self.prefix + 'dep:' + dependency for dependency in dependencies])
+        versions = []
+        for stamp in stamps:
+            if stamp is None:
+                versions.append(NO_VERSION)
+            else:
+                sequence, _, changed_at = stamp.decode().partition(':')
+                versions.append((int(sequence), float(changed_at)))
+        return versions
+
+    def bump(self, dependencies, whole_catalog=False):
+        if whole_catalog:
+            self._client.incr(self.prefix + 'generation')
+        keys = [self.prefix + 'sequence'] + [self.prefix + 'dep:' + dependency for dependency in dependencies]
+        self._bump(keys=keys, args=[time.time()])
+
+
+def create_backend(config):
+    ttl = config.get('CACHE_TTL_SECONDS', 30)
+    url = config.get('CACHE_URL')
+    if url:
+        if redis is None:
+            raise RuntimeError("CACHE_URL is set but the 'redis' package is not installed")
+        return RedisBackend(url, ttl)
+    return LocalBackend(config.get('CACHE_MAX_ENTRIES', 10000), ttl)
+
+
+def init_app(app):
+    backend = create_backend(app.config)
+    app.extensions['product_cache'] = backend
+    if isinstance(backend, LocalBackend):
+        app.extensions['inventory_feed'].subscribe(lambda items: apply_events(backend, items))
+
+
+def _backend():
+    return current_app.extensions['product_cache']
+
+
+def _product_key(backend, product_id):
+    return f"product:{backend.generation()}:{product_id}"
+
+
+def product_key(product_id):
+    return _product_key(_backend(), product_id)
+
+
+def listing_key(endpoint, args):
+    query = '&'.join(f"{k}={v}" for k, v in sorted(args.items(multi=True)))
+    return f"listing:{_backend().generation()}:{endpoint}?{query}"
+
+
+def _rows(product_id):
+    return f"rows:{product_id // ROWS_PER_BUCKET}"
+
+
+def record_page(after_id, last_id, reaches_end, shaped=False):
+    """
+    Called by a paged view while it builds a cacheable response: its rows
+    are the matches with ids in (after_id, last_id]. `reaches_end` when no
+    match follows (new products would join the page); `shaped` when the
+    body also summarizes the whole catalog (facets, totals).
+    """
+    dependencies = set()
+    if last_id is not None:
+        first_bucket = ((after_id or 0) + 1) // ROWS_PER_BUCKET
+        last_bucket = last_id // ROWS_PER_BUCKET
+        if last_bucket - first_bucket >= MAX_PAGE_BUCKETS:
+            dependencies.add(ANY_ROW)
+        else:
+            dependencies.update(f"rows:{bucket}" for bucket in range(first_bucket, last_bucket + 1))
+    if reaches_end or shaped or last_id is None:
+        dependencies.add(SHAPE)
+    g._cache_dependencies = sorted(dependencies)
+
+
+def _is_low(state):
+    return state.stock_level is not None and state.stock_level <= state.low_stock_threshold
+
+
+def reshapes(before, after):
+    """Whether a change between two summary.ProductState can move the product in or out of a filter."""
+    if before is None or after is None:
+        return True
+    return before.price != after.price or _is_low(before) != _is_low(after)
+
+
+def invalidate_product(backend, product_id, reshaped=True):
+    # bump first: a concurrent miss that started before the write then skips storing its result
+    backend.bump([_rows(product_id), ANY_ROW] + ([SHAPE] if reshaped else []))
+    backend.delete(_product_key(backend, product_id))
+
+
+def apply_events(backend, items):
+    """Invalidate for change feed events, which also carry other processes' writes."""
+    for item in items:
+        if item["type"] == events.CATALOG_CHANGED:
+            backend.bump([SHAPE, ANY_ROW], whole_catalog=True)
+        elif item["type"] == events.STOCK_CHANGED:
+            data = item["data"]
+            reshaped = data["stock_level"] is None or data["previous_stock_level"] is None
+            invalidate_product(backend, data["product_id"], reshaped)
+        elif item["type"] in (events.LOW_STOCK_ENTERED, events.LOW_STOCK_EXITED, events.PRODUCT_UPDATED):
+            invalidate_product(backend, item["data"]["product_id"])
+
+
+def product_changed(product_id, reshaped=True):
+    """
+    Call after committing a write to one product; `reshaped=False` when it
+    only changed stock without crossing the low-stock threshold.
+    """
+    backend = current_app.extensions.get('product_cache')
+    if backend is None:  # app without a cache (scripts, benchmarks)
+        return
+    invalidate_product(backend, product_id, reshaped)
+
+
+def catalog_changed():
+    """Call after a write that may touch any product (bulk import)."""
+    backend = current_app.extensions.get('product_cache')
+    if backend is not None:
+        backend.bump([SHAPE, ANY_ROW], whole_catalog=True)
+
+
+def _reply(entry, version):
+    body, etag, headers, _ = entry
+    if request.if_none_match.contains(etag):
+        response = current_app.response_class(status=304)
+    else:
+        response = current_app.response_class(body, headers=headers)
+    response.set_etag(etag)
+    response.headers[CATALOG_VERSION_HEADER] = str(version)
+    return response
+
+
+def cached_response(kind, key, build, product_id=None):
+    """
+    Serve `key` from the cache, or call `build()` (anything a view may return)
+    and cache the result when it is a 200. Honours If-None-Match.
+
+    A product entry (`product_id` given) is dropped by key on writes; any
+    other entry is kept only while the dependencies `build` recorded with
+    record_page() keep their versions.
+    """
+    backend = _backend()
+    if isinstance(backend, LocalBackend):
+        current_app.extensions['inventory_feed'].start(current_app._get_current_object())
+    version = backend.sequence()
+    entry = backend.get(key)
+    if entry is not None:
+        dependencies = entry[3]
+        if not dependencies or [seq for seq, _ in backend.versions(list(dependencies))] == list(dependencies.values()):
+            CACHE_HITS.labels(kind).inc()
+            return _reply(entry, version)
+
+    CACHE_MISSES.labels(kind).inc()
+    g.pop('_cache_dependencies', None)
+    response = make_response(build())
+    dependencies = g.pop('_cache_dependencies', None)
+    if response.status_code != 200 or response.is_streamed or (dependencies is None and product_id is None):
+        response.headers[CATALOG_VERSION_HEADER] = str(version)
+        return response
+    body = response.get_data()
+    guarded = dependencies if product_id is None else [_rows(product_id)]
+    current = backend.versions(guarded)
+    entry = (
+        body,
+        hashlib.sha1(body).hexdigest(),
+        [(name, response.headers[name]) for name in REPLAYED_HEADERS if name in response.headers],
+        {} if product_id is not None else {name: seq for name, (seq, _) in zip(guarded, current)},
+    )
+    # skip storing when a write this depends on landed during the build, or a replica may not have it yet
+    if all(seq <= version for seq, _ in current) and replicas.served_current(max((t for _, t in current), default=0.0)):
+        backend.set(key, entry)
+    return _reply(entry, version)
@@ -0,0 +1,190 @@
+from datetime import datetime
+
+from flask import Response, json, jsonify, stream_with_context
+from sqlalchemy import and_, or_, select
+
+import cache
+from models import db, Product, is_low_stock
+from serialization import low_stock_dict
+
+PRODUCT_FIELDS = ('id', 'name', 'sku', 'category', 'price', 'cost', 'stock_level', 'low_stock_threshold')
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+STREAM_BATCH_SIZE = 1000
+NEXT_CURSOR_HEADER = 'X-Next-After-Id'
+LOW_STOCK_CURSOR_HEADER = 'X-Next-Cursor'
+
+
+def product_statement(product_id):
+    return select(*[getattr(Product, f) for f in PRODUCT_FIELDS]).where(Product.id == product_id)
+
+
+def product_dict(product_id):
+    """One product as a plain dict (the shape of Product.to_dict), or None."""
+    row = db.session.execute(product_statement(product_id)).first()
+    return row._asdict() if row is not None else None
+
+
+def parse_listing_args(args):
+    """Validate listing query parameters. Raises ValueError with a client-facing message."""
+    fields = PRODUCT_FIELDS
+    if args.get('fields'):
+        fields = tuple(f.strip() for f in args['fields'].split(',') if f.strip())
+        unknown = [f for f in fields if f not in PRODUCT_FIELDS]
+        if unknown or not fields:
+            raise ValueError(f"Unknown fields: {', '.join(unknown) or '(none given)'}")
+
+    try:
+        after_id = int(args['after_id']) if args.get('after_id') else None
+        limit = int(args['limit']) if args.get('limit') else None
+    except ValueError:
+        raise ValueError("after_id and limit must be integers")
+    if limit is not None and not 1 <= limit <= MAX_PAGE_SIZE:
+        raise ValueError(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+
+    fmt = args.get('format', 'json')
+    if fmt not in ('json', 'ndjson'):
+        raise ValueError("format must be 'json' or 'ndjson'")
+
+    return {
+        "fields": fields,
+        "after_id": after_id,
+        "limit": limit,
+        "category": args.get('category'),
+        "sku": args.get('sku'),
+        "format": fmt,
+    }
+
+
+def listing_statement(params, after_id, limit):
+    """SELECT for one keyset page; only the requested columns are selected."""
+    # id is always selected so the cursor can advance, then dropped if not requested
+    columns = [Product.id] + [getattr(Product, f) for f in params['fields'] if f != 'id']
+    stmt = select(*columns)
+    if params['category'] is not None:
+        stmt = stmt.where(Product.category == params['category'])
+    if params['sku'] is not None:
+        stmt = stmt.where(Product.sku == params['sku'])
+    if after_id is not None:
+        stmt = stmt.where(Product.id > after_id)
+    return stmt.order_by(Product.id).limit(limit)
+
+
+def page_from_rows(params, rows):
+    """Rows of listing_statement() as plain dicts, plus the id to continue after."""
+    keep_id = 'id' in params['fields']
+    page = []
+    for row in rows:
+        item = row._asdict()
+        if not keep_id:
+            del item['id']
+        page.append(item)
+    last_id = rows[-1].id if rows else None
+    return page, last_id
+
+
+def _fetch_page(params, after_id, limit):
+    rows = db.session.execute(listing_statement(params, after_id, limit)).all()
+    return page_from_rows(params, rows)
+
+
+def _stream_rows(params):
+    after_id = params['after_id']
+    while True:
+        page, last_id = _fetch_page(params, after_id, STREAM_BATCH_SIZE)
+        yield from page
+        if len(page) < STREAM_BATCH_SIZE:
+            return
+        after_id = last_id
+
+
+def _stream_json_array(params):
+    yield '['
+    first = True
+    for item in _stream_rows(params):
+        yield json.dumps(item) if first else ',' + json.dumps(item)
+        first = False
+    yield ']'
+
+
+def _stream_ndjson(params):
+    for item in _stream_rows(params):
+        yield json.dumps(item) + '\n'
+
+
+def product_listing_response(args):
+    """
+    Product listing shared by the storefront and admin endpoints.
+
+    With `limit` or `after_id` a single keyset page is returned and the cursor
+    for the next page is sent in the X-Next-After-Id header. Otherwise the
+    whole (filtered) catalog is streamed in batches, as a JSON array or as
+    NDJSON with `format=ndjson`, so memory stays flat whatever the size.
+    """
+    try:
+        params = parse_listing_args(args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    if params['limit'] is not None or params['after_id'] is not None:
+        limit = params['limit'] or DEFAULT_PAGE_SIZE
+        page, last_id = _fetch_page(params, params['after_id'], limit)
+        cache.record_page(params['after_id'], last_id, reaches_end=len(page) < limit)
+        response = jsonify(page)
+        if len(page) == limit:
+            response.headers[NEXT_CURSOR_HEADER] = str(last_id)
+        return response, 200
+
+    if params['format'] == 'ndjson':
+        return Response(stream_with_context(_stream_ndjson(params)), mimetype='application/x-ndjson'), 200
+    return Response(stream_with_context(_stream_json_array(params)), mimetype='application/json'), 200
+
+
+def _low_stock_after(since, product_id):
+    """Rows after the cursor (since, product_id) in low-stock order; `since` is None among the untimestamped tail."""
+    if since is None:
+        return and_(Product.low_stock_since.is_(None), Product.id < product_id)
+    return or_(
+        Product.low_stock_since < since,
+        and_(Product.low_stock_since == since, Product.id < product_id),
+        Product.low_stock_since.is_(None),
+    )
+
+
+def low_stock_response(args):
+    """
+    Products at or below their low-stock threshold, most recently dropped first,
+    read straight from the ix_products_low_stock_recent partial index. Products
+    without a low_stock_since (stock changed outside the app) come last.
+
+    Without `limit` the whole set is returned. With it, the next page is
+    requested with `after=<cursor>` from the X-Next-Cursor header.
+    """
+    try:
+        limit = int(args['limit']) if args.get('limit') else None
+        if limit is not None and not 1 <= limit <= MAX_PAGE_SIZE:
+            raise ValueError
+        after = None
+        if args.get('after'):
+            since, _, product_id = args['after'].rpartition('|')
+            after = (datetime.fromisoformat(since) if since else None, int(product_id))
+    except ValueError:
+        return jsonify({"error": f"limit must be between 1 and {MAX_PAGE_SIZE} and after a cursor from {LOW_STOCK_CURSOR_HEADER}"}), 400
+
+    stmt = select(
+        Product.id, Product.name, Product.sku, Product.stock_level, Product.low_stock_threshold,
+        Product.low_stock_since,
+    ).where(is_low_stock())
+    if after is not None:
+        stmt = stmt.where(_low_stock_after(*after))
+    stmt = stmt.order_by(Product.low_stock_since.desc().nulls_last(), Product.id.desc())
+    if limit:
+        stmt = stmt.limit(limit)
+    rows = db.session.execute(stmt).all()
+
+    response = jsonify([low_stock_dict(*row) for row in rows])
+    if limit and len(rows) == limit:
+        last = rows[-1]
+        since = last.low_stock_since.isoformat() if last.low_stock_since else ''
+        response.headers[LOW_STOCK_CURSOR_HEADER] = f"{since}|{last.id}"
+    return response, 200
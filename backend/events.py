@@ -0,0 +1,383 @@
+"""
+Inventory change feed for /api/stream/inventory (server-sent events).
+
+Write handlers call record() before they commit. The events are inserted
+into inventory_events in the same transaction, so a change and its events
+commit or roll back together, and the table ids double as resume tokens.
+
+Every worker process keeps one EventFeed: a short in-memory buffer that
+all of its stream clients read, so an open dashboard costs no queries.
+Committed events reach each worker's feed through a broker:
+
+- postgres: one pg_notify() per committing transaction, carrying the range
+  of its event ids; one LISTEN connection per worker, opened outside the
+  connection pool, receives it and reads those events from the table;
+- memory: published straight into the committing process's feed (single
+  process, tests, SQLite).
+
+Either way each feed also polls the table every EVENT_POLL_SECONDS, which
+picks up events from other processes in memory mode and anything missed
+while a LISTEN connection was down.
+"""
+import json
+import os
+import select as select_module
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+
+from flask import Response, current_app, has_app_context, jsonify
+from sqlalchemy import create_engine, delete, event, func, insert, or_, select, text
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import NullPool
+
+from models import db, InventoryEvent
+from serialization import dumps
+
+CHANNEL = 'inventory_events'
+BUFFER_SIZE = 1000
+MAX_REPLAY = 1000
+DEFAULT_POLL_SECONDS = 5
+DEFAULT_RETENTION_HOURS = 24
+HEARTBEAT_SECONDS = 15
+DEFAULT_STREAM_SECONDS = 300
+DEFAULT_MAX_STREAMS = 2
+RETRY_MILLISECONDS = 2000
+
+STOCK_CHANGED = 'stock_changed'
+LOW_STOCK_ENTERED = 'low_stock_entered'
+LOW_STOCK_EXITED = 'low_stock_exited'
+RESTOCK = 'restock'
+CATALOG_CHANGED = 'catalog_changed'
+PRODUCT_UPDATED = 'product_updated'
+# sent instead of a replay the feed can no longer serve; the client reloads everything
+RESET = 'reset'
+
+_PENDING = 'inventory_events'
+
+
+def _is_low(state):
+    return state is not None and state.stock_level is not None and state.stock_level <= state.low_stock_threshold
+
+
+def stock_events(product_id, before, after, logged=None):
+    """
+    Events for one product's change, as (type, product_id, data) drafts.
+    `before`/`after` are summary.ProductState (None on create/delete);
+    `logged` is the quantity of the restock_log entry written with it.
+    """
+    drafts = []
+    old_stock = before.stock_level if before else None
+    new_stock = after.stock_level if after else None
+    if old_stock != new_stock:
+        drafts.append((STOCK_CHANGED, product_id, {
+            "product_id": product_id, "stock_level": new_stock, "previous_stock_level": old_stock,
+        }))
+    current = after or before
+    if _is_low(after) and not _is_low(before):
+        drafts.append((LOW_STOCK_ENTERED, product_id, {
+            "product_id": product_id, "stock_level": new_stock, "low_stock_threshold": current.low_stock_threshold,
+        }))
+    elif _is_low(before) and not _is_low(after):
+        drafts.append((LOW_STOCK_EXITED, product_id, {
+            "product_id": product_id, "stock_level": new_stock, "low_stock_threshold": current.low_stock_threshold,
+        }))
+    if logged:
+        drafts.append((RESTOCK, product_id, {"product_id": product_id, "quantity": logged}))
+    return drafts
+
+
+def product_updated(product_id):
+    """Event for an edit to anything but stock (name, SKU, category, prices, threshold)."""
+    return (PRODUCT_UPDATED, product_id, {"product_id": product_id})
+
+
+def insert_statement(drafts, now=None):
+    now = now or datetime.utcnow()
+    return insert(InventoryEvent).values([
+        {"type": kind, "product_id": product_id, "data": data, "created_at": now}
+        for kind, product_id, data in drafts
+    ]).returning(InventoryEvent.id, InventoryEvent.type, InventoryEvent.data, InventoryEvent.created_at)
+
+
+def as_event(row):
+    event_id, kind, data, created_at = row
+    return {"id": event_id, "type": kind, "data": data, "timestamp": created_at.isoformat()}
+
+
+def notify_statement():
+    """pg_notify for one transaction's events; bind `payload` to notify_payload(ids)."""
+    return text(f"SELECT pg_notify('{CHANNEL}', :payload)")
+
+
+def notify_payload(event_ids):
+    # a range rather than the events: one notification per transaction, far below the 8000-byte payload limit
+    return dumps({"first": min(event_ids), "last": max(event_ids)}).decode()
+
+
+def record(drafts):
+    """Insert events into the current transaction; they are published when it commits."""
+    if not drafts:
+        return
+    rows = db.session.execute(insert_statement(drafts)).all()
+    db.session.info.setdefault(_PENDING, []).extend(as_event(row) for row in rows)
+
+
+def catalog_changed(**data):
+    """Record and commit a catalog-wide event (bulk import); clients refetch everything."""
+    record([(CATALOG_CHANGED, None, data)])
+    db.session.commit()
+
+
+def _feed():
+    return current_app.extensions.get('inventory_feed') if has_app_context() else None
+
+
+@event.listens_for(Session, 'before_commit')
+def _notify_in_transaction(session):
+    feed = _feed()
+    if feed is not None and feed.broker == 'postgres' and session.info.get(_PENDING):
+        event_ids = [item["id"] for item in session.info[_PENDING]]
+        session.execute(notify_statement(), {"payload": notify_payload(event_ids)})
+
+
+@event.listens_for(Session, 'after_commit')
+def _publish_committed(session):
+    committed = session.info.pop(_PENDING, None)
+    feed = _feed()
+    if committed and feed is not None and feed.broker == 'memory':
+        feed.publish(committed)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _drop_rolled_back(session):
+    session.info.pop(_PENDING, None)
+
+
+class EventFeed:
+    """Per-process buffer of recent events that stream clients wait on."""
+
+    def __init__(self, broker, poll_seconds, buffer_size=BUFFER_SIZE):
+        self.broker = broker
+        self.poll_seconds = poll_seconds
+        self._buffer = deque(maxlen=buffer_size)  # (sequence, event)
+        self._seen = deque(maxlen=buffer_size * 4)
+        self._seen_ids = set()
+        self._sequence = 0
+        self._max_id = 0
+        self._cond = threading.Condition()
+        self._listener_pid = None
+        self._streams = 0
+        self._subscribers = []
+
+    def subscribe(self, callback):
+        """Call `callback(events)` with every batch of new events, e.g. to invalidate a local cache."""
+        self._subscribers.append(callback)
+
+    def publish(self, items):
+        """Add events, skipping ids already seen (a notify and a poll can deliver the same one)."""
+        fresh = []
+        with self._cond:
+            for item in items:
+                if item["id"] in self._seen_ids:
+                    continue
+                fresh.append(item)
+                if len(self._seen) == self._seen.maxlen:
+                    self._seen_ids.discard(self._seen[0])
+                self._seen.append(item["id"])
+                self._seen_ids.add(item["id"])
+                self._sequence += 1
+                self._buffer.append((self._sequence, item))
+                self._max_id = max(self._max_id, item["id"])
+            self._cond.notify_all()
+        if fresh:
+            for callback in self._subscribers:
+                callback(fresh)
+
+    def position(self):
+        with self._cond:
+            return self._sequence
+
+    def wait(self, position, timeout):
+        """Events published after `position`, waiting up to `timeout` seconds; returns (events, position)."""
+        with self._cond:
+            self._cond.wait_for(lambda: self._sequence > position, timeout)
+            items = [item for seq, item in self._buffer if seq > position]
+            return items, self._sequence
+
+    def open_stream(self, limit):
+        """Take one of this process's `limit` stream slots; False when they are all in use."""
+        with self._cond:
+            if self._streams >= limit:
+                return False
+            self._streams += 1
+            return True
+
+    def close_stream(self):
+        with self._cond:
+            self._streams -= 1
+
+    def start(self, app):
+        """Start this process's listener thread; a no-op once running (re-run after a fork)."""
+        with self._cond:
+            if self._listener_pid == os.getpid():
+                return
+            self._listener_pid = os.getpid()
+            with app.app_context():
+                latest = db.session.query(func.coalesce(func.max(InventoryEvent.id), 0)).scalar()
+                db.session.remove()
+            self._max_id = max(self._max_id, latest)
+        threading.Thread(target=self._run, args=(app,), name='inventory-feed', daemon=True).start()
+
+    def _catch_up(self):
+        self._publish_where(InventoryEvent.id > self._max_id, limit=MAX_REPLAY)
+
+    def _fetch_notified(self, ranges):
+        """Publish the events of the notified transactions; `ranges` are notify_payload() dicts."""
+        if ranges:
+            self._publish_where(or_(*(InventoryEvent.id.between(r["first"], r["last"]) for r in ranges)))
+
+    def _publish_where(self, condition, limit=None):
+        rows = db.session.execute(
+            select(InventoryEvent.id, InventoryEvent.type, InventoryEvent.data, InventoryEvent.created_at)
+            .where(condition)
+            .order_by(InventoryEvent.id)
+            .limit(limit)
+        ).all()
+        db.session.remove()
+        if rows:
+            self.publish([as_event(row) for row in rows])
+
+    def _listen(self, app):
+        # its own connection, outside the pool, so LISTEN does not hold a pooled connection for good
+        options = app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {}
+        engine = create_engine(db.engine.url, poolclass=NullPool, connect_args=options.get('connect_args', {}))
+        connection = engine.raw_connection()
+        try:
+            dbapi_connection = connection.driver_connection
+            dbapi_connection.autocommit = True
+            dbapi_connection.cursor().execute(f"LISTEN {CHANNEL}")
+            self._catch_up()
+            while True:
+                if select_module.select([dbapi_connection], [], [], self.poll_seconds) == ([], [], []):
+                    self._catch_up()
+                    continue
+                dbapi_connection.poll()
+                ranges = [json.loads(n.payload) for n in dbapi_connection.notifies]
+                dbapi_connection.notifies.clear()
+                self._fetch_notified(ranges)
+        finally:
+            connection.invalidate()
+            engine.dispose()
+
+    def _run(self, app):
+        with app.app_context():
+            while True:
+                try:
+                    if self.broker == 'postgres':
+                        self._listen(app)
+                    else:
+                        time.sleep(self.poll_seconds)
+                        self._catch_up()
+                except Exception:
+                    current_app.logger.exception("Inventory feed listener failed; retrying")
+                    db.session.remove()
+                    time.sleep(self.poll_seconds)
+
+
+def init_app(app):
+    broker = app.config.get('EVENT_BROKER') or (
+        'postgres' if app.config['SQLALCHEMY_DATABASE_URI'].startswith('postgresql') else 'memory'
+    )
+    if broker not in ('postgres', 'memory'):
+        raise RuntimeError(f"EVENT_BROKER must be 'postgres' or 'memory', not {broker!r}")
+    app.extensions['inventory_feed'] = EventFeed(broker, app.config.get('EVENT_POLL_SECONDS', DEFAULT_POLL_SECONDS))
+
+
+def replay_after(last_id):
+    """
+    Committed events after `last_id` for a reconnecting client, or None when
+    they can no longer all be served (trimmed, or more than MAX_REPLAY).
+    """
+    rows = db.session.execute(
+        select(InventoryEvent.id, InventoryEvent.type, InventoryEvent.data, InventoryEvent.created_at)
+        .where(InventoryEvent.id > last_id)
+        .order_by(InventoryEvent.id)
+        .limit(MAX_REPLAY + 1)
+    ).all()
+    oldest = db.session.query(func.min(InventoryEvent.id)).scalar()
+    if len(rows) > MAX_REPLAY or (oldest is not None and oldest > last_id + 1 and last_id > 0):
+        return None
+    return [as_event(row) for row in rows]
+
+
+def trim(retention_hours=DEFAULT_RETENTION_HOURS, now=None):
+    """Delete events older than the resume window; returns the number removed."""
+    cutoff = (now or datetime.utcnow()) - timedelta(hours=retention_hours)
+    removed = db.session.execute(delete(InventoryEvent).where(InventoryEvent.created_at < cutoff)).rowcount
+    db.session.commit()
+    return removed
+
+
+# ---------- Server-sent events ----------
+
+def _sse(item):
+    data = dict(item["data"], timestamp=item["timestamp"])
+    return f"id: {item['id']}\nevent: {item['type']}\ndata: {dumps(data).decode()}\n\n"
+
+
+def stream_response(last_event_id=None):
+    """
+    text/event-stream of committed events. With `last_event_id` the events
+    after it are replayed first, or a `reset` event is sent when they are
+    gone. The stream ends after STREAM_MAX_SECONDS so a worker thread is not
+    held forever; EventSource reconnects with Last-Event-ID and resumes.
+
+    Each open stream holds a worker thread, so a process serves at most
+    STREAM_MAX_CLIENTS of them and answers 503 beyond that, leaving threads
+    for the rest of the API.
+    """
+    app = current_app._get_current_object()
+    feed = app.extensions['inventory_feed']
+    if not feed.open_stream(app.config.get('STREAM_MAX_CLIENTS', DEFAULT_MAX_STREAMS)):
+        return jsonify({"error": "Too many open streams, retry later"}), 503, {'Retry-After': '30'}
+    try:
+        feed.start(app)
+        # taken before the replay query, so events committed meanwhile are not missed
+        position = feed.position()
+        backlog = replay_after(last_event_id) if last_event_id is not None else []
+    except Exception:
+        feed.close_stream()
+        raise
+    max_seconds = app.config.get('STREAM_MAX_SECONDS', DEFAULT_STREAM_SECONDS)
+
+    def generate(position):
+        yield f"retry: {RETRY_MILLISECONDS}\n\n"
+        if backlog is None:
+            yield f"event: {RESET}\ndata: {{}}\n\n"
+        replayed = set()
+        for item in backlog or ():
+            replayed.add(item["id"])
+            yield _sse(item)
+
+        deadline = time.monotonic() + max_seconds
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            items, position = feed.wait(position, min(HEARTBEAT_SECONDS, remaining))
+            if not items:
+                yield ": keepalive\n\n"
+            for item in items:
+                if item["id"] not in replayed:
+                    yield _sse(item)
+
+    # not wrapped in stream_with_context: the request (and its DB session) ends here
+    response = Response(generate(position), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+    })
+    # the server closes the response when the stream ends or the client goes away
+    response.call_on_close(feed.close_stream)
+    return response
@@ -0,0 +1,49 @@
+# Production serving config: gunicorn -c gunicorn.conf.py wsgi:app
+import multiprocessing
+import os
+import shutil
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+worker_class = 'gthread' if threads > 1 else 'sync'
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+accesslog = os.environ.get('GUNICORN_ACCESSLOG', '-') or None
+# Import the app once in the master and fork the workers from it, instead of
+# every worker importing Flask/SQLAlchemy on its own. create_app() opens no
+# connections, so nothing database-related is shared across the fork.
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'true').lower() in ('1', 'true', 'yes')
+
+# The app tunes itself by worker count (see SUMMARY_MAX_AGE_SECONDS in app_config.py)
+os.environ['WEB_CONCURRENCY'] = str(workers)
+
+# Prometheus multiprocess mode: every worker writes its samples under this
+# directory and /metrics aggregates them
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', '/tmp/prometheus_multiproc')
+
+
+def on_starting(server):
+    # stale files from a previous run would be counted again
+    metrics_dir = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir, exist_ok=True)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
+
+
+def post_worker_init(worker):
+    # open this worker's pooled connections now; /ready reports ready once they are up
+    import warmup
+    warmup.start(worker.wsgi)
+
+
+def worker_exit(server, worker):
+    # flush write-behind restock log entries before the worker goes away
+    writer = worker.wsgi.extensions.get('restock_log_writer')
+    if writer is not None:
+        writer.close()
@@ -0,0 +1,168 @@
+import csv
+import io
+import json
+import time
+from datetime import datetime
+
+from sqlalchemy import case, func, select
+from sqlalchemy.dialects import postgresql, sqlite
+
+from models import db, Product, RestockLog
+
+DEFAULT_BATCH_SIZE = 2000
+# values for new products when a record leaves a column out
+INSERT_DEFAULTS = {"category": None, "price": None, "cost": None, "stock_level": 0, "low_stock_threshold": 10}
+
+
+class ImportRowError(ValueError):
+    def __init__(self, line, message):
+        super().__init__(f"Row {line}: {message}")
+        self.line = line
+
+
+def _optional(value, cast):
+    if value is None or value == '':
+        return None
+    return cast(value)
+
+
+def normalize_row(raw, line):
+    """
+    Coerce one CSV/JSON record into product column values. Columns that are
+    missing or blank are left out, so an update keeps their current value.
+    """
+    if not isinstance(raw, dict):
+        raise ImportRowError(line, "expected an object")
+    name = str(raw.get('name') or '').strip()
+    sku = str(raw.get('sku') or '').strip()
+    if not name or not sku:
+        raise ImportRowError(line, "name and sku are required")
+    try:
+        stock_level = _optional(raw.get('stock_level'), int)
+        low_stock_threshold = _optional(raw.get('low_stock_threshold'), int)
+        price = _optional(raw.get('price'), float)
+        cost = _optional(raw.get('cost'), float)
+    except (TypeError, ValueError) as e:
+        raise ImportRowError(line, str(e))
+    values = {
+        "category": raw.get('category') or None,
+        "price": price,
+        "cost": cost,
+        "stock_level": stock_level,
+        "low_stock_threshold": low_stock_threshold,
+    }
+    return {"name": name, "sku": sku, **{field: value for field, value in values.items() if value is not None}}
+
+
+def read_csv(stream):
+    """Yield records from a binary or text CSV stream with a header row."""
+    if not isinstance(stream, io.TextIOBase):
+        stream = io.TextIOWrapper(stream, encoding='utf-8', newline='')
+    yield from csv.DictReader(stream)
+
+
+def read_ndjson(stream):
+    for line in stream:
+        if isinstance(line, bytes):
+            line = line.decode('utf-8')
+        if line.strip():
+            yield json.loads(line)
+
+
+def _upsert_statement(dialect_name, fields, now):
+    """Insert-or-update by SKU; an existing product only gets `fields` (and name) overwritten."""
+    if dialect_name == 'postgresql':
+        stmt = postgresql.insert(Product)
+    elif dialect_name == 'sqlite':
+        stmt = sqlite.insert(Product)
+    else:
+        raise NotImplementedError(f"Bulk upsert is not supported on {dialect_name}")
+    set_ = {field: stmt.excluded[field] for field in ('name',) + fields}
+    stock = stmt.excluded.stock_level if 'stock_level' in fields else Product.stock_level
+    threshold = stmt.excluded.low_stock_threshold if 'low_stock_threshold' in fields else Product.low_stock_threshold
+    # an updated product keeps its low-stock timestamp if it was already low
+    set_['low_stock_since'] = case(
+        (stock <= threshold, func.coalesce(Product.low_stock_since, now)),
+        else_=None,
+    )
+    return stmt.on_conflict_do_update(index_elements=[Product.sku], set_=set_)
+
+
+def _stock_changes(rows, now):
+    """
+    restock_log rows for the stock difference the upsert makes on existing
+    products, so history walked back from current stock stays right. The
+    products are locked (Postgres) until the batch commits.
+    """
+    new_stock = {row['sku']: row['stock_level'] for row in rows if 'stock_level' in row}
+    if not new_stock:
+        return []
+    existing = db.session.execute(
+        select(Product.id, Product.sku, Product.stock_level)
+        .where(Product.sku.in_(list(new_stock)))
+        .with_for_update()
+    )
+    return [
+        {"product_id": product_id, "quantity": new_stock[sku] - (stock or 0), "timestamp": now}
+        for product_id, sku, stock in existing
+        if new_stock[sku] != (stock or 0)
+    ]
+
+
+def _write_batch(statements, dialect_name, batch, now):
+    # ON CONFLICT cannot touch the same row twice in one statement; the last row for a SKU wins
+    rows = list({row['sku']: row for row in batch}.values())
+    changes = _stock_changes(rows, now)
+    # one statement per set of columns given, since executemany needs the same keys in every row
+    by_fields = {}
+    for row in rows:
+        fields = tuple(field for field in INSERT_DEFAULTS if field in row)
+        values = {**INSERT_DEFAULTS, **row}
+        values['low_stock_since'] = now if values['stock_level'] <= values['low_stock_threshold'] else None
+        by_fields.setdefault(fields, []).append(values)
+    for fields, values in by_fields.items():
+        if fields not in statements:
+            statements[fields] = _upsert_statement(dialect_name, fields, now)
+        db.session.execute(statements[fields], values)
+    if changes:
+        db.session.execute(RestockLog.__table__.insert(), changes)
+    db.session.commit()
+
+
+def import_products(records, batch_size=DEFAULT_BATCH_SIZE, progress=None):
+    """
+    Upsert products by SKU from an iterable of records, `batch_size` at a time.
+
+    Only one batch is held in memory and each batch is committed on its own,
+    so rows before a bad record stay imported; the ImportRowError raised for
+    it carries the stats so far. Returns a stats dict; `progress`, if given,
+    is called with it after every batch.
+    """
+    now = datetime.utcnow()
+    dialect_name = db.session.get_bind().dialect.name
+    statements = {}
+    stats = {"rows": 0, "batches": 0, "seconds": 0.0, "rows_per_sec": 0.0}
+    started = time.perf_counter()
+
+    def flush(batch):
+        _write_batch(statements, dialect_name, batch, now)
+        stats["rows"] += len(batch)
+        stats["batches"] += 1
+        stats["seconds"] = round(time.perf_counter() - started, 3)
+        stats["rows_per_sec"] = round(stats["rows"] / stats["seconds"], 1) if stats["seconds"] else 0.0
+        if progress:
+            progress(stats)
+
+    batch = []
+    try:
+        for line, raw in enumerate(records, start=1):
+            batch.append(normalize_row(raw, line))
+            if len(batch) >= batch_size:
+                flush(batch)
+                batch = []
+    except ImportRowError as e:
+        e.stats = stats
+        raise
+    if batch:
+        flush(batch)
+    return stats
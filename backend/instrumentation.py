@@ -0,0 +1,149 @@
+"""
+Per-request Prometheus instrumentation.
+
+Requests are labelled by route template (`/api/products/<int:product_id>`),
+never by raw path, so the number of series stays bounded. Besides latency,
+each request records how many SQL statements it ran, the time spent in
+them, the time spent encoding JSON and the time spent waiting for a pooled
+connection. High query counts point at N+1 loops; pool wait points at
+workers starved of connections.
+
+Pool wait is measured with public events on every engine, the replica
+bind included: a Session execute or flush stamps the time, and the pool's
+checkout event, which fires once a connection has been handed out (and
+opened, if it was new), adds the time since. Statements that run on a
+connection the session already holds do not check one out and add
+nothing.
+
+Work done while a streamed body is being generated happens after the
+request hook has run and is not attributed.
+"""
+import time
+
+from flask import current_app, g, has_request_context, request
+from prometheus_client import Counter, Histogram
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import Pool
+
+from serialization import FastJSONProvider
+
+UNMATCHED_ENDPOINT = '<unmatched>'
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250, 1000)
+FAST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+REQUEST_COUNTER = Counter(
+    'flask_http_request_total',
+    'Total number of HTTP requests grouped by method, endpoint and status',
+    ['method', 'endpoint', 'status']
+)
+REQUEST_LATENCY = Histogram(
+    'flask_http_request_duration_seconds',
+    'Histogram of response latency (seconds) by method and endpoint',
+    ['method', 'endpoint']
+)
+REQUEST_DB_QUERIES = Histogram(
+    'flask_http_request_db_queries',
+    'SQL statements executed per request',
+    ['method', 'endpoint'], buckets=QUERY_COUNT_BUCKETS
+)
+REQUEST_DB_SECONDS = Histogram(
+    'flask_http_request_db_seconds',
+    'Cumulative SQL execution time per request',
+    ['method', 'endpoint'], buckets=FAST_BUCKETS
+)
+REQUEST_JSON_SECONDS = Histogram(
+    'flask_http_request_json_seconds',
+    'Time spent serializing JSON per request',
+    ['method', 'endpoint'], buckets=FAST_BUCKETS
+)
+REQUEST_POOL_WAIT_SECONDS = Histogram(
+    'flask_http_request_db_pool_wait_seconds',
+    'Time spent waiting for a pooled database connection per request',
+    ['method', 'endpoint'], buckets=FAST_BUCKETS
+)
+
+
+def _add(name, value):
+    if has_request_context():
+        setattr(g, name, g.get(name, 0) + value)
+
+
+def _await_checkout(*args):
+    if has_request_context():
+        g._db_checkout_started = time.perf_counter()
+
+
+event.listen(Session, 'do_orm_execute', _await_checkout)
+event.listen(Session, 'before_flush', _await_checkout)
+
+
+@event.listens_for(Pool, 'checkout')
+def _checked_out(dbapi_connection, connection_record, connection_proxy):
+    if has_request_context():
+        started = g.pop('_db_checkout_started', None)
+        if started is not None:
+            _add('_db_pool_wait', time.perf_counter() - started)
+
+
+class TimedJSONProvider(FastJSONProvider):
+    """The app's JSON provider with the time spent encoding added to the request."""
+
+    def encode(self, obj):
+        started = time.perf_counter()
+        try:
+            return super().encode(obj)
+        finally:
+            _add('_json_seconds', time.perf_counter() - started)
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context():
+        # the statement has its connection; a stamp left over from it must not time a later checkout
+        g.pop('_db_checkout_started', None)
+    if context is not None:
+        context._instrumentation_started = time.perf_counter()
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, '_instrumentation_started', None)
+    if started is not None and has_request_context():
+        g._db_queries = g.get('_db_queries', 0) + 1
+        g._db_seconds = g.get('_db_seconds', 0) + time.perf_counter() - started
+
+
+def endpoint_label():
+    """The matched route template, or a fixed label for 404s."""
+    rule = request.url_rule
+    return rule.rule if rule is not None else UNMATCHED_ENDPOINT
+
+
+def _before_request():
+    request.start_time = time.time()
+
+
+def _after_request(response):
+    try:
+        method, endpoint = request.method, endpoint_label()
+        duration = time.time() - request.start_time if hasattr(request, 'start_time') else 0
+        REQUEST_COUNTER.labels(method=method, endpoint=endpoint, status=str(response.status_code)).inc()
+        REQUEST_LATENCY.labels(method=method, endpoint=endpoint).observe(duration)
+        REQUEST_DB_QUERIES.labels(method=method, endpoint=endpoint).observe(g.get('_db_queries', 0))
+        REQUEST_DB_SECONDS.labels(method=method, endpoint=endpoint).observe(g.get('_db_seconds', 0))
+        REQUEST_JSON_SECONDS.labels(method=method, endpoint=endpoint).observe(g.get('_json_seconds', 0))
+        REQUEST_POOL_WAIT_SECONDS.labels(method=method, endpoint=endpoint).observe(g.get('_db_pool_wait', 0))
+    except Exception:
+        # Log the exception for debugging purposes, but don't fail the request
+        current_app.logger.exception("Error in after_request for Prometheus metrics")
+    return response
+
+
+def init_app(app):
+    """Install the request hooks and JSON provider."""
+    app.json_provider_class = TimedJSONProvider
+    app.json = TimedJSONProvider(app)
+    app.before_request(_before_request)
+    app.after_request(_after_request)
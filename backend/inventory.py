@@ -0,0 +1,145 @@
+from datetime import datetime
+
+from sqlalchemy import case, func, select, update
+
+import cache
+import events
+import log_writer
+import summary
+from models import db, Product, RestockLog
+
+
+class ProductNotFound(Exception):
+    pass
+
+
+class InsufficientStock(Exception):
+    pass
+
+
+MAX_ORDER_LINES = 500
+
+
+def low_stock_since_after(new_stock_level, now=None):
+    """
+    SQL value for products.low_stock_since in an UPDATE that sets stock_level
+    to `new_stock_level`: keep the timestamp while the product stays low,
+    stamp it when it drops to the threshold, clear it once it recovers.
+    """
+    return case(
+        (new_stock_level <= Product.low_stock_threshold,
+         func.coalesce(Product.low_stock_since, now or datetime.utcnow())),
+        else_=None,
+    )
+
+
+def sale_states(row, quantity):
+    after = summary.ProductState(row.price, row.stock_level, row.low_stock_threshold)
+    return after._replace(stock_level=row.stock_level + quantity), after
+
+
+def _record_sale(row, quantity):
+    states = sale_states(row, quantity)
+    summary.aggregate.product_changed(*states)
+    summary.aggregate.restocks_logged()
+    cache.product_changed(row.id, cache.reshapes(*states))
+
+
+def _commit_sales(sales, now):
+    """
+    Log and commit the (row, quantity) sales decremented in the current
+    transaction. The log entries are written in it, or handed to the
+    write-behind queue once it has committed.
+    """
+    entries = [{"product_id": row.id, "quantity": -quantity, "timestamp": now} for row, quantity in sales]
+    writer = log_writer.current()
+    if writer is None:
+        db.session.execute(RestockLog.__table__.insert(), entries)
+    events.record([
+        draft for row, quantity in sales
+        for draft in events.stock_events(row.id, *sale_states(row, quantity), logged=None if writer else -quantity)
+    ])
+    db.session.commit()
+    if writer is not None:
+        writer.submit(entries)
+    for row, quantity in sales:
+        _record_sale(row, quantity)
+
+
+def purchase(product_id, quantity):
+    """
+    Take `quantity` units of a product in one transaction and return the
+    remaining stock.
+
+    The stock check, decrement and low-stock stamp are a single conditional
+    UPDATE ... RETURNING, so concurrent purchases can neither lose updates
+    nor oversell. The restock_log entry is written in the same transaction
+    unless write-behind logging is on (see log_writer).
+    """
+    new_stock = Product.stock_level - quantity
+    row = db.session.execute(
+        update(Product)
+        .where(Product.id == product_id, Product.stock_level >= quantity)
+        .values(stock_level=new_stock, low_stock_since=low_stock_since_after(new_stock))
+        .returning(Product.id, Product.price, Product.stock_level, Product.low_stock_threshold)
+        .execution_options(synchronize_session=False)
+    ).first()
+
+    if row is None:
+        db.session.rollback()
+        if db.session.get(Product, product_id) is None:
+            raise ProductNotFound(product_id)
+        raise InsufficientStock(product_id)
+
+    _commit_sales([(row, quantity)], datetime.utcnow())
+    return row.stock_level
+
+
+def place_order(lines, atomic=False):
+    """
+    Purchase several products in one transaction and return a result per line.
+
+    Quantities for a product listed twice are combined, and every line is
+    decremented by one conditional UPDATE ... RETURNING. Its subquery locks
+    the rows in ascending product id order (FOR UPDATE on Postgres), so
+    concurrent orders cannot deadlock. Log rows are then written with one
+    bulk insert (or queued, see log_writer) and the order commits once.
+    With `atomic` the whole order is rolled back if any line fails.
+    """
+    wanted = {}
+    for line in lines:
+        wanted[line["product_id"]] = wanted.get(line["product_id"], 0) + line["quantity"]
+
+    now = datetime.utcnow()
+    quantity = case(wanted, value=Product.id)
+    new_stock = Product.stock_level - quantity
+    locked = select(Product.id).where(Product.id.in_(list(wanted))).order_by(Product.id).with_for_update()
+    updated = db.session.execute(
+        update(Product)
+        .where(Product.id.in_(locked), Product.stock_level >= quantity)
+        .values(stock_level=new_stock, low_stock_since=low_stock_since_after(new_stock, now))
+        .returning(Product.id, Product.price, Product.stock_level, Product.low_stock_threshold)
+        .execution_options(synchronize_session=False)
+    ).all()
+    outcome = {pid: {"status": "insufficient_stock"} for pid in wanted}
+    for row in updated:
+        outcome[row.id] = {"status": "ok", "remaining_stock": row.stock_level}
+
+    failed = [pid for pid, result in outcome.items() if result["status"] != "ok"]
+    if failed:
+        known = {pid for (pid,) in db.session.query(Product.id).filter(Product.id.in_(failed))}
+        for pid in failed:
+            if pid not in known:
+                outcome[pid] = {"status": "not_found"}
+
+    if atomic and failed:
+        db.session.rollback()
+        for pid, result in outcome.items():
+            if result["status"] == "ok":
+                outcome[pid] = {"status": "rolled_back"}
+    elif updated:
+        _commit_sales([(row, wanted[row.id]) for row in updated], now)
+    else:
+        db.session.rollback()
+
+    return [dict(line, **outcome[line["product_id"]]) for line in lines]
@@ -0,0 +1,185 @@
+"""
+Optional write-behind for the restock_log entries written by purchases.
+
+With RESTOCK_LOG_WRITE_BEHIND on, a purchase commits only the stock
+decrement (and its stock events); the log entries are queued and a
+background thread writes them in batches, one multi-row INSERT per
+RESTOCK_LOG_BATCH_SIZE entries or RESTOCK_LOG_FLUSH_SECONDS, whichever
+comes first. The `restock` feed events are written with them.
+
+When the queue is full a purchase waits up to RESTOCK_LOG_PUT_TIMEOUT for
+room and then writes its own entries inline, so load is pushed back onto
+the callers instead of growing memory. The queue is flushed on graceful
+shutdown (gunicorn worker_exit and atexit); entries still queued when a
+process is killed are lost, which is the trade-off this mode makes.
+"""
+import atexit
+import os
+import queue
+import threading
+import time
+
+from flask import current_app
+from prometheus_client import Counter, Gauge, Histogram
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+
+import events
+from models import db, Product, RestockLog
+
+QUEUE_DEPTH = Gauge(
+    'restock_log_queue_depth', 'Restock log entries waiting to be written', multiprocess_mode='livesum'
+)
+FLUSH_SECONDS = Histogram('restock_log_flush_seconds', 'Time to write one batch of restock log entries')
+FLUSH_BATCH_SIZE = Histogram(
+    'restock_log_flush_batch_size', 'Restock log entries per batch',
+    buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500),
+)
+INLINE_WRITES = Counter(
+    'restock_log_inline_writes_total', 'Purchases that wrote their log entries inline because the queue was full'
+)
+FLUSH_FAILURES = Counter('restock_log_flush_failures_total', 'Failed restock log batch writes')
+DROPPED = Counter('restock_log_dropped_total', 'Restock log entries dropped after repeated write failures')
+
+MAX_ATTEMPTS = 5
+_STOP = object()
+
+
+def write_entries(entries):
+    """Insert log entries and their restock events in the current session, then commit."""
+    db.session.execute(RestockLog.__table__.insert(), entries)
+    events.record([
+        (events.RESTOCK, entry["product_id"], {"product_id": entry["product_id"], "quantity": entry["quantity"]})
+        for entry in entries
+    ])
+    db.session.commit()
+
+
+def _without_deleted_products(entries):
+    """Entries whose product still exists; a product deleted while its entries were queued fails the FK."""
+    product_ids = {entry["product_id"] for entry in entries}
+    existing = set(db.session.scalars(select(Product.id).where(Product.id.in_(product_ids))))
+    return [entry for entry in entries if entry["product_id"] in existing]
+
+
+class RestockLogWriter:
+    def __init__(self, app, max_queue, batch_size, flush_seconds, put_timeout):
+        self.app = app
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.put_timeout = put_timeout
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def submit(self, entries):
+        """Queue committed sales' log entries; writes them inline when the queue stays full."""
+        self._ensure_started()
+        for position, entry in enumerate(entries):
+            try:
+                self._queue.put(entry, timeout=self.put_timeout)
+            except queue.Full:
+                INLINE_WRITES.inc()
+                write_entries(entries[position:])
+                break
+        QUEUE_DEPTH.set(self._queue.qsize())
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+                return
+            if self._pid != os.getpid():
+                # entries queued before a fork belong to the parent
+                self._queue = queue.Queue(maxsize=self._queue.maxsize)
+                self._pid = os.getpid()
+                atexit.register(self.close)
+            self._thread = threading.Thread(target=self._run, name='restock-log-writer', daemon=True)
+            self._thread.start()
+
+    def _next_batch(self):
+        """Block for the first entry, then collect until the batch is full or the flush interval passes."""
+        first = self._queue.get()
+        if first is _STOP:
+            return None
+        batch = [first]
+        deadline = time.monotonic() + self.flush_seconds
+        while len(batch) < self.batch_size:
+            try:
+                entry = self._queue.get(timeout=max(0, deadline - time.monotonic()))
+            except queue.Empty:
+                break
+            if entry is _STOP:
+                self._queue.put(_STOP)  # finish this batch, then stop
+                break
+            batch.append(entry)
+        return batch
+
+    def _flush(self, batch):
+        attempt = 0
+        while batch:
+            started = time.perf_counter()
+            try:
+                write_entries(batch)
+            except Exception as e:
+                db.session.rollback()
+                kept = _without_deleted_products(batch) if isinstance(e, IntegrityError) else batch
+                if len(kept) < len(batch):
+                    # not the batch's fault: write the rest straight away
+                    DROPPED.inc(len(batch) - len(kept))
+                    current_app.logger.warning(
+                        "Dropped %d restock log entries of deleted products", len(batch) - len(kept))
+                    batch = kept
+                    continue
+                attempt += 1
+                FLUSH_FAILURES.inc()
+                current_app.logger.exception("Restock log flush failed (attempt %d of %d)", attempt, MAX_ATTEMPTS)
+                if attempt == MAX_ATTEMPTS:
+                    break
+                time.sleep(min(2 ** attempt * 0.1, 5))
+                continue
+            finally:
+                db.session.remove()
+            FLUSH_SECONDS.observe(time.perf_counter() - started)
+            FLUSH_BATCH_SIZE.observe(len(batch))
+            return
+        if batch:
+            DROPPED.inc(len(batch))
+            current_app.logger.error("Dropped %d restock log entries after %d failed writes", len(batch), MAX_ATTEMPTS)
+
+    def _run(self):
+        with self.app.app_context():
+            while True:
+                batch = self._next_batch()
+                if batch is None:
+                    return
+                self._flush(batch)
+                QUEUE_DEPTH.set(self._queue.qsize())
+
+    def close(self, timeout=10):
+        """Flush everything queued and stop the thread; safe to call more than once."""
+        with self._lock:
+            thread = self._thread if self._pid == os.getpid() else None
+            self._thread = None
+        if thread is None or not thread.is_alive():
+            return
+        self._queue.put(_STOP)
+        thread.join(timeout)
+        QUEUE_DEPTH.set(self._queue.qsize())
+
+
+def init_app(app):
+    if not app.config.get('RESTOCK_LOG_WRITE_BEHIND'):
+        return
+    app.extensions['restock_log_writer'] = RestockLogWriter(
+        app,
+        max_queue=app.config.get('RESTOCK_LOG_QUEUE_SIZE', 10000),
+        batch_size=app.config.get('RESTOCK_LOG_BATCH_SIZE', 500),
+        flush_seconds=app.config.get('RESTOCK_LOG_FLUSH_SECONDS', 0.2),
+        put_timeout=app.config.get('RESTOCK_LOG_PUT_TIMEOUT', 0.05),
+    )
+
+
+def current():
+    """The app's writer, or None when log entries are written synchronously."""
+    return current_app.extensions.get('restock_log_writer')
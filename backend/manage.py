@@ -0,0 +1,20 @@
+"""
+Runs the app's maintenance commands (see the CLI section of app.py):
+
+    python -m manage upgrade-db
+    python -m manage backfill-snapshots
+    python -m manage snapshot-stock
+    python -m manage compact-restock-log [--retention-days N]
+    python -m manage import-products catalog.csv [--batch-size N]
+
+Run from backend/. `flask --app wsgi <command>` is equivalent; this entry
+point just does not need FLASK_APP set.
+"""
+from flask.cli import FlaskGroup
+
+from app import create_app
+
+cli = FlaskGroup(create_app=create_app, help="Maintenance commands for the inventory backend.")
+
+if __name__ == '__main__':
+    cli()
@@ -0,0 +1,91 @@
+"""
+Idempotent schema upgrades for databases created by older versions of the app.
+
+db.create_all() only creates missing tables; the steps here add the columns,
+indexes and data changes it cannot. Run them with `python -m migrations`
+as the deploy step before the servers start (the same as
+`python -m manage upgrade-db`).
+"""
+from datetime import datetime
+
+from sqlalchemy import inspect, text
+
+from models import db
+
+
+def _columns(table_name):
+    return {c['name'] for c in inspect(db.engine).get_columns(table_name)}
+
+
+def _create_missing_indexes():
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(db.engine, checkfirst=True)
+
+
+def replace_low_stock_table():
+    """
+    Move from the hand-maintained low_stock_products table to the
+    products.low_stock_since column plus a partial index on it.
+
+    Products that were already listed keep the timestamp of their entry;
+    low products missing an entry are stamped now. The old table is dropped.
+    """
+    tables = set(inspect(db.engine).get_table_names())
+    if 'low_stock_since' not in _columns('products'):
+        column_type = db.DateTime().compile(dialect=db.engine.dialect)
+        db.session.execute(text(f"ALTER TABLE products ADD COLUMN low_stock_since {column_type}"))
+
+    if 'low_stock_products' in tables:
+        db.session.execute(text("""
+            UPDATE products SET low_stock_since = (
+                SELECT MIN(l.timestamp) FROM low_stock_products l WHERE l.product_id = products.id
+            )
+            WHERE stock_level <= low_stock_threshold AND low_stock_since IS NULL
+        """))
+    db.session.execute(
+        text("""
+            UPDATE products SET low_stock_since = :now
+            WHERE stock_level <= low_stock_threshold AND low_stock_since IS NULL
+        """),
+        {"now": datetime.utcnow()},
+    )
+    db.session.execute(text(
+        "UPDATE products SET low_stock_since = NULL WHERE stock_level > low_stock_threshold"
+    ))
+    if 'low_stock_products' in tables:
+        db.session.execute(text("DROP TABLE low_stock_products"))
+    db.session.commit()
+
+
+def low_stock_index_nulls_last():
+    """
+    Drop ix_products_low_stock, which sorted products without a
+    low_stock_since first on Postgres; upgrade() then creates
+    ix_products_low_stock_recent in its place.
+    """
+    db.session.execute(text("DROP INDEX IF EXISTS ix_products_low_stock"))
+    db.session.commit()
+
+
+STEPS = [
+    replace_low_stock_table,
+    low_stock_index_nulls_last,
+]
+
+
+def upgrade():
+    """Create missing tables, run every upgrade step, then create missing indexes."""
+    db.create_all()
+    for step in STEPS:
+        step()
+    _create_missing_indexes()
+    return [step.__name__ for step in STEPS]
+
+
+if __name__ == '__main__':
+    from app import create_app
+
+    with create_app().app_context():
+        for step in upgrade():
+            print(f"Applied {step}")
@@ -1,11 +1,21 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
+from sqlalchemy import DDL, event
 
-db = SQLAlchemy()
+from replicas import RoutingSession
+from serialization import low_stock_dict, restock_log_dict
+
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 # -------------------- Product Model --------------------
 class Product(db.Model):
     __tablename__ = 'products'  # חייב להיות זהה ל־ForeignKey
+    __table_args__ = (
+        # category filter + keyset pagination on id
+        db.Index('ix_products_category_id', 'category', 'id'),
+        # price range filter (/api/products/search)
+        db.Index('ix_products_price', 'price'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
@@ -15,6 +25,8 @@ class Product(db.Model):
     cost = db.Column(db.Float)
     stock_level = db.Column(db.Integer, default=0)
     low_stock_threshold = db.Column(db.Integer, default=10)
+    # when the product last dropped to its low-stock threshold; NULL while stock is above it
+    low_stock_since = db.Column(db.DateTime)
 
     # ✅ קשר דו-כיווני עם RestockLog
     restock_logs = db.relationship(
@@ -36,9 +48,61 @@ class Product(db.Model):
             "low_stock_threshold": self.low_stock_threshold,
         }
 
+    def to_low_stock_dict(self):
+        return low_stock_dict(
+            self.id, self.name, self.sku, self.stock_level, self.low_stock_threshold, self.low_stock_since,
+        )
+
+    def refresh_low_stock_since(self, now=None):
+        """Keep low_stock_since in step with stock_level after an in-Python change."""
+        if self.stock_level <= self.low_stock_threshold:
+            self.low_stock_since = self.low_stock_since or now or datetime.utcnow()
+        else:
+            self.low_stock_since = None
+
+
+def is_low_stock():
+    """The low-stock predicate; must match ix_products_low_stock_recent for the index to be used."""
+    return Product.stock_level <= Product.low_stock_threshold
+
+
+# Partial index holding only low-stock products, in the order /api/products/low-stock serves them:
+# newest first, products without a timestamp (written outside the app) last.
+# SQLite cannot declare NULLS LAST on an index, but already sorts NULLs last under DESC.
+db.Index(
+    'ix_products_low_stock_recent',
+    Product.low_stock_since.desc().nulls_last(), Product.id.desc(),
+    postgresql_where=is_low_stock(),
+).ddl_if(dialect='postgresql')
+db.Index(
+    'ix_products_low_stock_recent',
+    Product.low_stock_since.desc(), Product.id.desc(),
+    sqlite_where=is_low_stock(),
+).ddl_if(dialect='sqlite')
+
+# Trigram indexes behind the substring search of /api/products/search (ILIKE '%q%').
+# Postgres only; SQLite has no equivalent and scans.
+db.Index(
+    'ix_products_name_trgm', Product.name,
+    postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'},
+).ddl_if(dialect='postgresql')
+db.Index(
+    'ix_products_sku_trgm', Product.sku,
+    postgresql_using='gin', postgresql_ops={'sku': 'gin_trgm_ops'},
+).ddl_if(dialect='postgresql')
+event.listen(
+    db.metadata, 'before_create',
+    DDL('CREATE EXTENSION IF NOT EXISTS pg_trgm').execute_if(dialect='postgresql'),
+)
+
 # -------------------- RestockLog Model --------------------
 class RestockLog(db.Model):
     __tablename__ = 'restock_log'
+    __table_args__ = (
+        # per-product history (analytics, product delete) and recent-first listings / retention
+        db.Index('ix_restock_log_product_timestamp', 'product_id', 'timestamp'),
+        db.Index('ix_restock_log_timestamp', 'timestamp'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     product_id = db.Column(
@@ -47,36 +111,63 @@ class RestockLog(db.Model):
         nullable=False
     )
     quantity = db.Column(db.Integer, nullable=False)
-    timestamp = db.Column(db.DateTime, server_default=db.func.now())
+    # stamped in UTC by the app like every other timestamp; the server default only covers raw SQL inserts
+    timestamp = db.Column(db.DateTime, default=datetime.utcnow, server_default=db.func.now())
 
     def to_dict(self):
-        return {
-            "id": self.id,
-            "product_id": self.product_id,
-            "product_name": self.product.name if self.product else None,
-            "quantity": self.quantity,
-            "timestamp": self.timestamp.isoformat() if self.timestamp else None
-        }
+        # loads self.product; listings select the name with a join instead (restocks.py)
+        return restock_log_dict(
+            self.id, self.product_id, self.product.name if self.product else None, self.quantity, self.timestamp,
+        )
 
-# -------------------- LowStockProduct Model --------------------
-class LowStockProduct(db.Model):
-    __tablename__ = 'low_stock_products'
 
-    id = db.Column(db.Integer, primary_key=True)
-    product_id = db.Column(db.Integer, db.ForeignKey('products.id', ondelete="CASCADE"), nullable=False)
-    name = db.Column(db.String(100), nullable=False)
-    sku = db.Column(db.String(50), nullable=False)
+class RestockDaily(db.Model):
+    """
+    restock_log rows older than the retention window, rolled up to one row
+    per product and day. A movement is either here or in restock_log, never both.
+    """
+    __tablename__ = 'restock_log_daily'
+    __table_args__ = (
+        db.Index('ix_restock_log_daily_day', 'day'),
+    )
+
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id', ondelete="CASCADE"), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    net_quantity = db.Column(db.BigInteger, nullable=False)
+    entries = db.Column(db.Integer, nullable=False)
+
+# -------------------- Stock Snapshot Models --------------------
+class StockSnapshot(db.Model):
+    """Closing stock of one product on a day; a row is only written on days the stock moved."""
+    __tablename__ = 'stock_snapshots'
+
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id', ondelete="CASCADE"), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
     stock_level = db.Column(db.Integer, nullable=False)
-    low_stock_threshold = db.Column(db.Integer, nullable=False)  # ✅ חשוב!
-    timestamp = db.Column(db.DateTime, default=datetime.utcnow)
 
     def to_dict(self):
-        return {
-            "id": self.id,
-            "product_id": self.product_id,
-            "name": self.name,
-            "sku": self.sku,
-            "stock_level": self.stock_level,
-            "low_stock_threshold": self.low_stock_threshold,  # ✅ החזרת השדה
-            "timestamp": self.timestamp.isoformat() if self.timestamp else None
-        }
+        return {"date": self.day.isoformat(), "stock": self.stock_level}
+
+
+class InventorySnapshot(db.Model):
+    """Closing stock summed over all products, one row per day."""
+    __tablename__ = 'inventory_snapshots'
+
+    day = db.Column(db.Date, primary_key=True)
+    total_stock = db.Column(db.BigInteger, nullable=False)
+
+    def to_dict(self):
+        return {"date": self.day.isoformat(), "stock": self.total_stock}
+
+
+# -------------------- Inventory Event Model --------------------
+class InventoryEvent(db.Model):
+    """Change feed behind /api/stream/inventory; written in the same transaction as the change."""
+    __tablename__ = 'inventory_events'
+
+    id = db.Column(db.BigInteger().with_variant(db.Integer, 'sqlite'), primary_key=True)
+    type = db.Column(db.String(32), nullable=False)
+    # no foreign key: events about a deleted product outlive it
+    product_id = db.Column(db.Integer)
+    data = db.Column(db.JSON, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
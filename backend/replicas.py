@@ -0,0 +1,228 @@
+"""
+Read-replica routing and per-bind health checks.
+
+With REPLICA_DATABASE_URL set the app gets a second bind, 'replica'. Inside
+functions wrapped in @read_only, SELECTs go there; every other statement,
+and every flush, goes to the primary. A monitor thread per worker checks
+both binds every REPLICA_CHECK_SECONDS and measures the replica's lag
+(Postgres replay delay; other databases count as current). Reads fall back
+to the primary while the replica is down, lags more than
+REPLICA_MAX_LAG_SECONDS or has not been checked recently. A read that fails
+on the replica marks it down and is retried on the primary.
+
+Primary failover is left to the driver. List the primary and the DR host in
+DATABASE_URL (`?host=db:5432&host=dr-db:5432&target_session_attrs=read-write`)
+and libpq connects to whichever one accepts writes, giving up on each host
+after DB_CONNECT_TIMEOUT. pool_pre_ping and SQLAlchemy's invalidation of the
+pool on a disconnect make the next checkout reconnect through that list.
+"""
+import functools
+import os
+import threading
+import time
+
+from flask import current_app, g, has_request_context
+from flask_sqlalchemy.session import Session
+from prometheus_client import Gauge
+from sqlalchemy import event, text
+from sqlalchemy.exc import DataError, DBAPIError, IntegrityError, ProgrammingError
+
+PRIMARY = 'primary'
+REPLICA = 'replica'
+DEFAULT_CHECK_SECONDS = 2
+DEFAULT_MAX_LAG_SECONDS = 5
+# a check this many intervals old no longer vouches for the replica
+STALE_CHECKS = 3
+
+# 0 when the replica has replayed everything it received, so an idle primary does not read as lag
+POSTGRES_LAG_SQL = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+""")
+# SELECT 1 never opens an SQLite file; reading the schema page does
+PROBE_SQL = {'sqlite': text("SELECT count(*) FROM sqlite_master")}
+
+BIND_UP = Gauge('db_bind_up', 'Whether the last health check of a database bind succeeded', ['bind'],
+                multiprocess_mode='livemin')
+REPLICA_LAG = Gauge('db_replica_lag_seconds', 'Replica lag at the last health check', multiprocess_mode='livemax')
+
+
+class RoutingSession(Session):
+    """Session that sends the SELECTs of @read_only code to the replica bind while it is usable."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and getattr(clause, 'is_select', False):
+            engine = _replica_for_request()
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def _replica_for_request():
+    if not has_request_context() or not g.get('_read_replica'):
+        return None
+    monitor = current_app.extensions.get('db_replica')
+    if monitor is None or not monitor.usable():
+        return None
+    g._replica_used = True
+    g._replica_lag = monitor.lag()
+    return current_app.extensions['sqlalchemy'].engines[REPLICA]
+
+
+class ReplicaMonitor:
+    def __init__(self, app, check_seconds, max_lag_seconds):
+        self.app = app
+        self.check_seconds = check_seconds
+        self.max_lag_seconds = max_lag_seconds
+        self._state = {PRIMARY: None, REPLICA: None}
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def start(self):
+        """Start this process's health-check thread; a no-op once running (re-run after a fork)."""
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._state = {PRIMARY: None, REPLICA: None}
+        threading.Thread(target=self._run, name='db-health', daemon=True).start()
+
+    def _record(self, bind, up, lag=None, error=None):
+        self._state[bind] = {"up": up, "lag_seconds": lag, "error": error, "checked_at": time.monotonic()}
+        BIND_UP.labels(bind).set(1 if up else 0)
+        if bind == REPLICA and lag is not None:
+            REPLICA_LAG.set(lag)
+
+    def _check(self, bind, engine):
+        try:
+            with engine.connect() as connection:
+                if bind == REPLICA and engine.dialect.name == 'postgresql':
+                    lag = float(connection.execute(POSTGRES_LAG_SQL).scalar() or 0)
+                else:
+                    connection.execute(PROBE_SQL.get(engine.dialect.name, text("SELECT 1")))
+                    lag = 0.0
+        except Exception as e:
+            self._record(bind, False, error=str(e).splitlines()[0])
+            return
+        self._record(bind, True, lag=lag)
+
+    def check(self):
+        engines = current_app.extensions['sqlalchemy'].engines
+        self._check(PRIMARY, engines[None])
+        self._check(REPLICA, engines[REPLICA])
+
+    def _run(self):
+        with self.app.app_context():
+            while True:
+                try:
+                    self.check()
+                except Exception:
+                    current_app.logger.exception("Database health check failed")
+                time.sleep(self.check_seconds)
+
+    def usable(self):
+        """Whether reads may go to the replica: up, within the lag budget and checked recently."""
+        self.start()
+        state = self._state[REPLICA]
+        return (
+            state is not None and state["up"]
+            and state["lag_seconds"] <= self.max_lag_seconds
+            and time.monotonic() - state["checked_at"] <= self.check_seconds * STALE_CHECKS
+        )
+
+    def lag(self):
+        state = self._state[REPLICA]
+        return state["lag_seconds"] if state is not None else None
+
+    def mark_down(self, error):
+        """Stop routing reads to the replica until the next successful check."""
+        self._record(REPLICA, False, error=str(error).splitlines()[0])
+
+    def status(self):
+        self.start()
+        now = time.monotonic()
+        return {
+            bind: None if state is None else {
+                "up": state["up"], "lag_seconds": state["lag_seconds"], "error": state["error"],
+                "checked_seconds_ago": round(now - state["checked_at"], 1),
+            }
+            for bind, state in self._state.items()
+        } | {"reads_to_replica": self.usable()}
+
+
+def _replica_error(context):
+    # attribute the failure to the replica, so read_only() knows a retry on the primary can help
+    if not (has_request_context() and g.get('_read_replica')):
+        return
+    g._replica_failed = True
+    # an error in the statement itself says nothing about the replica
+    if not isinstance(context.sqlalchemy_exception, (DataError, IntegrityError, ProgrammingError)):
+        current_app.extensions['db_replica'].mark_down(context.original_exception)
+
+
+def _clear_request_flags(exc):
+    # after the response, so streamed listings keep reading from the replica
+    for name in ('_read_replica', '_replica_failed', '_replica_used', '_replica_lag'):
+        g.pop(name, None)
+
+
+def init_app(app):
+    """Call after db.init_app(app); a no-op without a 'replica' bind."""
+    if REPLICA not in (app.config.get('SQLALCHEMY_BINDS') or {}):
+        return
+    with app.app_context():
+        event.listen(app.extensions['sqlalchemy'].engines[REPLICA], 'handle_error', _replica_error)
+    app.teardown_request(_clear_request_flags)
+    app.extensions['db_replica'] = ReplicaMonitor(
+        app,
+        app.config.get('REPLICA_CHECK_SECONDS', DEFAULT_CHECK_SECONDS),
+        app.config.get('REPLICA_MAX_LAG_SECONDS', DEFAULT_MAX_LAG_SECONDS),
+    )
+
+
+def read_only(fn):
+    """
+    Run `fn` with its SELECTs routed to the replica. If the replica fails
+    during the call, the session is rolled back and `fn` runs again on the
+    primary, so `fn` must not write. Streamed bodies are not retried.
+    """
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        if current_app.extensions.get('db_replica') is None:
+            return fn(*args, **kwargs)
+        g._read_replica = True
+        try:
+            return fn(*args, **kwargs)
+        except DBAPIError as e:
+            if not g.get('_replica_failed'):
+                raise
+            current_app.logger.warning("Replica read failed, retrying on the primary: %s", str(e).splitlines()[0])
+            current_app.extensions['sqlalchemy'].session.rollback()
+            g._read_replica = False
+            return fn(*args, **kwargs)
+    return wrapper
+
+
+def served_current(changed_at=0.0):
+    """
+    False when this request read from a replica that was lagging, or that
+    may not have replayed a write committed at `changed_at` (a time.time())
+    yet, so its result should not be cached. A replica stays usable for up
+    to STALE_CHECKS intervals after its last check showed no lag, so a write
+    is only known to be there once that long has passed.
+    """
+    if not (has_request_context() and g.get('_replica_used')):
+        return True
+    if (g.get('_replica_lag') or 0) > 0:
+        return False
+    monitor = current_app.extensions['db_replica']
+    return time.time() - changed_at > monitor.check_seconds * STALE_CHECKS
+
+
+def status():
+    """Per-bind health for /health, or None without a replica."""
+    monitor = current_app.extensions.get('db_replica')
+    return monitor.status() if monitor is not None else None
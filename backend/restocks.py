@@ -0,0 +1,76 @@
+from datetime import datetime
+
+from flask import jsonify
+from sqlalchemy import select, tuple_
+
+from models import db, Product, RestockLog
+from serialization import restock_log_dict
+
+DEFAULT_LIMIT = 5
+MAX_LIMIT = 1000
+CURSOR_HEADER = 'X-Next-Cursor'
+
+
+def parse_restock_args(args):
+    """Validate /api/restocks query parameters. Raises ValueError with a client-facing message."""
+    try:
+        limit = int(args['limit']) if args.get('limit') else DEFAULT_LIMIT
+        product_id = int(args['product_id']) if args.get('product_id') else None
+    except ValueError:
+        raise ValueError("limit and product_id must be integers")
+    if not 1 <= limit <= MAX_LIMIT:
+        raise ValueError(f"limit must be between 1 and {MAX_LIMIT}")
+
+    try:
+        since = datetime.fromisoformat(args['since']) if args.get('since') else None
+        until = datetime.fromisoformat(args['until']) if args.get('until') else None
+    except ValueError:
+        raise ValueError("since and until must be ISO 8601 timestamps")
+
+    before = None
+    if args.get('before'):
+        try:
+            timestamp, _, log_id = args['before'].rpartition('|')
+            before = (datetime.fromisoformat(timestamp), int(log_id))
+        except ValueError:
+            raise ValueError(f"before must be a cursor from the {CURSOR_HEADER} header")
+
+    return {"limit": limit, "product_id": product_id, "since": since, "until": until, "before": before}
+
+
+def restock_statement(params):
+    """Newest entries first, with the product name joined in rather than lazy-loaded per row."""
+    stmt = (
+        select(RestockLog.id, RestockLog.product_id, Product.name, RestockLog.quantity, RestockLog.timestamp)
+        .join(Product, Product.id == RestockLog.product_id)
+    )
+    if params['product_id'] is not None:
+        stmt = stmt.where(RestockLog.product_id == params['product_id'])
+    if params['since'] is not None:
+        stmt = stmt.where(RestockLog.timestamp >= params['since'])
+    if params['until'] is not None:
+        stmt = stmt.where(RestockLog.timestamp < params['until'])
+    if params['before'] is not None:
+        stmt = stmt.where(tuple_(RestockLog.timestamp, RestockLog.id) < params['before'])
+    return stmt.order_by(RestockLog.timestamp.desc(), RestockLog.id.desc()).limit(params['limit'])
+
+
+def restock_log_response(args):
+    """
+    Recent restock log entries, the last five by default.
+
+    Filters: `product_id`, `since` / `until` (ISO timestamps, until exclusive).
+    Pages hold up to `limit` entries; the next one is requested with
+    `before=<cursor>` from the X-Next-Cursor header.
+    """
+    try:
+        params = parse_restock_args(args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    rows = db.session.execute(restock_statement(params)).all()
+    response = jsonify([restock_log_dict(*row) for row in rows])
+    if len(rows) == params['limit'] and rows[-1].timestamp is not None:
+        last = rows[-1]
+        response.headers[CURSOR_HEADER] = f"{last.timestamp.isoformat()}|{last.id}"
+    return response, 200
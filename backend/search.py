@@ -0,0 +1,122 @@
+from flask import jsonify
+from sqlalchemy import func, not_, or_, select
+
+import cache
+from catalog import MAX_PAGE_SIZE, NEXT_CURSOR_HEADER, PRODUCT_FIELDS
+from models import db, Product, is_low_stock
+
+DEFAULT_LIMIT = 50
+MAX_QUERY_LENGTH = 100
+TRUE_VALUES = ('1', 'true', 'yes')
+FALSE_VALUES = ('0', 'false', 'no')
+
+
+def parse_search_args(args):
+    """Validate /api/products/search query parameters. Raises ValueError with a client-facing message."""
+    q = (args.get('q') or '').strip() or None
+    if q is not None and len(q) > MAX_QUERY_LENGTH:
+        raise ValueError(f"q must be at most {MAX_QUERY_LENGTH} characters")
+
+    try:
+        min_price = float(args['min_price']) if args.get('min_price') else None
+        max_price = float(args['max_price']) if args.get('max_price') else None
+    except ValueError:
+        raise ValueError("min_price and max_price must be numbers")
+    if min_price is not None and max_price is not None and min_price > max_price:
+        raise ValueError("min_price must not be greater than max_price")
+
+    low_stock = (args.get('low_stock') or '').lower() or None
+    if low_stock is not None and low_stock not in TRUE_VALUES + FALSE_VALUES:
+        raise ValueError("low_stock must be true or false")
+
+    try:
+        limit = int(args['limit']) if args.get('limit') else DEFAULT_LIMIT
+        after_id = int(args['after_id']) if args.get('after_id') else None
+    except ValueError:
+        raise ValueError("limit and after_id must be integers")
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise ValueError(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+
+    return {
+        "q": q,
+        "category": args.get('category') or None,
+        "min_price": min_price,
+        "max_price": max_price,
+        "low_stock": None if low_stock is None else low_stock in TRUE_VALUES,
+        "limit": limit,
+        "after_id": after_id,
+    }
+
+
+def _escape_like(text):
+    return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def _filters(params):
+    """Every filter except category, which the facets count across."""
+    clauses = []
+    if params['q'] is not None:
+        # ILIKE '%q%': served by the trigram indexes on Postgres, a scan on SQLite
+        pattern = f"%{_escape_like(params['q'])}%"
+        clauses.append(or_(Product.name.ilike(pattern, escape='\\'), Product.sku.ilike(pattern, escape='\\')))
+    if params['min_price'] is not None:
+        clauses.append(Product.price >= params['min_price'])
+    if params['max_price'] is not None:
+        clauses.append(Product.price <= params['max_price'])
+    if params['low_stock'] is not None:
+        clauses.append(is_low_stock() if params['low_stock'] else not_(is_low_stock()))
+    return clauses
+
+
+def search_statement(params):
+    """One keyset page of matches, by id."""
+    stmt = select(*[getattr(Product, f) for f in PRODUCT_FIELDS]).where(*_filters(params))
+    if params['category'] is not None:
+        stmt = stmt.where(Product.category == params['category'])
+    if params['after_id'] is not None:
+        stmt = stmt.where(Product.id > params['after_id'])
+    return stmt.order_by(Product.id).limit(params['limit'])
+
+
+def facet_statement(params):
+    """Matches per category in one GROUP BY, ignoring the category filter so every option keeps its count."""
+    return (
+        select(Product.category, func.count())
+        .where(*_filters(params))
+        .group_by(Product.category)
+        .order_by(func.count().desc(), Product.category)
+    )
+
+
+def search_response(args):
+    """
+    Products matching `q` (substring of name or SKU, case-insensitive) and
+    the category / price / low-stock filters, `limit` per page by id; the
+    next page is requested with `after_id` from the X-Next-After-Id header.
+    The body also carries the match count per category and the total.
+    """
+    try:
+        params = parse_search_args(args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    items = [row._asdict() for row in db.session.execute(search_statement(params))]
+    facets = [{"category": category, "count": count} for category, count in db.session.execute(facet_statement(params))]
+    if params['category'] is not None:
+        total = sum(f["count"] for f in facets if f["category"] == params['category'])
+    else:
+        total = sum(f["count"] for f in facets)
+
+    next_after_id = items[-1]["id"] if len(items) == params['limit'] else None
+    # the facets and total count across the whole catalog
+    cache.record_page(params['after_id'], items[-1]["id"] if items else None,
+                      reaches_end=next_after_id is None, shaped=True)
+    response = jsonify({
+        "items": items,
+        "total": total,
+        "facets": {"category": facets},
+        "next_after_id": next_after_id,
+    })
+    if next_after_id is not None:
+        response.headers[NEXT_CURSOR_HEADER] = str(next_after_id)
+    return response, 200
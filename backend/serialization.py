@@ -0,0 +1,101 @@
+"""
+JSON encoding for API responses.
+
+Responses are built from plain rows (column selects and explicit joins, no
+per-object lazy loads) and encoded with orjson when it is installed, falling
+back to the standard library with the same output. Keys are sorted, as
+Flask's default provider does; NaN and infinities are written as null, as
+orjson does; datetimes and dates are written in ISO 8601.
+"""
+import json
+import math
+from datetime import date, datetime
+from decimal import Decimal
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # optional fast path
+    orjson = None
+
+
+def _default(obj):
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if isinstance(obj, Decimal):
+        return float(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _finite(obj):
+    """`obj` with NaN and infinities replaced by None."""
+    if isinstance(obj, (float, Decimal)):
+        return obj if math.isfinite(obj) else None
+    if isinstance(obj, dict):
+        return {key: _finite(value) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_finite(value) for value in obj]
+    return obj
+
+
+if orjson is not None:
+    def dumps(obj, sort_keys=True):
+        """Encode `obj` as compact UTF-8 JSON bytes."""
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_SORT_KEYS if sort_keys else 0)
+        return orjson.dumps(obj, default=_default, option=option)
+else:
+    _encoders = {
+        sort_keys: json.JSONEncoder(
+            default=_default, ensure_ascii=False, separators=(',', ':'), allow_nan=False, sort_keys=sort_keys,
+        )
+        for sort_keys in (True, False)
+    }
+
+    def dumps(obj, sort_keys=True):
+        """Encode `obj` as compact UTF-8 JSON bytes."""
+        encoder = _encoders[sort_keys]
+        try:
+            text = encoder.encode(obj)
+        except ValueError:  # a NaN or an infinity; rare, so only then walk the object
+            text = encoder.encode(_finite(obj))
+        return text.encode('utf-8')
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider that encodes with dumps(); jsonify and flask.json use it."""
+
+    def encode(self, obj):
+        return dumps(obj, sort_keys=self.sort_keys)
+
+    def dumps(self, obj, **kwargs):
+        return self.encode(obj).decode('utf-8')
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self.encode(obj) + b'\n', mimetype=self.mimetype)
+
+
+# ---------- Row serializers ----------
+
+def restock_log_dict(log_id, product_id, product_name, quantity, timestamp):
+    return {
+        "id": log_id,
+        "product_id": product_id,
+        "product_name": product_name,
+        "quantity": quantity,
+        "timestamp": timestamp.isoformat() if timestamp else None,
+    }
+
+
+def low_stock_dict(product_id, name, sku, stock_level, low_stock_threshold, low_stock_since):
+    # same shape as the former low_stock_products rows, keyed by the product id
+    return {
+        "id": product_id,
+        "product_id": product_id,
+        "name": name,
+        "sku": sku,
+        "stock_level": stock_level,
+        "low_stock_threshold": low_stock_threshold,
+        "timestamp": low_stock_since.isoformat() if low_stock_since else None,
+    }
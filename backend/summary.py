@@ -0,0 +1,125 @@
+"""
+In-process aggregate behind /api/dashboard/summary.
+
+Write handlers report deltas after they commit, so reads are O(1). The
+aggregate is rebuilt from a single SQL query when it is cold or older than
+SUMMARY_MAX_AGE_SECONDS; that doubles as the reconciliation check. With
+several worker processes each one only sees its own writes, so the max age
+is kept short there (see app_config.Config).
+
+Every reported delta bumps a generation counter. A delta reported while a
+refresh query runs may belong to a write the query did not see, so the
+refresh only replaces the aggregate if the generation did not move.
+"""
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import case, func, select
+
+from models import db, Product, RestockLog
+
+DEFAULT_MAX_AGE_SECONDS = 60
+# queries per refresh before accepting one that raced with writes (and re-checking on the next read)
+REFRESH_ATTEMPTS = 2
+RESTOCK_WINDOW = timedelta(days=1)
+
+ProductState = namedtuple('ProductState', 'price stock_level low_stock_threshold')
+
+
+def product_state(product):
+    return ProductState(product.price, product.stock_level, product.low_stock_threshold)
+
+
+def _value(state):
+    return (state.price or 0) * (state.stock_level or 0) if state else 0
+
+
+def _is_low(state):
+    return 1 if state and (state.stock_level or 0) < (state.low_stock_threshold or 10) else 0
+
+
+def query_summary():
+    """All four dashboard figures from one SQL statement."""
+    since = datetime.utcnow() - RESTOCK_WINDOW
+    recent_restocks = (
+        select(func.count(RestockLog.id)).where(RestockLog.timestamp >= since).scalar_subquery()
+    )
+    row = db.session.execute(select(
+        func.count(Product.id),
+        func.coalesce(func.sum(func.coalesce(Product.price, 0) * func.coalesce(Product.stock_level, 0)), 0),
+        func.coalesce(func.sum(case(
+            (func.coalesce(Product.stock_level, 0) < func.coalesce(Product.low_stock_threshold, 10), 1),
+            else_=0,
+        )), 0),
+        recent_restocks,
+    )).one()
+    return {
+        "totalProducts": row[0],
+        "totalValue": float(row[1]),
+        "lowStockProducts": row[2],
+        "restocksPending": row[3],
+    }
+
+
+class SummaryAggregate:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._summary = None
+        self._refreshed_at = 0.0
+        self._generation = 0
+
+    def invalidate(self):
+        with self._lock:
+            self._summary = None
+            self._generation += 1
+
+    def product_changed(self, before, after):
+        """Apply one product's change; `before` is None on create, `after` None on delete."""
+        with self._lock:
+            self._generation += 1
+            if self._summary is None:
+                return
+            self._summary["totalProducts"] += (after is not None) - (before is not None)
+            self._summary["totalValue"] += _value(after) - _value(before)
+            self._summary["lowStockProducts"] += _is_low(after) - _is_low(before)
+
+    def restocks_logged(self, count=1):
+        # entries ageing out of the 24h window are only dropped at the next refresh
+        with self._lock:
+            self._generation += 1
+            if self._summary is not None:
+                self._summary["restocksPending"] += count
+
+    def read(self):
+        max_age = current_app.config.get('SUMMARY_MAX_AGE_SECONDS', DEFAULT_MAX_AGE_SECONDS)
+        with self._lock:
+            if self._summary is not None and time.monotonic() - self._refreshed_at < max_age:
+                return dict(self._summary)
+            previous = self._summary
+
+        for attempt in range(1, REFRESH_ATTEMPTS + 1):
+            with self._lock:
+                generation = self._generation
+            fresh = query_summary()
+            with self._lock:
+                settled = self._generation == generation
+                if settled or attempt == REFRESH_ATTEMPTS:
+                    self._summary = fresh
+                    # a refresh that raced with writes is only trusted until the next read
+                    self._refreshed_at = time.monotonic() if settled else 0.0
+                    break
+
+        if previous is not None:
+            drift = {
+                key: (previous[key], fresh[key]) for key in ("totalProducts", "lowStockProducts")
+                if previous[key] != fresh[key]
+            }
+            if drift:
+                current_app.logger.info("Dashboard summary drift corrected (local, sql): %s", drift)
+        return dict(fresh)
+
+
+aggregate = SummaryAggregate()
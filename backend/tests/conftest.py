@@ -0,0 +1,51 @@
+import os
+import sys
+
+import pytest
+
+# backend/ modules import each other by their top-level names
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app  # noqa: E402
+from app_config import Config  # noqa: E402
+from models import db  # noqa: E402
+from summary import aggregate  # noqa: E402
+
+
+@pytest.fixture
+def config(tmp_path):
+    class TestConfig(Config):
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + str(tmp_path / 'test.db')
+        SQLALCHEMY_ENGINE_OPTIONS = {}
+        SQLALCHEMY_BINDS = {}
+        EVENT_BROKER = 'memory'
+        RESTOCK_LOG_WRITE_BEHIND = False
+        CACHE_URL = None
+        CACHE_TTL_SECONDS = 300
+
+    return TestConfig
+
+
+@pytest.fixture
+def replica_config(config, tmp_path):
+    """`config` with a second SQLite file as the 'replica' bind; create its tables with db.metadata."""
+    class ReplicaConfig(config):
+        SQLALCHEMY_BINDS = {'replica': {'url': 'sqlite:///' + str(tmp_path / 'replica.db')}}
+
+    yield ReplicaConfig
+    db.metadatas.pop('replica', None)  # db.init_app registers the bind on the shared `db`
+
+
+@pytest.fixture
+def app(config):
+    app = create_app(config)
+    aggregate.invalidate()  # module-level, so it outlives the previous test's database
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
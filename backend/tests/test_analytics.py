@@ -0,0 +1,70 @@
+"""Stock trends: daily snapshots, the live tail after the last run, and ranges."""
+from datetime import datetime, timedelta
+
+import analytics
+from benchmarks.common import seed_catalog
+from models import db, InventorySnapshot, Product, StockSnapshot
+
+
+def _snapshots():
+    products = db.session.query(StockSnapshot.product_id, StockSnapshot.day, StockSnapshot.stock_level)
+    totals = db.session.query(InventorySnapshot.day, InventorySnapshot.total_stock)
+    return sorted(products.all()), sorted(totals.all())
+
+
+def _trends(client, product_ids, days=120):
+    query = f"?from={(datetime.utcnow().date() - timedelta(days=days - 1)).isoformat()}"
+    return (
+        client.get('/api/analytics/inventory-trend' + query).json,
+        [client.get(f'/api/analytics/product-trend/{pid}' + query).json for pid in product_ids],
+    )
+
+
+def test_trends_wait_for_the_first_snapshot_run(app, client):
+    seed_catalog(5, logs_per_product=3, history_days=10, categories=1)
+    assert client.get('/api/analytics/inventory-trend').status_code == 503
+    assert client.get('/api/analytics/product-trend/1').status_code == 503
+
+    analytics.backfill_snapshots()
+    assert client.get('/api/analytics/inventory-trend').status_code == 200
+
+
+def test_snapshot_refresh_matches_backfill(app, client):
+    today = datetime.utcnow().date()
+    seed_catalog(30, logs_per_product=10, history_days=90, categories=3)
+    product_ids = [1, 2, 15]
+
+    analytics.backfill_snapshots(today)
+    full = _snapshots()
+    trends = _trends(client, product_ids)
+    assert trends[0][-1]["stock"] == db.session.query(db.func.sum(Product.stock_level)).scalar()
+
+    # a stale run leaves five days to the live tail, then a refresh closes them
+    analytics.backfill_snapshots(today - timedelta(days=5))
+    assert _trends(client, product_ids) == trends
+    analytics.refresh_snapshots(today)
+    assert _snapshots() == full
+    assert _trends(client, product_ids) == trends
+
+
+def test_trend_today_follows_live_stock(app, client):
+    seed_catalog(5, logs_per_product=3, history_days=10, categories=1)
+    analytics.backfill_snapshots()
+    total = client.get('/api/analytics/inventory-trend').json[-1]["stock"]
+
+    client.post('/api/products/2/restock', json={'quantity': 7})
+    client.post('/api/user/products/3/purchase', json={'quantity': 1})
+    assert client.get('/api/analytics/product-trend/2').json[-1]["stock"] == db.session.get(Product, 2).stock_level
+    assert client.get('/api/analytics/inventory-trend').json[-1]["stock"] == total + 6
+
+
+def test_ranges_are_capped_by_days_of_snapshots(app, client):
+    seed_catalog(5, logs_per_product=3, history_days=10, categories=1)
+    analytics.backfill_snapshots()
+    first_day = db.session.query(db.func.min(InventorySnapshot.day)).scalar()
+
+    series = client.get('/api/analytics/inventory-trend?from=2000-01-01').json
+    assert series[0]["date"] == first_day.isoformat()
+    assert client.get(f'/api/analytics/inventory-trend?from=2000-01-01&to={first_day.isoformat()}').status_code == 200
+    far = (first_day + timedelta(days=analytics.MAX_TREND_POINTS)).isoformat()
+    assert client.get(f'/api/analytics/inventory-trend?to={far}&from=2000-01-01').status_code == 400
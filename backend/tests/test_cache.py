@@ -0,0 +1,82 @@
+"""The product response cache: invalidation on writes, per page and across processes."""
+from prometheus_client import REGISTRY
+
+import cache
+from app import create_app
+from benchmarks.common import seed_catalog
+from models import db, Product
+
+
+def _hits(kind):
+    return REGISTRY.get_sample_value('catalog_cache_hits_total', {'kind': kind}) or 0
+
+
+def test_writes_invalidate_cached_product_reads(app, client):
+    seed_catalog(10, logs_per_product=0, categories=2)
+    detail, page = '/api/products/3', '/api/products?limit=5'
+    first = client.get(detail)
+    etag = first.headers['ETag']
+    assert client.get(detail, headers={'If-None-Match': etag}).status_code == 304
+    stock = first.json['stock_level']
+    client.get(page)
+
+    client.post('/api/user/products/3/purchase', json={'quantity': 1})
+    assert client.get(detail).json['stock_level'] == stock - 1
+    assert client.get('/api/user/products/3').json['stock_level'] == stock - 1
+    assert client.get(detail, headers={'If-None-Match': etag}).status_code == 200
+    assert next(p for p in client.get(page).json if p['id'] == 3)['stock_level'] == stock - 1
+
+    client.post('/api/products/3/restock', json={'quantity': 5})
+    assert client.get(detail).json['stock_level'] == stock + 4
+    client.post('/api/products/bulk', json=[{'name': 'Renamed', 'sku': 'SKU-0000003'}])
+    assert client.get(detail).json['name'] == 'Renamed'
+    assert next(p for p in client.get(page).json if p['id'] == 3)['name'] == 'Renamed'
+
+
+def test_a_sale_only_drops_the_pages_around_the_product(app, client):
+    seed_catalog(600, logs_per_product=0, categories=3, low_stock_ratio=0)
+    near, far = '/api/products?limit=5', '/api/products?limit=5&after_id=400'
+    stock = client.get(near).json[2]['stock_level']
+    client.get(far)
+
+    client.post('/api/user/products/3/purchase', json={'quantity': 1})
+    hits = _hits('listing')
+    assert client.get(near).json[2]['stock_level'] == stock - 1
+    assert _hits('listing') == hits
+    client.get(far)
+    assert _hits('listing') == hits + 1
+
+
+def test_search_facets_follow_low_stock_changes(app, client):
+    seed_catalog(30, logs_per_product=0, categories=3, low_stock_ratio=0)
+    url = '/api/products/search?low_stock=true&limit=5'
+    assert client.get(url).json['total'] == 0
+    product = db.session.get(Product, 7)
+    client.post('/api/user/products/7/purchase', json={'quantity': product.stock_level - product.low_stock_threshold})
+    body = client.get(url).json
+    assert (body['total'], [item['id'] for item in body['items']]) == (1, [7])
+
+
+def test_other_processes_drop_entries_through_the_change_feed(app, client, config):
+    seed_catalog(10, logs_per_product=0, categories=2, low_stock_ratio=0)
+    other = create_app(config)
+    other_client = other.test_client()
+    detail, page = '/api/products/3', '/api/products?limit=5'
+    with other.app_context():
+        stock = other_client.get(detail).json['stock_level']
+        other_client.get(page)
+
+    client.post('/api/user/products/3/purchase', json={'quantity': 1})
+    client.put('/api/products/4', json={'name': 'Renamed', 'sku': 'SKU-0000004'})
+    with other.app_context():
+        # what the feed's poll does every EVENT_POLL_SECONDS
+        other.extensions['inventory_feed']._catch_up()
+        assert other_client.get(detail).json['stock_level'] == stock - 1
+        assert [p['name'] for p in other_client.get(page).json if p['id'] == 4] == ['Renamed']
+
+
+def test_shared_entries_are_stored_without_pickle():
+    entry = (b'{"id": 1}\n', 'abc', [('Content-Type', 'application/json')], {'rows:0': 4, 'shape': 2})
+    raw = cache._encode_entry(entry)
+    assert raw.startswith(b'["abc"')
+    assert cache._decode_entry(raw) == entry
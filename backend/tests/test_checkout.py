@@ -0,0 +1,80 @@
+"""Single purchases and multi-line orders: conditional decrements, merging and rollback."""
+import threading
+
+from models import db, Product, RestockLog
+
+
+def _add(app, **stocks):
+    products = [Product(name=sku, sku=sku, stock_level=stock, low_stock_threshold=2) for sku, stock in stocks.items()]
+    db.session.add_all(products)
+    db.session.commit()
+    return [product.id for product in products]
+
+
+def _stock(product_id):
+    db.session.expire_all()
+    return db.session.get(Product, product_id).stock_level
+
+
+def test_atomic_order_rolls_back_when_a_line_fails(app, client):
+    a, b = _add(app, A=5, B=1)
+    response = client.post('/api/user/orders', json={'atomic': True, 'items': [
+        {'product_id': a, 'quantity': 2}, {'product_id': b, 'quantity': 3}, {'product_id': 999, 'quantity': 1},
+    ]})
+    assert response.status_code == 409
+    assert [line['status'] for line in response.json['results']] == ['rolled_back', 'insufficient_stock', 'not_found']
+    assert (_stock(a), _stock(b)) == (5, 1)
+    assert RestockLog.query.count() == 0
+
+
+def test_partial_order_keeps_the_lines_that_fit(app, client):
+    a, b = _add(app, A=5, B=1)
+    response = client.post('/api/user/orders', json={'items': [
+        {'product_id': a, 'quantity': 2}, {'product_id': b, 'quantity': 3},
+    ]})
+    assert response.status_code == 200
+    assert response.json['purchased'] == 1
+    assert response.json['results'][0] == {'product_id': a, 'quantity': 2, 'status': 'ok', 'remaining_stock': 3}
+    assert (_stock(a), _stock(b)) == (3, 1)
+
+
+def test_duplicate_lines_are_merged(app, client):
+    a, b = _add(app, A=5, B=5)
+    response = client.post('/api/user/orders', json={'items': [
+        {'product_id': a, 'quantity': 2}, {'product_id': b, 'quantity': 1}, {'product_id': a, 'quantity': 2},
+    ]})
+    assert response.status_code == 200
+    assert [line.get('remaining_stock') for line in response.json['results']] == [1, 4, 1]
+    assert sorted((log.product_id, log.quantity) for log in RestockLog.query.all()) == [(a, -4), (b, -1)]
+    # merged, the lines ask for more than is left
+    response = client.post('/api/user/orders', json={'atomic': True, 'items': [
+        {'product_id': a, 'quantity': 1}, {'product_id': a, 'quantity': 1},
+    ]})
+    assert response.status_code == 409
+    assert _stock(a) == 1
+
+
+def test_concurrent_purchases_never_oversell(app):
+    a, b = _add(app, A=12, B=12)
+    statuses = []
+
+    def shop(worker):
+        client = app.test_client()
+        for _ in range(5):
+            if worker % 2:
+                response = client.post(f'/api/user/products/{a}/purchase', json={'quantity': 1})
+            else:
+                response = client.post('/api/user/orders', json={'atomic': True, 'items': [
+                    {'product_id': b, 'quantity': 1}, {'product_id': a, 'quantity': 1},
+                ]})
+            statuses.append(response.status_code)
+
+    threads = [threading.Thread(target=shop, args=(worker,)) for worker in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert statuses.count(200) == 12
+    assert _stock(a) == 0 and _stock(b) >= 0
+    assert -sum(log.quantity for log in RestockLog.query.filter_by(product_id=a)) == 12
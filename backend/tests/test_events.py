@@ -0,0 +1,55 @@
+"""The inventory change feed: one notification per transaction, and what the listener reads back."""
+import json
+
+import pytest
+from sqlalchemy import event
+
+from models import db, Product
+
+
+@pytest.fixture
+def notified(app):
+    """Payloads of pg_notify() calls, with a SQLite stand-in for the Postgres function."""
+    payloads = []
+
+    def register(dbapi_connection, connection_record):
+        dbapi_connection.create_function('pg_notify', 2, lambda channel, payload: payloads.append(json.loads(payload)))
+
+    db.engine.dispose()
+    event.listen(db.engine, 'connect', register)
+    app.extensions['inventory_feed'].broker = 'postgres'
+    yield payloads
+    event.remove(db.engine, 'connect', register)
+    db.engine.dispose()
+
+
+def test_an_order_sends_one_notification_for_all_its_events(app, client, notified):
+    products = [Product(name=sku, sku=sku, stock_level=3, low_stock_threshold=2) for sku in 'ABC']
+    db.session.add_all(products)
+    db.session.commit()
+    response = client.post('/api/user/orders', json={'items': [
+        {'product_id': product.id, 'quantity': 2} for product in products
+    ]})
+    assert response.status_code == 200
+
+    # stock_changed, low_stock_entered and restock for each of the three products
+    assert len(notified) == 1
+    assert notified[0]["last"] - notified[0]["first"] == 8
+
+    feed = app.extensions['inventory_feed']
+    feed._fetch_notified(notified)
+    items, _ = feed.wait(0, 0)
+    assert [item["id"] for item in items] == list(range(notified[0]["first"], notified[0]["last"] + 1))
+    assert {item["type"] for item in items} == {'stock_changed', 'low_stock_entered', 'restock'}
+
+
+def test_a_rolled_back_order_sends_nothing(app, client, notified):
+    product = Product(name='A', sku='A', stock_level=1, low_stock_threshold=0)
+    db.session.add(product)
+    db.session.commit()
+    notified.clear()
+    response = client.post('/api/user/orders', json={'atomic': True, 'items': [
+        {'product_id': product.id, 'quantity': 1}, {'product_id': 999, 'quantity': 1},
+    ]})
+    assert response.status_code == 409
+    assert notified == []
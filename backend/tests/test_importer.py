@@ -0,0 +1,23 @@
+"""Bulk upserts by SKU: partial records and the restock log."""
+from importer import import_products
+from models import db, Product, RestockLog
+
+
+def test_partial_import_keeps_other_columns_and_logs_stock(app):
+    db.session.add(Product(name='A', sku='S1', stock_level=20, category='C', price=3.5, low_stock_threshold=5))
+    db.session.commit()
+    import_products([{'name': 'A', 'sku': 'S1', 'stock_level': '12'}, {'name': 'B', 'sku': 'S2'}])
+
+    product = Product.query.filter_by(sku='S1').one()
+    assert (product.category, product.price, product.low_stock_threshold, product.stock_level) == ('C', 3.5, 5, 12)
+    assert Product.query.filter_by(sku='S2').one().stock_level == 0
+    assert [(log.product_id, log.quantity) for log in RestockLog.query.all()] == [(product.id, -8)]
+
+
+def test_bulk_endpoint_keeps_batches_before_a_bad_row(app, client):
+    body = "name,sku,stock_level,low_stock_threshold\nA,S1,3,5\nB,S2,40,5\nC,S3,not-a-number,5\n"
+    response = client.post('/api/products/bulk?batch_size=2', data=body, content_type='text/csv')
+    assert response.status_code == 400
+    assert response.json['imported'] == 2
+    assert sorted(sku for (sku,) in db.session.query(Product.sku)) == ['S1', 'S2']
+    assert [p['sku'] for p in client.get('/api/products/low-stock').json] == ['S1']
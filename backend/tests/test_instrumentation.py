@@ -0,0 +1,74 @@
+"""Per-request metrics: route labels and connection pool wait on every bind."""
+import threading
+import time
+
+import pytest
+from prometheus_client import REGISTRY
+
+from app import create_app
+from models import db
+
+POOL_OF_ONE = {'pool_size': 1, 'max_overflow': 0, 'pool_timeout': 5}
+
+
+def _pool_wait(endpoint):
+    return REGISTRY.get_sample_value(
+        'flask_http_request_db_pool_wait_seconds_sum', {'method': 'GET', 'endpoint': endpoint}) or 0
+
+
+def _hold_connection(engine, seconds):
+    """Check out `engine`'s only pooled connection from another thread for `seconds`."""
+    taken = threading.Event()
+
+    def hold():
+        with engine.connect():
+            taken.set()
+            time.sleep(seconds)
+
+    threading.Thread(target=hold).start()
+    taken.wait()
+
+
+@pytest.fixture
+def small_pools(replica_config):
+    class SmallPools(replica_config):
+        SQLALCHEMY_ENGINE_OPTIONS = POOL_OF_ONE
+        SQLALCHEMY_BINDS = {'replica': {**replica_config.SQLALCHEMY_BINDS['replica'], **POOL_OF_ONE}}
+        REPLICA_CHECK_SECONDS = 0.1
+
+    app = create_app(SmallPools)
+    with app.app_context():
+        db.create_all(bind_key=None)
+        db.metadata.create_all(db.engines['replica'])
+        yield app
+        db.session.remove()
+
+
+def test_requests_are_labelled_by_route(app, client):
+    client.get('/api/products/12345')
+    client.get('/no/such/page')
+    labels = {'method': 'GET', 'endpoint': '/api/products/<int:product_id>', 'status': '404'}
+    assert REGISTRY.get_sample_value('flask_http_request_total', labels) >= 1
+    assert REGISTRY.get_sample_value(
+        'flask_http_request_total', {'method': 'GET', 'endpoint': '<unmatched>', 'status': '404'}) >= 1
+
+
+def test_pool_wait_is_measured_on_the_primary_and_the_replica(small_pools):
+    client = small_pools.test_client()
+    monitor = small_pools.extensions['db_replica']
+    monitor.start()
+    deadline = time.monotonic() + 5
+    while not monitor.usable() and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert monitor.usable()
+
+    before = _pool_wait('/api/restocks')
+    _hold_connection(db.engines[None], 0.3)
+    assert client.get('/api/restocks').status_code == 200
+    assert _pool_wait('/api/restocks') - before >= 0.2
+
+    # a read-only view: its SELECT waits for the replica's connection
+    before = _pool_wait('/api/products/low-stock')
+    _hold_connection(db.engines['replica'], 0.3)
+    assert client.get('/api/products/low-stock').status_code == 200
+    assert _pool_wait('/api/products/low-stock') - before >= 0.2
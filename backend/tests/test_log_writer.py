@@ -0,0 +1,69 @@
+"""Write-behind restock log: entries are flushed on close, and a deleted product only loses its own."""
+import pytest
+from prometheus_client import REGISTRY
+from sqlalchemy import event
+
+from app import create_app
+from models import db, InventoryEvent, Product, RestockLog
+from summary import aggregate
+
+
+@pytest.fixture
+def app(config):
+    class WriteBehind(config):
+        RESTOCK_LOG_WRITE_BEHIND = True
+        RESTOCK_LOG_FLUSH_SECONDS = 30  # nothing is written until the writer is closed
+        RESTOCK_LOG_BATCH_SIZE = 500
+
+    app = create_app(WriteBehind)
+    aggregate.invalidate()
+    with app.app_context():
+        db.create_all()
+        yield app
+        app.extensions['restock_log_writer'].close()
+        db.session.remove()
+
+
+def _restocks():
+    return db.session.query(InventoryEvent).filter_by(type='restock').count()
+
+
+def _buy(client, product_id, times):
+    for _ in range(times):
+        assert client.post(f'/api/user/products/{product_id}/purchase', json={'quantity': 1}).status_code == 200
+
+
+def test_queued_entries_are_written_on_close(app, client):
+    product = Product(name='A', sku='A', stock_level=10, low_stock_threshold=1)
+    db.session.add(product)
+    db.session.commit()
+
+    _buy(client, product.id, 3)
+    assert RestockLog.query.count() == 0
+    assert db.session.get(Product, product.id).stock_level == 7
+
+    app.extensions['restock_log_writer'].close()
+    assert [log.quantity for log in RestockLog.query.all()] == [-1, -1, -1]
+    assert _restocks() == 3
+
+
+def test_a_deleted_product_drops_only_its_entries(app, client):
+    # SQLite checks foreign keys only when asked to, per connection
+    event.listen(db.engine, 'connect', lambda connection, record: connection.execute('PRAGMA foreign_keys=ON'))
+    db.engine.dispose()
+    kept = Product(name='A', sku='A', stock_level=10, low_stock_threshold=1)
+    deleted = Product(name='B', sku='B', stock_level=10, low_stock_threshold=1)
+    db.session.add_all([kept, deleted])
+    db.session.commit()
+    kept_id, deleted_id = kept.id, deleted.id
+    dropped = REGISTRY.get_sample_value('restock_log_dropped_total') or 0
+
+    _buy(client, kept_id, 2)
+    _buy(client, deleted_id, 3)
+    db.session.delete(deleted)
+    db.session.commit()
+
+    app.extensions['restock_log_writer'].close()
+    assert [(log.product_id, log.quantity) for log in RestockLog.query.all()] == [(kept_id, -1), (kept_id, -1)]
+    assert _restocks() == 2
+    assert REGISTRY.get_sample_value('restock_log_dropped_total') - dropped == 3
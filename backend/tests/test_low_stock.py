@@ -0,0 +1,65 @@
+"""The low-stock set derived from products.low_stock_since: the migration and cursor paging."""
+from datetime import datetime, timedelta
+
+from sqlalchemy import inspect, text
+
+import migrations
+from benchmarks.bench_low_stock import legacy_low_stock
+from models import db, Product
+
+
+def _page_through(client, limit):
+    ids, cursor = [], None
+    while True:
+        response = client.get(f'/api/products/low-stock?limit={limit}' + (f'&after={cursor}' if cursor else ''))
+        ids += [row['id'] for row in response.json]
+        cursor = response.headers.get('X-Next-Cursor')
+        if cursor is None:
+            return ids
+
+
+def test_pages_cover_products_without_a_timestamp(app, client):
+    now = datetime.utcnow()
+    db.session.execute(Product.__table__.insert(), [
+        {"id": i, "name": f"P{i}", "sku": f"S{i}", "stock_level": 1 if i % 3 else 50, "low_stock_threshold": 5,
+         # every fourth low product was written outside the app and has no timestamp
+         "low_stock_since": None if i % 4 == 0 else now - timedelta(minutes=i // 2)}
+        for i in range(1, 41)
+    ])
+    db.session.commit()
+    everything = [row['id'] for row in client.get('/api/products/low-stock').json]
+    low = sorted(i for i in range(1, 41) if i % 3)
+
+    assert sorted(everything) == low
+    assert [i for i in everything if i % 4 == 0] == everything[-len([i for i in low if i % 4 == 0]):]
+    for limit in (1, 3, 7, 100):
+        assert _page_through(client, limit) == everything
+    assert client.get('/api/products/low-stock?limit=2&after=nonsense').status_code == 400
+
+
+def test_upgrade_moves_the_shadow_table_into_the_column(app, client):
+    db.session.execute(text("DROP INDEX ix_products_low_stock_recent"))
+    db.session.execute(text("ALTER TABLE products DROP COLUMN low_stock_since"))
+    db.session.execute(text("CREATE INDEX ix_products_low_stock ON products (id)"))
+    legacy_low_stock.create(db.engine)
+    db.session.execute(text(
+        "INSERT INTO products (id, name, sku, stock_level, low_stock_threshold) VALUES "
+        "(1, 'Listed', 'S1', 2, 5), (2, 'Unlisted', 'S2', 0, 5), (3, 'Recovered', 'S3', 9, 5)"
+    ))
+    listed_at = datetime(2024, 5, 1, 12, 0)
+    db.session.execute(legacy_low_stock.insert(), [
+        {"product_id": pid, "name": "x", "sku": "x", "stock_level": 0, "low_stock_threshold": 5, "timestamp": listed_at}
+        for pid in (1, 3)
+    ])
+    db.session.commit()
+
+    migrations.upgrade()
+    assert migrations.upgrade() == [step.__name__ for step in migrations.STEPS]
+
+    tables = inspect(db.engine).get_table_names()
+    indexes = {index['name'] for index in inspect(db.engine).get_indexes('products')}
+    assert 'low_stock_products' not in tables
+    assert 'ix_products_low_stock_recent' in indexes and 'ix_products_low_stock' not in indexes
+    since = dict(db.session.query(Product.id, Product.low_stock_since))
+    assert since[1] == listed_at and since[2] is not None and since[3] is None
+    assert [row['id'] for row in client.get('/api/products/low-stock').json] == [2, 1]
@@ -0,0 +1,79 @@
+"""Read-replica routing: @read_only SELECTs go to the replica while it is usable, and fall back to the primary."""
+import time
+
+import pytest
+from sqlalchemy import text
+
+from app import create_app
+from models import db, Product
+from summary import aggregate
+
+LOW_STOCK = '/api/products/low-stock'
+
+
+@pytest.fixture
+def app(replica_config):
+    class Replicated(replica_config):
+        REPLICA_CHECK_SECONDS = 60  # one check when the monitor starts; the tests decide what happens next
+
+    app = create_app(Replicated)
+    aggregate.invalidate()
+    with app.app_context():
+        db.create_all(bind_key=None)
+        replica = db.engines['replica']
+        db.metadata.create_all(replica)
+        # the replica has one more low-stock product, so a read shows where it was served
+        rows = [{"id": i, "name": f"P{i}", "sku": f"S{i}", "stock_level": 0, "low_stock_threshold": 1} for i in (1, 2)]
+        db.session.execute(Product.__table__.insert(), rows[:1])
+        db.session.commit()
+        with replica.begin() as connection:
+            connection.execute(Product.__table__.insert(), rows)
+        yield app
+        db.session.remove()
+
+
+def _served_by(client):
+    response = client.get(LOW_STOCK)
+    assert response.status_code == 200
+    return {1: 'primary', 2: 'replica'}[len(response.json)]
+
+
+def _wait_until_usable(monitor):
+    deadline = time.monotonic() + 5
+    while not monitor.usable():
+        assert time.monotonic() < deadline, monitor.status()
+        time.sleep(0.01)
+
+
+def test_reads_go_to_the_replica_once_it_is_checked(app, client):
+    monitor = app.extensions['db_replica']
+    assert _served_by(client) == 'primary'  # not checked yet
+    _wait_until_usable(monitor)
+    assert _served_by(client) == 'replica'
+
+    # writes, and reads outside @read_only, stay on the primary
+    assert client.post('/api/user/products/1/purchase', json={'quantity': 1}).status_code == 400
+    assert client.post('/api/products/1/restock', json={'quantity': 5}).status_code == 200
+    assert client.get('/api/products/1').json['stock_level'] == 5
+    assert client.get('/health').json['binds']['reads_to_replica'] is True
+
+
+def test_a_failed_replica_read_is_retried_on_the_primary(app, client):
+    monitor = app.extensions['db_replica']
+    _wait_until_usable(monitor)
+    with db.engines['replica'].begin() as connection:
+        connection.execute(text("DROP TABLE products"))
+
+    assert _served_by(client) == 'primary'
+    assert not monitor.usable()
+    assert monitor.status()['replica']['error'] == 'no such table: products'
+    assert _served_by(client) == 'primary'
+
+
+def test_a_lagging_replica_is_skipped(app, client):
+    monitor = app.extensions['db_replica']
+    _wait_until_usable(monitor)
+    monitor._record('replica', True, lag=monitor.max_lag_seconds + 1)
+    assert _served_by(client) == 'primary'
+    monitor._record('replica', True, lag=0.0)
+    assert _served_by(client) == 'replica'
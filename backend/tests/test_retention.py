@@ -0,0 +1,42 @@
+"""Restock log retention: compaction into restock_log_daily must not change what analytics report."""
+from datetime import datetime, timedelta
+
+import analytics
+from benchmarks.common import seed_catalog
+from models import db, InventorySnapshot, RestockDaily, RestockLog, StockSnapshot
+
+
+def _snapshots():
+    products = db.session.query(StockSnapshot.product_id, StockSnapshot.day, StockSnapshot.stock_level)
+    totals = db.session.query(InventorySnapshot.day, InventorySnapshot.total_stock)
+    return sorted(products.all()), sorted(totals.all())
+
+
+def _net_by_product():
+    raw = db.session.query(RestockLog.product_id, db.func.sum(RestockLog.quantity)).group_by(RestockLog.product_id)
+    daily = db.session.query(RestockDaily.product_id, db.func.sum(RestockDaily.net_quantity)).group_by(RestockDaily.product_id)
+    net = {}
+    for pid, quantity in raw.all() + daily.all():
+        net[pid] = net.get(pid, 0) + quantity
+    return net
+
+
+def test_compaction_keeps_metrics_and_snapshots(app):
+    today = datetime.utcnow().date()
+    seed_catalog(50, logs_per_product=20, history_days=200, categories=5)
+    metrics = {days: analytics.inventory_metrics(days, today=today) for days in (7, 30, 180)}
+    analytics.backfill_snapshots(today)
+    snapshots = _snapshots()
+    net = _net_by_product()
+
+    removed, written = analytics.compact_restock_log(retention_days=30, today=today)
+    assert removed > 0 and written > 0
+    oldest = db.session.query(db.func.min(RestockLog.timestamp)).scalar()
+    assert oldest >= datetime.combine(today - timedelta(days=30), datetime.min.time())
+    assert _net_by_product() == net
+    assert {days: analytics.inventory_metrics(days, today=today) for days in metrics} == metrics
+    analytics.backfill_snapshots(today)
+    assert _snapshots() == snapshots
+
+    # a second run has nothing left to move
+    assert analytics.compact_restock_log(retention_days=30, today=today) == (0, 0)
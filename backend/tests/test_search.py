@@ -0,0 +1,75 @@
+"""Product search: filters, category facets and keyset pages."""
+from models import db, Product
+
+CATALOG = [
+    # name, sku, category, price, stock_level
+    ("Oak Chair", "CH-1", "Furniture", 40.0, 10),
+    ("Pine Chair", "CH-2", "Furniture", 25.0, 1),
+    ("Chair Cushion", "CU-1", "Textiles", 12.0, 8),
+    ("Desk Lamp", "LA-1", "Lighting", 30.0, 0),
+    ("50%_off Chair", "CH-3", "Furniture", 10.0, 6),
+    ("Table", "TA-1", None, 90.0, 5),
+]
+
+
+def _search(client, query):
+    response = client.get('/api/products/search?' + query)
+    assert response.status_code == 200, response.json
+    return response.json
+
+
+def _names(body):
+    return [item['name'] for item in body['items']]
+
+
+def _seed():
+    db.session.add_all([
+        Product(name=name, sku=sku, category=category, price=price, stock_level=stock, low_stock_threshold=2)
+        for name, sku, category, price, stock in CATALOG
+    ])
+    db.session.commit()
+
+
+def test_facets_count_every_category_of_the_matches(app, client):
+    _seed()
+    body = _search(client, 'q=chair')
+    assert _names(body) == ["Oak Chair", "Pine Chair", "Chair Cushion", "50%_off Chair"]
+    assert body['total'] == 4
+    assert body['facets']['category'] == [
+        {"category": "Furniture", "count": 3}, {"category": "Textiles", "count": 1},
+    ]
+
+    # choosing a category narrows the items and the total but keeps the other options' counts
+    body = _search(client, 'q=chair&category=Textiles')
+    assert (_names(body), body['total']) == (["Chair Cushion"], 1)
+    assert body['facets']['category'][0] == {"category": "Furniture", "count": 3}
+
+
+def test_filters_combine(app, client):
+    _seed()
+    assert _names(_search(client, 'q=ch-')) == ["Oak Chair", "Pine Chair", "50%_off Chair"]
+    assert _names(_search(client, 'q=%25_')) == ["50%_off Chair"]  # LIKE wildcards match literally
+    assert _names(_search(client, 'min_price=20&max_price=40')) == ["Oak Chair", "Pine Chair", "Desk Lamp"]
+    body = _search(client, 'low_stock=true')
+    assert (_names(body), body['total']) == (["Pine Chair", "Desk Lamp"], 2)
+    assert _search(client, 'low_stock=false&category=Furniture')['total'] == 2
+    assert _search(client, 'q=nothing-like-this') == {"items": [], "total": 0, "facets": {"category": []}, "next_after_id": None}
+
+
+def test_pages_follow_the_next_cursor(app, client):
+    _seed()
+    names, query = [], 'limit=4'
+    while True:
+        response = client.get('/api/products/search?' + query)
+        names += _names(response.json)
+        after_id = response.headers.get('X-Next-After-Id')
+        assert after_id == (str(response.json['next_after_id']) if response.json['next_after_id'] else None)
+        if after_id is None:
+            break
+        query = f'limit=4&after_id={after_id}'
+    assert names == [row[0] for row in CATALOG]
+
+
+def test_bad_arguments_are_rejected(app, client):
+    for query in ('min_price=x', 'min_price=5&max_price=1', 'low_stock=maybe', 'limit=0', 'after_id=a', 'q=' + 'x' * 101):
+        assert client.get('/api/products/search?' + query).status_code == 400
@@ -0,0 +1,46 @@
+"""serialization.dumps: orjson and the stdlib fallback write the same bytes."""
+import importlib.util
+import json
+import sys
+from datetime import date, datetime
+from decimal import Decimal
+
+import pytest
+
+import serialization
+
+SAMPLES = [
+    {"name": "Chair", "id": 3, "price": 12.5, "nested": {"b": [1, 2.0], "a": None}},
+    {"ratio": float('nan'), "high": float('inf'), "low": [float('-inf'), Decimal('NaN')], "ok": Decimal('1.5')},
+    [{"when": datetime(2024, 5, 1, 12, 30), "day": date(2024, 5, 1), "label": "café"}],
+    {1: "int keys", 2: (True, False)},
+]
+
+
+@pytest.fixture
+def fallback(monkeypatch):
+    """A copy of the module loaded as if orjson were not installed."""
+    monkeypatch.setitem(sys.modules, 'orjson', None)
+    spec = importlib.util.spec_from_file_location('serialization_fallback', serialization.__file__)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    assert module.orjson is None
+    return module
+
+
+@pytest.mark.skipif(serialization.orjson is None, reason="orjson is not installed")
+@pytest.mark.parametrize('obj', SAMPLES)
+def test_fallback_matches_orjson(fallback, obj):
+    assert fallback.dumps(obj) == serialization.dumps(obj)
+    assert fallback.dumps(obj, sort_keys=False) == serialization.dumps(obj, sort_keys=False)
+
+
+def test_fallback_writes_null_for_non_finite_numbers(fallback):
+    assert json.loads(fallback.dumps(SAMPLES[1])) == {"high": None, "low": [None, None], "ok": 1.5, "ratio": None}
+
+
+def test_responses_sort_keys_like_flask(app, client):
+    created = client.post('/api/products', json={"name": "Chair", "sku": "C-1", "stock_level": 4, "low_stock_threshold": 1})
+    listed = client.get('/api/products')
+    for body in (created.data, listed.data):
+        assert body.strip() == json.dumps(json.loads(body), sort_keys=True, separators=(',', ':')).encode()
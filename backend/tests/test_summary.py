@@ -0,0 +1,57 @@
+"""The in-process dashboard summary: deltas from writes, drift refresh and racing refreshes."""
+import pytest
+from sqlalchemy import text
+
+import summary
+from benchmarks.common import seed_catalog
+from models import db
+
+
+def _read(client):
+    return client.get('/api/dashboard/summary').json
+
+
+def test_writes_keep_the_summary_in_step_with_sql(app, client):
+    seed_catalog(20, logs_per_product=2, history_days=3, categories=2)
+    _read(client)
+    client.post('/api/products', json={'name': 'New', 'sku': 'NEW-1', 'stock_level': 3, 'price': 2.5})
+    client.post('/api/user/products/1/purchase', json={'quantity': 1})
+    client.post('/api/user/orders', json={'items': [{'product_id': 2, 'quantity': 1}, {'product_id': 3, 'quantity': 1}]})
+    client.post('/api/products/4/restock', json={'quantity': 30})
+    client.put('/api/products/5', json={'name': 'Five', 'sku': 'SKU-0000005', 'stock_level': 0, 'price': 9})
+    client.delete('/api/products/6')
+
+    assert _read(client) == pytest.approx(summary.query_summary())
+
+
+def test_drift_is_corrected_when_the_summary_expires(app, client):
+    seed_catalog(10, logs_per_product=0, categories=1)
+    before = _read(client)
+    db.session.execute(text("DELETE FROM products WHERE id <= 3"))
+    db.session.commit()
+    assert _read(client) == before
+
+    app.config['SUMMARY_MAX_AGE_SECONDS'] = 0
+    assert _read(client)["totalProducts"] == before["totalProducts"] - 3
+
+
+def test_a_write_during_the_refresh_query_is_not_lost(app, client, monkeypatch):
+    seed_catalog(10, logs_per_product=0, categories=1)
+    query = summary.query_summary
+    calls = []
+
+    def racing_query():
+        result = query()
+        if not calls:
+            # a product commits after the query read the table and reports its delta
+            db.session.execute(text(
+                "INSERT INTO products (name, sku, stock_level, low_stock_threshold) VALUES ('Late', 'LATE', 1, 5)"
+            ))
+            db.session.commit()
+            summary.aggregate.product_changed(None, summary.ProductState(None, 1, 5))
+        calls.append(result)
+        return result
+
+    monkeypatch.setattr(summary, 'query_summary', racing_query)
+    assert _read(client)["totalProducts"] == 11
+    assert len(calls) == 2
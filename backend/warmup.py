@@ -0,0 +1,89 @@
+"""
+Connection pool warm-up behind the /ready probe.
+
+Each worker process opens DB_WARM_CONNECTIONS pooled connections (the pool
+size by default) and checks them with SELECT 1 before /ready reports ready,
+so the first requests after a cold start or a failover do not pay for
+connection setup. gunicorn starts the warm-up as soon as a worker has loaded
+the app (post_worker_init); elsewhere the first /ready call starts it.
+Failed attempts are retried with backoff until the database answers.
+"""
+import os
+import threading
+import time
+
+from flask import current_app
+from sqlalchemy import text
+
+from models import db
+
+MAX_BACKOFF_SECONDS = 5
+
+
+class PoolWarmup:
+    def __init__(self, app, connections):
+        self.app = app
+        self.connections = connections
+        self._lock = threading.Lock()
+        self._pid = None
+        self.ready = False
+        self.seconds = None
+        self.error = None
+
+    def start(self):
+        """Warm this process's pool in the background; a no-op once started (re-run after a fork)."""
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self.ready, self.seconds, self.error = False, None, None
+        threading.Thread(target=self._run, name='pool-warmup', daemon=True).start()
+
+    def _warm(self):
+        # hold them all at once so the pool really opens `connections` of them
+        opened = []
+        try:
+            for _ in range(self.connections):
+                connection = db.engine.connect()
+                opened.append(connection)
+                connection.execute(text("SELECT 1"))
+        finally:
+            for connection in opened:
+                connection.close()
+
+    def _run(self):
+        started = time.perf_counter()
+        attempt = 0
+        with self.app.app_context():
+            while True:
+                attempt += 1
+                try:
+                    self._warm()
+                except Exception as e:
+                    self.error = str(e)
+                    current_app.logger.warning("Pool warm-up failed (attempt %d): %s", attempt, e)
+                    time.sleep(min(0.5 * attempt, MAX_BACKOFF_SECONDS))
+                    continue
+                self.seconds = round(time.perf_counter() - started, 3)
+                self.error = None
+                self.ready = True
+                return
+
+    def status(self):
+        if self.ready:
+            return {"status": "ready", "pool_connections": self.connections, "warmup_seconds": self.seconds}
+        return {"status": "warming_up", "error": self.error}
+
+
+def init_app(app):
+    options = app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {}
+    connections = app.config.get('DB_WARM_CONNECTIONS') or options.get('pool_size', 1)
+    app.extensions['pool_warmup'] = PoolWarmup(app, connections)
+
+
+def start(app):
+    app.extensions['pool_warmup'].start()
+
+
+def current():
+    return current_app.extensions['pool_warmup']
@@ -0,0 +1,5 @@
+# WSGI entry point for production servers (see gunicorn.conf.py); also what `flask --app wsgi` and manage.py load
+from app import create_app
+
+app = create_app()
+application = app
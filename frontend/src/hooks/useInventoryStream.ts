@@ -0,0 +1,54 @@
+import { useEffect } from "react";
+import { useQueryClient } from "@tanstack/react-query";
+
+const API_URL = import.meta.env.VITE_API_URL;
+// a refused stream (503: the backend's stream slots are full) is retried after this
+const REOPEN_DELAY_MS = 30000;
+
+// Dashboard queries refreshed by the change feed instead of refetching on every mount/focus
+const STREAMED_QUERIES = {
+  stock_changed: [["dashboardSummary"]],
+  low_stock_entered: [["lowStockProducts"], ["dashboardSummary"]],
+  low_stock_exited: [["lowStockProducts"], ["dashboardSummary"]],
+  restock: [["recentRestocks"], ["dashboardSummary"]],
+  catalog_changed: [["dashboardSummary"], ["lowStockProducts"], ["recentRestocks"]],
+  reset: [["dashboardSummary"], ["lowStockProducts"], ["recentRestocks"]],
+};
+const ALL_KEYS = [["dashboardSummary"], ["lowStockProducts"], ["recentRestocks"]];
+
+export function useInventoryStream() {
+  const queryClient = useQueryClient();
+
+  useEffect(() => {
+    let source: EventSource;
+    let reopenTimer: ReturnType<typeof setTimeout> | undefined;
+
+    const open = () => {
+      // EventSource reconnects by itself and resumes with Last-Event-ID
+      source = new EventSource(`${API_URL}/stream/inventory`);
+
+      source.onopen = () => {
+        ALL_KEYS.forEach((queryKey) => queryClient.setQueryDefaults(queryKey, { staleTime: Infinity }));
+      };
+      source.onerror = () => {
+        // fall back to normal refetching while disconnected
+        ALL_KEYS.forEach((queryKey) => queryClient.setQueryDefaults(queryKey, { staleTime: 0 }));
+        // an error response closes it for good instead of reconnecting
+        if (source.readyState === EventSource.CLOSED) {
+          reopenTimer = setTimeout(open, REOPEN_DELAY_MS);
+        }
+      };
+      Object.entries(STREAMED_QUERIES).forEach(([eventType, queryKeys]) => {
+        source.addEventListener(eventType, () => {
+          queryKeys.forEach((queryKey) => queryClient.invalidateQueries({ queryKey }));
+        });
+      });
+    };
+    open();
+
+    return () => {
+      clearTimeout(reopenTimer);
+      source.close();
+    };
+  }, [queryClient]);
+}
@@ -9,8 +9,10 @@ import RecentRestocks from "@/components/RecentRestocks";
 import StockLevelChart from "@/components/StockLevelChart";
 import { useDashboardSummary } from "@/hooks/useDashboardSummary";
 import { useProductAnalytics } from "@/hooks/useProductAnalytics";
+import { useInventoryStream } from "@/hooks/useInventoryStream";
 
 const Index = () => {
+  useInventoryStream();
   const { data: summary, isLoading: isSummaryLoading } = useDashboardSummary();
   const { data: productAnalytics, isLoading: isAnalyticsLoading } = useProductAnalytics();
   